@@ -1,9 +1,328 @@
-from django.contrib import admin
-from .models import Service
+import hashlib
+import io
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.exceptions import NON_FIELD_ERRORS, ImproperlyConfigured
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .forms import ServiceImportUploadForm, UserOnboardingUploadForm
+from .models import Service, ServiceChange, OTP, OutboundEmail, Order, Subscription, WebhookEvent
+from . import catalog, catalog_io, changefeed, onboarding, pricing, search
+
+
+def collect_row_errors(errors, limit):
+    """
+    Return an on_error callback for the bulk loaders that appends the first
+    `limit` invalid rows to `errors` as messages.
+    """
+    def on_error(line, row_errors):
+        if len(errors) < limit:
+            errors.append(f'Row {line}: ' + '; '.join(
+                ('' if field == NON_FIELD_ERRORS else f'{field}: ') + ' '.join(field_errors)
+                for field, field_errors in row_errors.items()
+            ))
+
+    return on_error
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that caches the result count for the current catalog
+    version, so paging through a large change list doesn't run COUNT(*)
+    on every page load.
+    """
+
+    @cached_property
+    def count(self):
+        query = hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+        key = catalog.make_key('admin-count', query)
+        cache = catalog.get_cache()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, catalog.get_timeout())
+        return count
+
+
+class PriceBandFilter(admin.SimpleListFilter):
+    title = 'price incl. tax'
+    parameter_name = 'price_band'
+    # (value, label, from, below) in rupees; filtered on the indexed gross_amount_paise
+    BANDS = [
+        ('under-1000', 'Under 1,000', None, 1000),
+        ('1000-5000', '1,000 to 5,000', 1000, 5000),
+        ('5000-20000', '5,000 to 20,000', 5000, 20000),
+        ('over-20000', '20,000 and over', 20000, None),
+    ]
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, label, _, _ in self.BANDS]
+
+    def queryset(self, request, queryset):
+        for value, _, low, high in self.BANDS:
+            if self.value() == value:
+                if low is not None:
+                    queryset = queryset.filter(gross_amount_paise__gte=low * 100)
+                if high is not None:
+                    queryset = queryset.filter(gross_amount_paise__lt=high * 100)
+        return queryset
+
+
+class ServiceActionForm(ActionForm):
+    percent = forms.DecimalField(
+        required=False, max_digits=6, decimal_places=2, min_value=-100,
+        label='Change price by %', help_text='For "Reprice selected services".',
+    )
+
+
+class ServiceChangeList(ChangeList):
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # Only the listed columns; the change form still loads whole rows
+        return super().get_queryset(request, exclude_parameters).only(*self.model_admin.list_only)
+
+
 # Register your models here.
 class ServiceAdmin(admin.ModelAdmin):
+    list_display = ('service_name', 'service_package', 'service_price', 'service_tax', 'payable', 'active', 'updated_at')
+    list_only = ('id', 'service_name', 'service_package', 'service_price', 'service_tax', 'gross_amount_paise',
+                 'active', 'updated_at')
+    list_filter = ('active', PriceBandFilter)
+    search_fields = ('service_name',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False  # Spares a second COUNT(*) over the whole table
+    action_form = ServiceActionForm
+    actions = ['activate', 'deactivate', 'reprice', 'export_csv', 'export_jsonl']
+    change_list_template = 'admin/IT_App/service/import_change_list.html'
+    # Rows reported back individually after an import
+    max_reported_errors = 20
 
     class Meta:
         model = Service
 
-admin.site.register(Service, ServiceAdmin)
\ No newline at end of file
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='IT_App_service_import'),
+        ] + super().get_urls()
+
+    def get_changelist(self, request, **kwargs):
+        return ServiceChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the full-text index (search.py) rather than LIKE scans
+        if not search_term:
+            return queryset, False
+        ids = search.get_backend().search(search_term, settings.SEARCH_MAX_CANDIDATES)
+        return queryset.filter(pk__in=ids), False
+
+    @admin.display(description='Payable', ordering='gross_amount_paise')
+    def payable(self, service):
+        return service.gross_amount
+
+    # The bulk actions below write all selected rows with one UPDATE; it
+    # sends no post_save, so they invalidate the catalog and append to the
+    # change feed themselves
+    def _update(self, request, queryset, message, **values):
+        with transaction.atomic():
+            # Before the update, which can take rows out of `queryset`
+            # (activate selects inactive services)
+            changefeed.record_queryset(queryset)
+            updated = queryset.update(updated_at=timezone.now(), **values)
+        if updated:
+            catalog.bump_catalog_version()
+        self.message_user(request, message % updated, messages.SUCCESS)
+
+    @admin.action(description='Activate selected services', permissions=['change'])
+    def activate(self, request, queryset):
+        self._update(request, queryset.filter(active=False), '%d services activated.', active=True)
+
+    @admin.action(description='Deactivate selected services', permissions=['change'])
+    def deactivate(self, request, queryset):
+        self._update(request, queryset.filter(active=True), '%d services deactivated.', active=False)
+
+    @admin.action(description='Reprice selected services', permissions=['change'])
+    def reprice(self, request, queryset):
+        form = ServiceActionForm(request.POST)
+        form.is_valid()  # Only 'percent' matters; 'action' choices are filled in by the change list
+        percent = form.cleaned_data.get('percent')
+        if percent is None:
+            self.message_user(request, 'Enter the price change in percent, from -100 up.', messages.ERROR)
+            return
+        self._update(request, queryset, f'%d services repriced by {percent}%%.', **pricing.repriced_amounts(percent))
+
+    def _export(self, queryset, fmt):
+        rows = catalog_io.iter_rows(queryset)
+        response = StreamingHttpResponse(catalog_io.EXPORTERS[fmt](rows), content_type=catalog_io.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="services.{fmt}"'
+        return response
+
+    @admin.action(description='Export selected services as CSV')
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description='Export selected services as JSON Lines')
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
+    def import_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            return redirect('admin:IT_App_service_changelist')
+        if request.method == 'POST':
+            form = ServiceImportUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                fmt = form.cleaned_data['format'] or catalog_io.guess_format(upload.name)
+                errors = []
+                file = io.TextIOWrapper(upload, encoding='utf-8', newline='')
+                try:
+                    counts = catalog_io.import_services(
+                        catalog_io.READERS[fmt](file), on_error=collect_row_errors(errors, self.max_reported_errors),
+                    )
+                except UnicodeDecodeError:
+                    # Batches before the bad bytes have been written
+                    self.message_user(request, 'The file is not UTF-8 text; the import stopped there.', messages.ERROR)
+                    return redirect('admin:IT_App_service_changelist')
+                self.message_user(
+                    request, f"Created {counts['created']} services, updated {counts['updated']}, skipped "
+                             f"{counts['invalid']} invalid rows in {counts['elapsed']:.1f}s.", messages.SUCCESS,
+                )
+                for error in errors:
+                    self.message_user(request, error, messages.WARNING)
+                return redirect('admin:IT_App_service_changelist')
+        else:
+            form = ServiceImportUploadForm()
+        return TemplateResponse(request, 'admin/IT_App/service/import.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Import services',
+            'opts': self.model._meta,
+            'form': form,
+        })
+
+admin.site.register(Service, ServiceAdmin)
+
+
+class ServiceChangeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'service_id', 'action', 'changed_at')
+    list_filter = ('action',)
+    search_fields = ('=service_id',)
+    show_full_result_count = False
+
+    # The log is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ServiceChange, ServiceChangeAdmin)
+
+
+class OTPAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'created_at')
+    list_select_related = ('user',)  # OTP.__str__ reads user.username
+
+admin.site.register(OTP, OTPAdmin)
+
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected emails')
+    def requeue(self, request, queryset):
+        queryset.exclude(status=OutboundEmail.SENT).update(
+            status=OutboundEmail.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
+
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('receipt', 'service_name', 'user', 'amount_paise', 'status', 'gateway_order_id', 'payment_id', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    search_fields = ('=receipt', '=gateway_order_id', '=payment_id')
+    raw_id_fields = ('user', 'service')
+
+admin.site.register(Order, OrderAdmin)
+
+
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('order', 'user', 'service', 'started_at')
+    list_select_related = ('order', 'user', 'service')
+    raw_id_fields = ('order', 'user', 'service')
+
+admin.site.register(Subscription, SubscriptionAdmin)
+
+
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event', 'status', 'received_at', 'processed_at')
+    list_filter = ('status', 'event')
+    search_fields = ('=event_id',)
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected events')
+    def requeue(self, request, queryset):
+        queryset.update(status=WebhookEvent.PENDING, last_error='', processed_at=None)
+
+admin.site.register(WebhookEvent, WebhookEventAdmin)
+
+
+class OnboardingUserAdmin(UserAdmin):
+    change_list_template = 'admin/auth/user/onboarding_change_list.html'
+    # Rows reported back individually after an upload
+    max_reported_errors = 20
+
+    def get_urls(self):
+        return [
+            path('onboard/', self.admin_site.admin_view(self.onboard_view), name='auth_user_onboard'),
+        ] + super().get_urls()
+
+    def onboard_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:auth_user_changelist')
+        if request.method == 'POST':
+            form = UserOnboardingUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                errors = []
+                on_error = collect_row_errors(errors, self.max_reported_errors)
+                file = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8', newline='')
+                try:
+                    # Hashed inline: a process pool per request would fork the
+                    # web server (and its connections) for every upload; the
+                    # onboard_users command uses one for large files
+                    counts = onboarding.onboard_users(catalog_io.read_csv(file), workers=1, on_error=on_error)
+                except ImproperlyConfigured as e:
+                    self.message_user(request, str(e), messages.ERROR)
+                    return redirect('admin:auth_user_changelist')
+                self.message_user(
+                    request, f"Created {counts['created']} users, skipped {counts['invalid']} rows "
+                             f"in {counts['elapsed']:.1f}s. Their OTP emails are queued.", messages.SUCCESS,
+                )
+                for error in errors:
+                    self.message_user(request, error, messages.WARNING)
+                return redirect('admin:auth_user_changelist')
+        else:
+            form = UserOnboardingUploadForm()
+        return TemplateResponse(request, 'admin/auth/user/onboard.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Onboard users from CSV',
+            'opts': self.model._meta,
+            'form': form,
+        })
+
+admin.site.unregister(User)
+admin.site.register(User, OnboardingUserAdmin)
@@ -0,0 +1,238 @@
+"""
+JSON endpoints for the service catalog.
+
+The list and detail endpoints are conditional: their ETag and
+Last-Modified headers come from the catalog version and timestamp kept in
+the cache (see catalog.py), so a client revalidating an unchanged page
+gets a 304 without the database being queried.
+
+Consumers that keep a copy of the catalog sync it from the change feed
+(see changefeed.py) instead: page through the changes after their cursor,
+or hold open the Server-Sent Events stream and get them as they happen.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import catalog, changefeed, search
+from .pagination import CatalogQuery
+
+SERVICE_FIELDS = [
+    'id',
+    'service_name',
+    'payment_terms',
+    'service_price',
+    'service_package',
+    'service_tax',
+    'service_image',
+    'active',
+    'net_amount_paise',
+    'tax_amount_paise',
+    'gross_amount_paise',
+    'updated_at',
+]
+
+# Fields that need converting to a JSON-friendly value
+CONVERTERS = {
+    'service_price': str,
+    'service_tax': str,
+    'service_image': lambda image: image.name or None,
+    'updated_at': lambda value: value.isoformat(),
+}
+
+
+def api_login_required(view):
+    """
+    login_required for JSON endpoints: an anonymous request gets a JSON 401
+    instead of a redirect to the HTML login page. Works on sync and async
+    views.
+    """
+    def unauthorized():
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            if not (await request.auser()).is_authenticated:
+                return unauthorized()
+            return await view(request, *args, **kwargs)
+    else:
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return unauthorized()
+            return view(request, *args, **kwargs)
+    return wraps(view)(wrapper)
+
+
+def requested_fields(request):
+    """
+    The fields selected with ?fields=a,b (all of them by default).
+    """
+    value = request.GET.get('fields')
+    if not value:
+        return SERVICE_FIELDS
+    fields = [field for field in value.split(',') if field]
+    unknown = set(fields) - set(SERVICE_FIELDS)
+    if unknown or not fields:
+        raise BadRequest('Unknown fields: %s.' % ', '.join(sorted(unknown)))
+    return fields
+
+
+def serialize_service(service, fields=SERVICE_FIELDS):
+    data = {}
+    for field in fields:
+        value = getattr(service, field)
+        data[field] = CONVERTERS[field](value) if field in CONVERTERS else value
+    return data
+
+
+def serialize_change(change, action, service):
+    return {
+        'cursor': change.id,
+        'id': change.service_id,
+        'action': action,
+        'changed_at': change.changed_at.isoformat(),
+        'service': serialize_service(service) if service is not None else None,
+    }
+
+
+def change_events(entries):
+    """
+    Server-Sent Events for change feed entries; the event id is the cursor
+    to resume from.
+    """
+    return ''.join(
+        f'id: {change.id}\nevent: {action}\ndata: {json.dumps(serialize_change(change, action, service))}\n\n'
+        for change, action, service in entries
+    )
+
+
+def requested_cursor(request):
+    # An EventSource reconnecting sends the id of the last event it got
+    cursor = changefeed.parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    if cursor is None:
+        raise BadRequest('Invalid cursor.')
+    return cursor
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx hold back events
+    return response
+
+
+def fields_key(request):
+    # ETags can't contain commas (If-None-Match is a comma separated list)
+    return hashlib.md5(','.join(requested_fields(request)).encode()).hexdigest()[:12]
+
+
+def list_etag(request):
+    query = CatalogQuery.from_params(request.GET)
+    return f'"{catalog.get_catalog_version()}-{query.cache_key()}-{fields_key(request)}"'
+
+
+def list_last_modified(request):
+    return catalog.get_last_modified()
+
+
+def detail_etag(request, pk):
+    return f'"{catalog.get_catalog_version()}-{pk}-{fields_key(request)}"'
+
+
+def detail_last_modified(request, pk):
+    service = catalog.get_service(pk)
+    return service.updated_at if service else None
+
+
+# Paginated service listing: ?order=id|price|payable&cursor=&limit=&min_price=&max_price=&min_payable=&max_payable=&active=
+# Responses carry ETag/Last-Modified and honour If-None-Match/If-Modified-Since; ?fields= limits the output
+@api_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
+def service_list(request):
+    query = CatalogQuery.from_params(request.GET)
+    fields = requested_fields(request)
+    services, next_cursor = catalog.get_page(query)
+    return JsonResponse({
+        'results': [serialize_service(service, fields) for service in services],
+        'next_cursor': next_cursor,
+    })
+
+
+# Single service, conditional like the list: ?fields=
+@api_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=detail_etag, last_modified_func=detail_last_modified)
+def service_detail(request, pk):
+    service = catalog.get_service(pk)
+    if service is None:
+        raise Http404('No such service.')
+    return JsonResponse(serialize_service(service, requested_fields(request)))
+
+
+# Ranked full-text search with prefix matching on the last word: ?q=&limit=
+@api_login_required
+def service_search(request):
+    text = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit') or settings.CATALOG_PAGE_SIZE), settings.CATALOG_MAX_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('Invalid limit.')
+    services = search.search_services(text, limit)
+    return JsonResponse({'results': [serialize_service(service) for service in services]})
+
+
+# Catalog changes after a cursor, one entry per changed service: ?cursor=&limit=
+# Start from no cursor for the whole catalog, then pass the returned next_cursor
+@api_login_required
+def service_changes(request):
+    cursor = requested_cursor(request)
+    try:
+        limit = max(1, min(int(request.GET.get('limit') or settings.CHANGE_FEED_PAGE_SIZE), settings.CHANGE_FEED_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('Invalid limit.')
+    entries, next_cursor, has_more = changefeed.changes_since(cursor, limit)
+    return JsonResponse({
+        'results': [serialize_change(*entry) for entry in entries],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    })
+
+
+def stream_changes(cursor):
+    deadline = time.monotonic() + settings.CHANGE_FEED_STREAM_TIMEOUT
+    yield f'retry: {changefeed.STREAM_RETRY}\n\n'
+    version = None
+    polled = sent = time.monotonic()
+    while time.monotonic() < deadline:
+        # Query right after this process changes the catalog, and every poll
+        # interval for changes made by other processes
+        current = catalog.get_catalog_version()
+        if current != version or time.monotonic() - polled >= settings.CHANGE_FEED_POLL_INTERVAL:
+            version, polled = current, time.monotonic()
+            has_more = True
+            while has_more:
+                entries, cursor, has_more = changefeed.changes_since(cursor, settings.CHANGE_FEED_PAGE_SIZE)
+                if entries:
+                    yield change_events(entries)
+                    sent = time.monotonic()
+        if time.monotonic() - sent >= settings.CHANGE_FEED_HEARTBEAT:
+            yield ': keep-alive\n\n'
+            sent = time.monotonic()
+        time.sleep(changefeed.STREAM_TICK)
+
+
+# Server-Sent Events stream of catalog changes, from ?cursor= or Last-Event-ID;
+# it ends after CHANGE_FEED_STREAM_TIMEOUT and the client reconnects. Holds a
+# worker thread while open, so serve it from async_views under ASGI.
+@api_login_required
+def service_change_stream(request):
+    return event_stream_response(stream_changes(requested_cursor(request)))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ItAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'IT_App'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal handlers)
@@ -0,0 +1,155 @@
+"""
+Async versions of the login, catalog, checkout and payment callback views,
+and of the catalog change stream.
+
+They are wired in place of their counterparts in views.py when
+settings.ASYNC_VIEWS is on, which only pays off under an ASGI server
+(IT_Services/asgi.py): database and cache access goes through Django's
+async APIs and the Razorpay call runs on the gateway's own thread pool, so
+a slow gateway no longer ties up a worker per request. Password hashing
+runs on the hashing pool (see hashers.py) instead of the one thread
+sync_to_async() shares between requests. An open change stream costs a
+coroutine instead of a worker thread. Under WSGI they still work, but each
+request gets its own event loop (and the stream is buffered until it ends).
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import alogin
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.views.decorators.csrf import csrf_exempt
+
+from . import api, backends, catalog, changefeed, hashers, ledger
+from .forms import LoginForm, SubscriptionForm
+from .models import Service
+from .pagination import CatalogQuery
+from .payments import get_gateway, GatewayUnavailable
+from .views import next_page_url
+
+
+async def load_user(request):
+    # Templates read request.user, whose lazy loader isn't async-safe
+    request.user = await request.auser()
+
+
+# Login View
+async def login_view(request):
+    await load_user(request)
+    if request.method == 'POST':
+        form = LoginForm(request.POST)
+        if form.is_valid():
+            username = form.cleaned_data['username']
+            password = form.cleaned_data['password']
+            pending = await backends.unverified_users().filter(username=username).afirst()
+            if pending is None:
+                user = await backends.aauthenticate(request, username=username, password=password)
+                if user:
+                    await alogin(request, user)
+                    return redirect('home')
+            elif await hashers.acheck_password(pending, password):
+                # Registered or onboarded, but the email isn't verified yet
+                await request.session.aset('user_id', pending.id)
+                messages.info(request, 'Enter the OTP we emailed you, or request a new one.')
+                return redirect('otp_verification')
+            messages.error(request, 'Invalid credentials')
+    else:
+        form = LoginForm()
+    return render(request, 'login.html', {'form': form})
+
+# Home View (Requires Authentication)
+@login_required
+async def home(request):
+    await load_user(request)
+    query = CatalogQuery.from_params(request.GET, active=True)
+    services_html, next_cursor = await catalog.arender_page('_home_service.html', query)
+    return render(request, 'home.html', {
+        'services_html': services_html,
+        'next_page_url': next_page_url(request, next_cursor),
+    })
+
+# Single Service View
+@login_required
+async def service_detail(request, pk):
+    await load_user(request)
+    service = await aget_object_or_404(Service, pk=pk)
+    return render(request, 'service_detail.html', {'service': service})
+
+# Subscription (Buy) View with Razorpay Integration
+@login_required
+async def subscribe_service(request, pk):
+    await load_user(request)
+    service = await aget_object_or_404(Service, pk=pk)
+    if request.method == 'POST':
+        form = SubscriptionForm(request.POST)
+        if form.is_valid():
+            try:
+                order = await ledger.acreate_order(
+                    request.user, service, service.gross_amount_paise, form.cleaned_data['address']
+                )
+            except GatewayUnavailable:
+                messages.error(request, 'The payment gateway is not responding. Please try again.')
+                return render(request, 'subscribe_service.html', {'form': form, 'service': service})
+
+            return render(request, 'confirm_payment.html', {
+                'form': form,
+                'service': service,
+                'order_id': order.gateway_order_id,
+                'razorpay_key_id': settings.RAZORPAY_KEY_ID,
+                'total_amount': service.gross_amount,
+                'amount_in_paise': service.gross_amount_paise,
+            })
+    else:
+        form = SubscriptionForm()
+
+    return render(request, 'subscribe_service.html', {'form': form, 'service': service})
+
+# Payment callback view for Razorpay
+@csrf_exempt
+async def payment_callback(request):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'Invalid Request'})
+    try:
+        payment_id = request.POST.get('razorpay_payment_id', '')
+        order_id = request.POST.get('razorpay_order_id', '')
+        signature = request.POST.get('razorpay_signature', '')
+
+        # A local HMAC check, cheap enough to run on the event loop
+        if not get_gateway().verify_payment_signature(order_id, payment_id, signature):
+            return JsonResponse({'status': 'Payment Verification Failed'})
+        order, applied = await ledger.arecord_payment(order_id, payment_id)
+        if order is None:
+            return JsonResponse({'status': 'Unknown Order'})
+        if applied:
+            messages.success(request, 'Payment was successful!')
+        return JsonResponse({'status': 'Payment Successful'})
+    except Exception as e:
+        return JsonResponse({'status': 'Error', 'message': str(e)})
+
+async def stream_changes(cursor):
+    deadline = time.monotonic() + settings.CHANGE_FEED_STREAM_TIMEOUT
+    yield f'retry: {changefeed.STREAM_RETRY}\n\n'
+    version = None
+    polled = sent = time.monotonic()
+    while time.monotonic() < deadline:
+        current = await catalog.aget_catalog_version()
+        if current != version or time.monotonic() - polled >= settings.CHANGE_FEED_POLL_INTERVAL:
+            version, polled = current, time.monotonic()
+            has_more = True
+            while has_more:
+                entries, cursor, has_more = await changefeed.achanges_since(cursor, settings.CHANGE_FEED_PAGE_SIZE)
+                if entries:
+                    yield api.change_events(entries)
+                    sent = time.monotonic()
+        if time.monotonic() - sent >= settings.CHANGE_FEED_HEARTBEAT:
+            yield ': keep-alive\n\n'
+            sent = time.monotonic()
+        await asyncio.sleep(changefeed.STREAM_TICK)
+
+# Server-Sent Events stream of catalog changes (see api.service_change_stream)
+@api.api_login_required
+async def service_change_stream(request):
+    return api.event_stream_response(stream_changes(api.requested_cursor(request)))
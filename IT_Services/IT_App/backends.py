@@ -0,0 +1,102 @@
+"""
+Authentication backend that caches the logged-in user.
+
+AuthenticationMiddleware loads request.user through the backend's
+get_user() on every authenticated request. CachedModelBackend serves it
+from AUTH_USER_CACHE_ALIAS and only reads the database on a miss; the
+entry is deleted whenever the User is saved or deleted (see signals.py)
+and otherwise expires after AUTH_USER_CACHE_TIMEOUT, which bounds how long
+a change made with queryset.update() or in another process's local-memory
+cache can go unseen.
+
+Passwords are checked through hashers.check_password(), so they are
+hashed on the bounded pool when one is configured and rehashed when the
+hasher settings change.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import load_backend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+from . import hashers
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    get_cache().delete(user_key(user_id))
+
+
+def unverified_users():
+    """
+    Accounts still waiting for their email to be verified with an OTP:
+    registered or onboarded, never activated and never logged in. A user
+    deactivated after using their account isn't one, so they can't
+    reactivate themselves through OTP verification.
+    """
+    return User.objects.filter(is_active=False, last_login__isnull=True)
+
+
+class CachedModelBackend(ModelBackend):
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None or password is None:
+            return None
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            # Hash anyway, so the response time doesn't tell which usernames exist
+            hashers.check_password(User(), password)
+            return None
+        if hashers.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None or password is None:
+            return None
+        user = await User.objects.filter(username=username).afirst()
+        if user is None:
+            await hashers.acheck_password(User(), password)
+            return None
+        if await hashers.acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        cache = get_cache()
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 5 * 60))
+        return user if self.user_can_authenticate(user) else None
+
+
+async def aauthenticate(request, **credentials):
+    """
+    authenticate() for async views. Django's aauthenticate() runs the whole
+    login, password hashing included, on the single thread sync_to_async()
+    shares between requests; backends with their own aauthenticate() are
+    awaited directly instead.
+    """
+    for path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(path)
+        if hasattr(backend, 'aauthenticate'):
+            user = await backend.aauthenticate(request, **credentials)
+        else:
+            user = await sync_to_async(backend.authenticate)(request, **credentials)
+        if user is not None:
+            user.backend = path
+            return user
+    return None
@@ -0,0 +1,70 @@
+"""
+Helpers shared by the `loadtest` and `benchmark` management commands.
+"""
+import os
+import shutil
+import statistics
+import tempfile
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(options=None):
+    """
+    Create and migrate a throwaway copy of the default database (in a
+    temporary SQLite file) for the duration of the block, optionally with
+    different OPTIONS, then destroy it.
+    """
+    settings_dict = connection.settings_dict
+    old_name, old_options = settings_dict['NAME'], settings_dict['OPTIONS']
+    directory = tempfile.mkdtemp(prefix='it-services-bench-')
+    settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'scratch.sqlite3')
+    if options is not None:
+        settings_dict['OPTIONS'] = {**old_options, **options}
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        settings_dict['OPTIONS'] = old_options
+        shutil.rmtree(directory, ignore_errors=True)  # including WAL files
+
+
+def session_key_for(user):
+    """
+    Create a session in the configured session store logged in as `user`,
+    as if they had signed in, and return its key for the session cookie.
+    """
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Throughput and p50/p95/p99 latency (ms) for one run; `latencies` are
+    in seconds.
+    """
+    latencies = sorted(latencies)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    else:
+        cuts = (latencies or [0]) * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+        'p50': round(cuts[49] * 1000, 2),
+        'p95': round(cuts[94] * 1000, 2),
+        'p99': round(cuts[98] * 1000, 2),
+    }
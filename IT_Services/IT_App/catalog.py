@@ -0,0 +1,266 @@
+"""
+Versioned cache for the service catalog.
+
+Every cached catalog entry is keyed on a version counter that is bumped
+whenever a Service is saved or deleted (see signals.py). Bumping the
+version makes all previously cached pages and rendered fragments
+unreachable at once, so nothing has to be deleted explicitly; stale
+entries simply age out through CATALOG_CACHE_TIMEOUT.
+
+Rendered pages are assembled from per-service <li> fragments keyed on
+the row's updated_at rather than the catalog version, so after a change
+only the changed rows are rendered again and the rest of a page is a
+concatenation of cached strings.
+"""
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.template.loader import render_to_string
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .models import Service
+
+VERSION_KEY = 'catalog:version'
+LAST_MODIFIED_KEY = 'catalog:last_modified'
+
+# Stand-in primary key reversed once, then replaced with each row's pk
+URL_MARKER = '2147483647'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def initial_version():
+    # Versions also feed API ETags, so a version counter that restarts (cache
+    # cleared or evicted) must not reuse numbers handed out before
+    return time.time_ns() // 1000
+
+
+def get_catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() is a no-op when another worker initialised the key first
+        cache.add(VERSION_KEY, initial_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog entry by moving to a new version.
+    Call it once the change is committed: the Service post_save/post_delete
+    handlers register it with transaction.on_commit(), bulk writes call it
+    after their transactions.
+    """
+    cache = get_cache()
+    cache.set(LAST_MODIFIED_KEY, timezone.now(), timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # The key was evicted or never set
+        cache.add(VERSION_KEY, initial_version(), timeout=None)
+        return cache.incr(VERSION_KEY)
+
+
+async def aget_catalog_version():
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, initial_version(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def get_last_modified():
+    """
+    When the catalog last changed, including deletions.
+    """
+    cache = get_cache()
+    last_modified = cache.get(LAST_MODIFIED_KEY)
+    if last_modified is None:
+        last_modified = (
+            Service.objects.using(DEFAULT_DB_ALIAS).aggregate(Max('updated_at'))['updated_at__max'] or timezone.now()
+        )
+        cache.add(LAST_MODIFIED_KEY, last_modified, timeout=None)
+    return last_modified
+
+
+async def aget_last_modified():
+    cache = get_cache()
+    last_modified = await cache.aget(LAST_MODIFIED_KEY)
+    if last_modified is None:
+        last_modified = (
+            (await Service.objects.using(DEFAULT_DB_ALIAS).aaggregate(Max('updated_at')))['updated_at__max']
+            or timezone.now()
+        )
+        await cache.aadd(LAST_MODIFIED_KEY, last_modified, timeout=None)
+    return last_modified
+
+
+def source_queryset(last_modified):
+    """
+    The Service queryset cache misses are filled from. Right after a
+    catalog change it reads the primary, as replicas may not have the
+    change yet and their stale rows would be cached under the new version.
+    """
+    queryset = Service.objects.all()
+    if timezone.now() - last_modified < timedelta(seconds=settings.DATABASE_PIN_SECONDS):
+        queryset = queryset.using(DEFAULT_DB_ALIAS)
+    return queryset
+
+
+def make_key(*parts, version=None):
+    if version is None:
+        version = get_catalog_version()
+    return ':'.join(['catalog', str(version)] + [str(part) for part in parts])
+
+
+def get_service(pk, version=None):
+    """
+    Return the Service with primary key `pk`, or None, cached for the
+    current catalog version.
+    """
+    cache = get_cache()
+    key = make_key('service', pk, version=version)
+    service = cache.get(key)
+    if service is None:
+        # Missing rows are cached as False so they don't hit the database either
+        service = source_queryset(get_last_modified()).filter(pk=pk).first() or False
+        cache.set(key, service, get_timeout())
+    return service or None
+
+
+def get_page(query, version=None):
+    """
+    Return (services, next_cursor) for a CatalogQuery, served from the
+    cache for the current catalog version.
+    """
+    cache = get_cache()
+    key = make_key('page', query.cache_key(), version=version)
+    page = cache.get(key)
+    if page is None:
+        page = query.paginate(source_queryset(get_last_modified()))
+        cache.set(key, page, get_timeout())
+    return page
+
+
+@lru_cache(maxsize=64)
+def url_pattern(name, urlconf, script_prefix):
+    return reverse(name, urlconf=urlconf, args=[URL_MARKER])
+
+
+def service_urls(service):
+    """
+    The detail and subscribe URLs of `service`, without reversing them for
+    every row.
+    """
+    urlconf, script_prefix = get_urlconf(), get_script_prefix()
+    pk = str(service.pk)
+    return {
+        'detail_url': url_pattern('service_detail', urlconf, script_prefix).replace(URL_MARKER, pk),
+        'subscribe_url': url_pattern('subscribe_service', urlconf, script_prefix).replace(URL_MARKER, pk),
+    }
+
+
+def item_key(template_name, service):
+    return ':'.join([
+        'catalog', 'item', template_name, str(service.pk), str(service.updated_at.timestamp()), get_script_prefix(),
+    ])
+
+
+def render_item(template_name, service):
+    return str(render_to_string(template_name, {'service': service, **service_urls(service)}))
+
+
+def render_items(template_name, services):
+    """
+    Render `services` with the one-service template `template_name`,
+    reusing the cached fragment of every row that hasn't changed.
+    """
+    cache = get_cache()
+    keys = [item_key(template_name, service) for service in services]
+    fragments = cache.get_many(keys)
+    missing = {}
+    for key, service in zip(keys, services):
+        if key not in fragments:
+            fragments[key] = missing[key] = render_item(template_name, service)
+    if missing:
+        cache.set_many(missing, get_timeout())
+    return ''.join(fragments[key] for key in keys)
+
+
+async def arender_items(template_name, services):
+    cache = get_cache()
+    keys = [item_key(template_name, service) for service in services]
+    fragments = await cache.aget_many(keys)
+    missing = {}
+    for key, service in zip(keys, services):
+        if key not in fragments:
+            fragments[key] = missing[key] = render_item(template_name, service)
+    if missing:
+        await cache.aset_many(missing, get_timeout())
+    return ''.join(fragments[key] for key in keys)
+
+
+def render_page(template_name, query):
+    """
+    Render one catalog page, one service per `template_name`, and cache
+    the resulting HTML for the current catalog version. Returns (html,
+    next_cursor); on a cache hit the database is not touched at all.
+    """
+    cache = get_cache()
+    version = get_catalog_version()
+    key = make_key('fragment', template_name, query.cache_key(), version=version)
+    fragment = cache.get(key)
+    if fragment is None:
+        services, next_cursor = get_page(query, version=version)
+        html = render_items(template_name, services)
+        fragment = (html, next_cursor)
+        cache.set(key, fragment, get_timeout())
+    html, next_cursor = fragment
+    return mark_safe(html), next_cursor
+
+
+async def aget_service(pk):
+    cache = get_cache()
+    key = make_key('service', pk, version=await aget_catalog_version())
+    service = await cache.aget(key)
+    if service is None:
+        service = await source_queryset(await aget_last_modified()).filter(pk=pk).afirst() or False
+        await cache.aset(key, service, get_timeout())
+    return service or None
+
+
+async def arender_page(template_name, query):
+    """
+    render_page() for async views, using the async cache and ORM APIs.
+    """
+    cache = get_cache()
+    version = await aget_catalog_version()
+    key = make_key('fragment', template_name, query.cache_key(), version=version)
+    fragment = await cache.aget(key)
+    if fragment is None:
+        page_key = make_key('page', query.cache_key(), version=version)
+        page = await cache.aget(page_key)
+        if page is None:
+            page = await query.apaginate(source_queryset(await aget_last_modified()))
+            await cache.aset(page_key, page, get_timeout())
+        services, next_cursor = page
+        html = await arender_items(template_name, services)
+        fragment = (html, next_cursor)
+        await cache.aset(key, fragment, get_timeout())
+    html, next_cursor = fragment
+    return mark_safe(html), next_cursor
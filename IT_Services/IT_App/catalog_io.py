@@ -0,0 +1,202 @@
+"""
+Streaming import and export of the Service catalog as CSV or JSON Lines.
+
+Rows flow through generators, so memory use depends on the batch size
+only, never on the size of the file or the table.
+"""
+import csv
+import itertools
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog, changefeed, pricing, search
+from .forms import ServiceImportForm
+from .models import Service
+
+FIELDS = [
+    'id',
+    'service_name',
+    'payment_terms',
+    'service_price',
+    'service_package',
+    'service_tax',
+    'service_image',
+    'active',
+]
+# Columns written back on import (everything except the id)
+UPDATE_FIELDS = FIELDS[1:] + pricing.PRICING_FIELDS + ['updated_at']
+
+FORMATS = ('csv', 'jsonl')
+
+
+class UnreadableRow:
+    """
+    Stands in for a line a reader couldn't parse, so that import_services()
+    reports it through on_error under its line number and carries on.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_jsonl(file):
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield UnreadableRow({'__all__': [f'Invalid JSON: {e.msg}.']})
+            continue
+        if isinstance(row, dict):
+            yield row
+        else:
+            yield UnreadableRow({'__all__': ['Expected a JSON object.']})
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class RowValidator:
+    """
+    Validates row dicts with the fields of ServiceImportForm followed by the
+    model's own field validation, i.e. what ServiceImportForm.is_valid()
+    checks. The form is built once: constructing a ModelForm per row
+    deep-copies all of its fields, which dominated import time.
+    """
+
+    def __init__(self):
+        self.fields = ServiceImportForm().fields
+
+    def __call__(self, row):
+        """
+        Return (service, errors); the service is unsaved and carries the
+        row's id if it had one.
+        """
+        data = dict(row)
+        if isinstance(data.get('active'), str):
+            # CSV booleans; '0'/'no' would otherwise count as a ticked checkbox
+            data['active'] = data['active'].strip().lower() in ('1', 'true', 'yes', 'on')
+        cleaned = {}
+        errors = {}
+        for name, field in self.fields.items():
+            try:
+                cleaned[name] = field.clean(field.widget.value_from_datadict(data, {}, name))
+            except ValidationError as e:
+                errors[name] = e.messages
+        if errors:
+            return None, errors
+        service = Service(**cleaned)
+        if data.get('id') not in (None, ''):
+            try:
+                service.pk = int(data['id'])
+            except (TypeError, ValueError):
+                return None, {'id': ['Enter a whole number.']}
+        try:
+            service.full_clean(exclude=['id'], validate_unique=False, validate_constraints=False)
+        except ValidationError as e:
+            return None, e.message_dict
+        pricing.apply_pricing(service)
+        return service, None
+
+
+def import_services(rows, batch_size=1000, on_error=None):
+    """
+    Create or update services from an iterable of row dicts. Rows with the
+    id of an existing service update it; all others are created. Each batch
+    is written in its own transaction with one bulk_create and one
+    bulk_update. Invalid rows are skipped and passed to `on_error(line,
+    errors)`. Returns a dict of counts and the elapsed time.
+    """
+    started = time.monotonic()
+    validate_row = RowValidator()
+    counts = {'created': 0, 'updated': 0, 'invalid': 0}
+    line = 0
+    for batch in batched(rows, batch_size):
+        services = []
+        for row in batch:
+            line += 1
+            if isinstance(row, UnreadableRow):
+                service, errors = None, row.errors
+            else:
+                service, errors = validate_row(row)
+            if errors:
+                counts['invalid'] += 1
+                if on_error:
+                    on_error(line, errors)
+            else:
+                services.append(service)
+
+        ids = [service.pk for service in services if service.pk is not None]
+        existing = set(Service.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+        to_update = [service for service in services if service.pk in existing]
+        now = timezone.now()
+        for service in to_update:
+            service.updated_at = now  # bulk_update() doesn't apply auto_now
+        to_create = [service for service in services if service.pk not in existing]
+        with transaction.atomic():
+            created = Service.objects.bulk_create(to_create)
+            Service.objects.bulk_update(to_update, UPDATE_FIELDS)
+            # Bulk writes send no post_save, so keep the search index and the
+            # change feed in step here
+            search.get_backend().index(created + to_update)
+            changefeed.record([service.pk for service in created + to_update])
+        counts['created'] += len(created)
+        counts['updated'] += len(to_update)
+
+    if counts['created'] or counts['updated']:
+        catalog.bump_catalog_version()
+    counts['elapsed'] = time.monotonic() - started
+    return counts
+
+
+def iter_rows(queryset=None, chunk_size=2000):
+    queryset = Service.objects.all() if queryset is None else queryset
+    for values in queryset.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS, values))
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+def export_jsonl(rows):
+    for row in rows:
+        row['service_price'] = str(row['service_price'])
+        row['service_tax'] = str(row['service_tax'])
+        yield json.dumps(row) + '\n'
+
+
+EXPORTERS = {'csv': export_csv, 'jsonl': export_jsonl}
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def guess_format(path, default='csv'):
+    for fmt in FORMATS:
+        if str(path).lower().endswith('.' + fmt):
+            return fmt
+    return 'jsonl' if str(path).lower().endswith('.ndjson') else default
@@ -0,0 +1,152 @@
+"""
+Change feed of the service catalog, for consumers that keep a copy of it.
+
+Every write to a Service appends a ServiceChange row: saves and deletes
+through the signal handlers in signals.py, bulk writes (CSV import,
+repricing, admin actions, image variants) by calling record() or
+record_queryset() themselves. The id of a change is the feed's cursor.
+A consumer remembers the cursor of the last change it applied and asks
+for the changes after it, getting each changed service's current state,
+or its deletion, once per page; starting from cursor 0 yields the whole
+catalog. Cursors only work if ids are assigned in commit order, which
+holds because SQLite serializes writers (see IT_Services/database.py).
+
+compact() deletes old changes that a later change of the same service
+supersedes, so the log stays at about one row per service plus recent
+churn. A consumer at any older cursor still gets the later change, so no
+cursor ever becomes invalid. The last change of every service, deletions
+included, is kept.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Service, ServiceChange
+
+# Seconds between checks of the catalog version by the event streams
+STREAM_TICK = 1
+# Milliseconds an EventSource waits before reconnecting after a stream ends
+STREAM_RETRY = 3000
+
+
+def record(service_ids, action=ServiceChange.UPSERT):
+    """
+    Append a change of `action` for each of `service_ids`; call it in the
+    transaction that wrote them.
+    """
+    now = timezone.now()
+    ServiceChange.objects.bulk_create(
+        [ServiceChange(service_id=service_id, action=action, changed_at=now) for service_id in service_ids]
+    )
+
+
+def record_queryset(queryset, action=ServiceChange.UPSERT):
+    """
+    record() for every Service in `queryset`, with one INSERT ... SELECT:
+    no ids go through Python or into bound parameters, however many rows
+    the queryset matches.
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    sql, params = queryset.order_by().values_list('pk').query.sql_with_params()
+    now = ServiceChange._meta.get_field('changed_at').get_db_prep_value(timezone.now(), connection)
+    pk = quote(Service._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ServiceChange._meta.db_table)} (service_id, action, changed_at) '
+            f'SELECT changed.{pk}, %s, %s FROM ({sql}) AS changed ORDER BY changed.{pk}',
+            [action, now, *params],
+        )
+        return cursor.rowcount
+
+
+def parse_cursor(value):
+    """
+    The cursor in `value` (a query parameter or Last-Event-ID), or None if
+    it isn't one. Missing means the beginning of the feed.
+    """
+    if not value:
+        return 0
+    try:
+        cursor = int(value)
+    except ValueError:
+        return None
+    return cursor if cursor >= 0 else None
+
+
+def page_queryset(cursor, limit):
+    # One extra row tells whether there are more
+    return ServiceChange.objects.filter(id__gt=cursor).order_by('id')[:limit + 1]
+
+
+def services_queryset():
+    # The primary: a replica may not have the changed rows yet, and the
+    # consumer would move past the change with their old state
+    return Service.objects.using(DEFAULT_DB_ALIAS)
+
+
+def latest_changes(changes):
+    """
+    The last change of each service in `changes`, in feed order.
+    """
+    latest = {}
+    for change in changes:
+        latest.pop(change.service_id, None)
+        latest[change.service_id] = change
+    return list(latest.values())
+
+
+def build_page(changes, services, cursor, has_more):
+    entries = []
+    for change in latest_changes(changes):
+        service = services.get(change.service_id) if change.action == ServiceChange.UPSERT else None
+        # A service deleted since it was saved is reported as deleted already
+        action = ServiceChange.UPSERT if service is not None else ServiceChange.DELETE
+        entries.append((change, action, service))
+    next_cursor = changes[-1].id if changes else cursor
+    return entries, next_cursor, has_more
+
+
+def changes_since(cursor, limit):
+    """
+    The changes after `cursor`, at most `limit` of them. Returns (entries,
+    next_cursor, has_more), where entries are (change, action, service)
+    tuples, one per changed service, and service is None for deletions.
+    """
+    changes = list(page_queryset(cursor, limit))
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    ids = {change.service_id for change in changes if change.action == ServiceChange.UPSERT}
+    services = services_queryset().in_bulk(ids) if ids else {}
+    return build_page(changes, services, cursor, has_more)
+
+
+async def achanges_since(cursor, limit):
+    changes = [change async for change in page_queryset(cursor, limit)]
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    ids = {change.service_id for change in changes if change.action == ServiceChange.UPSERT}
+    services = await services_queryset().ain_bulk(ids) if ids else {}
+    return build_page(changes, services, cursor, has_more)
+
+
+def compact(older_than=None, batch_size=1000):
+    """
+    Delete changes older than `older_than` (CHANGE_FEED_COMPACT_AFTER by
+    default) that a later change of the same service supersedes, in
+    batches of `batch_size`. Returns the number of deleted rows.
+    """
+    if older_than is None:
+        older_than = timedelta(seconds=settings.CHANGE_FEED_COMPACT_AFTER)
+    superseded = ServiceChange.objects.filter(changed_at__lt=timezone.now() - older_than).filter(
+        Exists(ServiceChange.objects.filter(service_id=OuterRef('service_id'), id__gt=OuterRef('id')))
+    )
+    deleted = 0
+    while True:
+        ids = list(superseded.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ServiceChange.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,152 @@
+"""
+In-process stand-in for the parts of the Razorpay API the app uses.
+
+Point RAZORPAY_BASE_URL at it (e.g. via the `run_fake_gateway` command or
+FakeRazorpayServer().start() in a benchmark) to exercise checkout without
+network access. Optional latency and injected failures make it possible to
+test the gateway adapter's timeouts and retries.
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeRazorpayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _proxy_error(self):
+        """
+        Answer with an HTML 502, as a proxy in front of the API would, while
+        `server.proxy_errors` is positive. Returns True if it did.
+        """
+        with self.server.lock:
+            if self.server.proxy_errors <= 0:
+                return False
+            self.server.proxy_errors -= 1
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = b'<html><body><h1>502 Bad Gateway</h1></body></html>'
+        self.send_response(502)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_POST(self):
+        self._delay()
+        if self._proxy_error():
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if urlparse(self.path).path.rstrip('/') != '/v1/orders':
+            return self._send(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+        data = json.loads(body or b'{}')
+        order = {
+            'id': f'order_{uuid.uuid4().hex[:14]}',
+            'entity': 'order',
+            'amount': data.get('amount'),
+            'amount_paid': 0,
+            'amount_due': data.get('amount'),
+            'currency': data.get('currency', 'INR'),
+            'receipt': data.get('receipt'),
+            'notes': data.get('notes', []),
+            'status': 'created',
+            'attempts': 0,
+            'created_at': int(time.time()),
+        }
+        with self.server.lock:
+            self.server.orders[order['id']] = order
+            drop = self.server.drop_responses > 0
+            if drop:
+                self.server.drop_responses -= 1
+        if drop:
+            # The order exists but the client never hears about it
+            self.close_connection = True
+            return
+        self._send(200, order)
+
+    def do_GET(self):
+        self._delay()
+        if self._proxy_error():
+            return
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        with self.server.lock:
+            if parts == ['v1', 'orders']:
+                receipt = parse_qs(url.query).get('receipt', [None])[0]
+                items = [order for order in self.server.orders.values() if receipt in (None, order['receipt'])]
+                return self._send(200, {'entity': 'collection', 'count': len(items), 'items': items})
+            if len(parts) >= 3 and parts[:2] == ['v1', 'orders'] and parts[2] in self.server.orders:
+                if parts[3:] == ['payments']:
+                    items = self.server.payments.get(parts[2], [])
+                    return self._send(200, {'entity': 'collection', 'count': len(items), 'items': items})
+                return self._send(200, self.server.orders[parts[2]])
+        self._send(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}})
+
+
+class FakeRazorpayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), FakeRazorpayHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.orders = {}
+        self.payments = {}  # order id -> list of payment dicts
+        self.drop_responses = 0
+        self.proxy_errors = 0  # requests answered with an HTML 502
+
+    def handle_error(self, request, client_address):
+        # Clients that time out and hang up are expected, not errors
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add_payment(self, order_id, status='captured'):
+        """Record a payment against an order, as if the customer had paid."""
+        with self.lock:
+            order = self.orders[order_id]
+            payment = {
+                'id': f'pay_{uuid.uuid4().hex[:14]}',
+                'entity': 'payment',
+                'order_id': order_id,
+                'amount': order['amount'],
+                'currency': order['currency'],
+                'status': status,
+            }
+            self.payments.setdefault(order_id, []).append(payment)
+            if status == 'captured':
+                order.update(status='paid', amount_paid=order['amount'], amount_due=0)
+            return payment
+
+    def start(self):
+        """Serve from a daemon thread and return the base URL."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -7,11 +7,18 @@ class UserRegistrationForm(forms.Form):
     username = forms.CharField(max_length=100, required=True)
     email = forms.EmailField(required=True)
     password = forms.CharField(widget=forms.PasswordInput, required=True)
+    confirm_password = forms.CharField(widget=forms.PasswordInput, required=True)
 
     class Meta:
         model = User
         fields = ['username', 'email', 'password']
 
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if User.objects.filter(username=username).exists():
+            raise forms.ValidationError("This username is already taken.")
+        return username
+
     def clean(self):
         cleaned_data = super().clean()
         password = cleaned_data.get('password')
@@ -66,4 +73,26 @@ class ServiceForm(forms.ModelForm):
     )
 
 class SubscriptionForm(forms.Form):
-    address = forms.CharField(widget=forms.Textarea, label='Delivery Address')
\ No newline at end of file
+    address = forms.CharField(widget=forms.Textarea, label='Delivery Address')
+
+# Validation for bulk-imported services: the ServiceForm rules, except that
+# service_image is the name of an already stored file rather than an upload
+class ServiceImportForm(ServiceForm):
+    service_image = forms.CharField(max_length=100)
+
+# One row of a bulk onboarding file (see onboarding.py), checked like registration
+class UserOnboardingForm(forms.Form):
+    username = forms.CharField(max_length=100, required=True)
+    email = forms.EmailField(required=True)
+    password = forms.CharField(required=True)
+
+# Admin upload of an onboarding CSV
+class UserOnboardingUploadForm(forms.Form):
+    file = forms.FileField(help_text='CSV with username, email and password columns.')
+
+# Admin upload of a catalog file (see catalog_io.py)
+class ServiceImportUploadForm(forms.Form):
+    file = forms.FileField(help_text='CSV or JSON Lines with the columns of an export. Rows with an id update that service.')
+    format = forms.ChoiceField(
+        choices=[('', 'From the file name'), ('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False,
+    )
@@ -0,0 +1,125 @@
+"""
+Password hashers with costs taken from settings, and pooled verification.
+
+The hashers keep Django's algorithm names, so hashes made by Django's own
+hashers verify unchanged, but read their cost from
+settings.PASSWORD_HASHER_PARAMS. Changing a cost makes must_update() true
+for older hashes, which are then rehashed on the user's next login.
+
+check_password() and acheck_password() verify a user's password the way
+User.check_password() does, including that rehash. With
+PASSWORD_HASHING_WORKERS set, the hashing runs on a bounded thread or
+process pool (PASSWORD_HASHING_EXECUTOR), which caps how many logins hash
+at once and keeps it off the event loop and off the single thread that
+sync_to_async() would run it on under ASGI.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def get_params(algorithm):
+    return getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).get(algorithm, {})
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return get_params(self.algorithm).get('iterations', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return get_params(self.algorithm).get('work_factor', hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return get_params(self.algorithm).get('block_size', hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return get_params(self.algorithm).get('parallelism', hashers.ScryptPasswordHasher.parallelism)
+
+    @property
+    def maxmem(self):
+        # OpenSSL refuses more than 32 MiB by default; scrypt needs 128 * N * r bytes
+        return max(32 * 1024 * 1024, 256 * self.work_factor * self.block_size)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return get_params(self.algorithm).get('time_cost', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return get_params(self.algorithm).get('memory_cost', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return get_params(self.algorithm).get('parallelism', hashers.Argon2PasswordHasher.parallelism)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    The shared hashing pool, or None when PASSWORD_HASHING_WORKERS is 0.
+    """
+    global _executor
+    workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', 0)
+    if not workers:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if getattr(settings, 'PASSWORD_HASHING_EXECUTOR', 'thread') == 'process':
+                    from concurrent.futures import ProcessPoolExecutor  # multiprocessing is slow to import
+                    # django.setup() makes the hasher settings usable in spawned workers
+                    _executor = ProcessPoolExecutor(workers, initializer=django.setup)
+                else:
+                    _executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hashing')
+    return _executor
+
+
+def check_password(user, password):
+    """
+    Return True if `password` is the user's password, rehashing and saving
+    it when the preferred hasher or its cost changed.
+    """
+    executor = get_executor()
+    if executor is None:
+        return user.check_password(password)
+    is_correct, must_update = executor.submit(hashers.verify_password, password, user.password).result()
+    if is_correct and must_update:
+        user.password = executor.submit(hashers.make_password, password).result()
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+async def acheck_password(user, password):
+    """
+    check_password() for async views. Without a pool the hashing runs on
+    the event loop's default executor rather than on the main thread.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    is_correct, must_update = await loop.run_in_executor(executor, hashers.verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = await loop.run_in_executor(executor, hashers.make_password, password)
+        await user.asave(update_fields=['password'])
+    return is_correct
+
+
+async def amake_password(password):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), hashers.make_password, password)
@@ -0,0 +1,174 @@
+"""
+Upload pipeline for Service.service_image.
+
+Uploads are stored under their SHA-256 (services/<xx>/<hash>.<ext>), so
+identical images are written once and shared. Resized variants in every
+format of SERVICE_IMAGE_FORMATS are generated after the request has
+committed, on a small background thread pool, and recorded in
+Service.image_variants for the `service_picture` template tag. Anything
+the pool misses (e.g. a worker restart) is picked up by the
+`generate_image_variants` command.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Pillow's save() format name and file extension per variant format
+FORMATS = {
+    'avif': ('AVIF', 'avif'),
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+# Serializes variant generation per content hash, so identical uploads
+# processed concurrently don't encode (and store) the same files twice.
+# Maps a hash to [lock, number of threads holding or waiting for it]; the
+# entry is dropped by the last of them, so no waiter is left with a lock
+# that a newcomer no longer sees.
+_digest_locks = {}
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def store_original(service):
+    """
+    Save a new upload on `service.service_image` under its content hash
+    (unless an identical file is already stored) and point the field at it.
+    """
+    upload = service.service_image.file
+    digest = content_hash(upload)
+    extension = os.path.splitext(service.service_image.name)[1].lower() or '.jpg'
+    name = f'{settings.SERVICE_IMAGE_UPLOAD_TO}{digest[:2]}/{digest}{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, upload)
+    service.service_image.name = name
+    service.service_image._committed = True
+    if service.image_hash != digest:
+        service.image_hash = digest
+        service.image_variants = {}
+
+
+def supported_formats():
+    from PIL import features
+
+    return [fmt for fmt in settings.SERVICE_IMAGE_FORMATS if fmt == 'jpeg' or features.check(fmt)]
+
+
+def build_variants(source_name, digest, force=False):
+    """
+    Create the resized variants of a stored image. Returns
+    {format: {width: storage name}}; variants that already exist (from an
+    identical upload) are reused, not re-encoded, unless `force` is set.
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(source_name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {}
+    for fmt in supported_formats():
+        pil_format, extension = FORMATS[fmt]
+        variants[fmt] = {}
+        for width in settings.SERVICE_IMAGE_WIDTHS:
+            if width > image.width and variants[fmt]:
+                break  # never upscale; the smallest variant is always kept
+            name = f'{settings.SERVICE_IMAGE_UPLOAD_TO}variants/{digest[:2]}/{digest}_{width}.{extension}'
+            exists = default_storage.exists(name)
+            if exists and force:
+                # Replace the file rather than saving next to it under a new name
+                default_storage.delete(name)
+            if force or not exists:
+                resized = image.copy()
+                resized.thumbnail((width, width * 4))
+                if pil_format == 'JPEG' and resized.mode != 'RGB':
+                    resized = resized.convert('RGB')
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, quality=settings.SERVICE_IMAGE_QUALITY)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants[fmt][str(min(width, image.width))] = name
+    return variants
+
+
+def generate_variants(service_id, force=False):
+    """
+    Build and record the variants of one service's current image,
+    re-encoding existing variant files if `force` is set.
+    """
+    from . import catalog, changefeed
+    from .models import Service
+
+    service = Service.objects.filter(pk=service_id).only('service_image', 'image_hash').first()
+    if service is None or not service.service_image or not service.image_hash:
+        return False
+    with _executor_lock:
+        entry = _digest_locks.setdefault(service.image_hash, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            variants = build_variants(service.service_image.name, service.image_hash, force=force)
+    finally:
+        with _executor_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _digest_locks[service.image_hash]
+    # Only record them if the image hasn't been replaced in the meantime;
+    # update() skips post_save, so invalidate the cached catalog and append
+    # to the change feed explicitly.
+    with transaction.atomic():
+        updated = Service.objects.filter(pk=service_id, image_hash=service.image_hash).update(
+            image_variants=variants, updated_at=timezone.now()
+        )
+        if updated:
+            changefeed.record([service_id])
+    if updated:
+        catalog.bump_catalog_version()
+    return True
+
+
+def _run_in_background(service_id):
+    try:
+        generate_variants(service_id)
+    finally:
+        # Pool threads outlive the request; don't leave a connection open per thread
+        connection.close()
+
+
+def schedule_variants(service_id):
+    """
+    Generate variants for `service_id` once the current transaction commits,
+    off the request thread unless SERVICE_IMAGE_ASYNC is disabled.
+    """
+    def submit():
+        global _executor
+        if not settings.SERVICE_IMAGE_ASYNC:
+            generate_variants(service_id)
+            return
+        if _executor is None:
+            with _executor_lock:
+                if _executor is None:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=settings.SERVICE_IMAGE_WORKERS, thread_name_prefix='service-images'
+                    )
+        _executor.submit(_run_in_background, service_id)
+
+    transaction.on_commit(submit)
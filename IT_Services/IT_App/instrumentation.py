@@ -0,0 +1,272 @@
+"""
+Per-request performance metrics.
+
+MetricsMiddleware opens a RequestMetrics for every request in a context
+variable. While it is open, every SQL query (through a connection execute
+wrapper, see signals.py), every template render (InstrumentedDjangoTemplates)
+and every `timed('gateway')` block adds its duration to it. Finished
+requests are kept in a bounded ring buffer of the last METRICS_BUFFER_SIZE
+requests, from which `metrics_json` (staff only) and `metrics_prometheus`
+report per-view percentiles.
+
+A request that runs the same SELECT METRICS_N_PLUS_ONE_THRESHOLD or more
+times is flagged as a likely N+1 (e.g. a related object fetched in a
+loop) and logged. Writes aren't counted: bulk_create, bulk_update and the
+batched purges repeat one statement per batch by design.
+
+Recording a query is two clock reads and a dict update, so the middleware
+is cheap enough to leave on in production.
+"""
+import contextvars
+import logging
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Timed sections besides the database, in report order
+SECTIONS = ('render', 'gateway')
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.sections = dict.fromkeys(SECTIONS, 0.0)
+        self.statements = Counter()
+
+    def n_plus_one(self):
+        threshold = settings.METRICS_N_PLUS_ONE_THRESHOLD
+        return [sql[:300] for sql, count in self.statements.most_common() if count >= threshold]
+
+
+class MetricsBuffer:
+    """
+    The last `size` finished requests, plus running per-view totals that
+    never reset (Prometheus counters).
+    """
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=size)
+        self.totals = {}  # view -> {'count': n, 'duration': s, 'db': s, ...}
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+            totals = self.totals.setdefault(record['view'], Counter())
+            totals['count'] += 1
+            totals['n_plus_one'] += bool(record['n_plus_one'])
+            for field in ('duration', 'queries', 'db') + SECTIONS:
+                totals[field] += record[field]
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.totals.clear()
+
+    def summary(self):
+        """
+        Per-view request count and percentiles over the buffered requests.
+        """
+        with self.lock:
+            records = list(self.records)
+            totals = {view: dict(counter) for view, counter in self.totals.items()}
+        by_view = {}
+        for record in records:
+            by_view.setdefault(record['view'], []).append(record)
+        summary = {}
+        for view, view_records in sorted(by_view.items()):
+            summary[view] = {
+                'window': len(view_records),
+                'totals': totals.get(view, {}),
+                'n_plus_one': sorted({sql for record in view_records for sql in record['n_plus_one']}),
+            }
+            for field in ('duration', 'queries', 'db') + SECTIONS:
+                summary[view][field] = percentiles([record[field] for record in view_records])
+        return summary
+
+
+def percentiles(values):
+    values = sorted(values)
+    if len(values) == 1:
+        return {str(q): values[0] for q in QUANTILES}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {str(q): cuts[round(q * 100) - 1] for q in QUANTILES}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = MetricsBuffer(settings.METRICS_BUFFER_SIZE)
+    return _buffer
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Connection execute wrapper; installed on every connection, but only
+    records while a request is being measured.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            metrics.statements[sql] += 1
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(section):
+    """
+    Add the time spent in the block to `section` of the current request,
+    e.g. `with timed('gateway'): ...`. A no-op outside a request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.sections[section] += time.perf_counter() - started
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timed('render'):
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with render time recorded per request.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class MetricsMiddleware:
+    """
+    Measure each request; put it first in MIDDLEWARE so the whole request
+    is covered.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    def finish(self, request, response, metrics):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        n_plus_one = metrics.n_plus_one()
+        if n_plus_one:
+            logger.warning('Possible N+1 queries in %s: %s', view, n_plus_one)
+        record = {
+            'view': view,
+            'status': response.status_code,
+            'duration': time.perf_counter() - metrics.started,
+            'queries': metrics.queries,
+            'db': metrics.db_time,
+            'n_plus_one': n_plus_one,
+        }
+        record.update(metrics.sections)
+        get_buffer().add(record)
+
+
+# Per-view latency percentiles and N+1 reports as JSON (seconds)
+@staff_member_required
+def metrics_json(request):
+    return JsonResponse(get_buffer().summary())
+
+
+# Prometheus exposition format; for staff or the METRICS_SCRAPE_IPS addresses
+def metrics_prometheus(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_SCRAPE_IPS and not request.user.is_staff:
+        raise PermissionDenied
+    lines = []
+    summary = get_buffer().summary()
+    metrics = [
+        ('duration', 'it_app_request_duration_seconds', 'Request duration'),
+        ('db', 'it_app_request_db_seconds', 'Time spent in SQL queries per request'),
+        ('render', 'it_app_request_render_seconds', 'Time spent rendering templates per request'),
+        ('gateway', 'it_app_request_gateway_seconds', 'Time spent calling the payment gateway per request'),
+        ('queries', 'it_app_request_queries', 'SQL queries per request'),
+    ]
+    for field, name, description in metrics:
+        lines.append(f'# HELP {name} {description}.')
+        lines.append(f'# TYPE {name} summary')
+        for view, data in summary.items():
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            for quantile, value in data[field].items():
+                lines.append(f'{name}{{view="{label}",quantile="{quantile}"}} {value}')
+            lines.append(f'{name}_sum{{view="{label}"}} {data["totals"].get(field, 0)}')
+            lines.append(f'{name}_count{{view="{label}"}} {data["totals"].get("count", 0)}')
+    lines.append('# HELP it_app_n_plus_one_requests_total Requests flagged with repeated identical queries.')
+    lines.append('# TYPE it_app_n_plus_one_requests_total counter')
+    for view, data in summary.items():
+        label = view.replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'it_app_n_plus_one_requests_total{{view="{label}"}} {data["totals"].get("n_plus_one", 0)}')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
@@ -0,0 +1,120 @@
+"""
+Order and subscription bookkeeping for Razorpay checkouts.
+
+record_payment() is an idempotent upsert: the first confirmation for an
+order flips it to paid with one conditional UPDATE and creates its
+Subscription, and every replay of the same confirmation matches no rows
+and does no further work.
+"""
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Order, Subscription
+from .payments import get_gateway
+
+
+def create_order(user, service, amount_paise, address):
+    """
+    Record an Order and create the matching gateway order. Raises
+    payments.GatewayUnavailable (and marks the order failed) if the gateway
+    can't be reached.
+    """
+    order = Order.objects.create(
+        user=user,
+        service=service,
+        service_name=service.service_name,
+        receipt=uuid.uuid4().hex,
+        amount_paise=amount_paise,
+        address=address,
+    )
+    try:
+        gateway_order = get_gateway().create_order(
+            amount_paise, receipt=order.receipt, notes={'service_id': str(service.pk)}
+        )
+    except Exception:
+        Order.objects.filter(pk=order.pk).update(status=Order.FAILED, updated_at=timezone.now())
+        raise
+    order.gateway_order_id = gateway_order['id']
+    Order.objects.filter(pk=order.pk).update(gateway_order_id=order.gateway_order_id, updated_at=timezone.now())
+    return order
+
+
+async def acreate_order(user, service, amount_paise, address):
+    """
+    create_order() for async views: the gateway call runs on the gateway's
+    own thread pool and the bookkeeping uses the async ORM.
+    """
+    order = await Order.objects.acreate(
+        user=user,
+        service=service,
+        service_name=service.service_name,
+        receipt=uuid.uuid4().hex,
+        amount_paise=amount_paise,
+        address=address,
+    )
+    try:
+        gateway_order = await get_gateway().acreate_order(
+            amount_paise, receipt=order.receipt, notes={'service_id': str(service.pk)}
+        )
+    except Exception:
+        await Order.objects.filter(pk=order.pk).aupdate(status=Order.FAILED, updated_at=timezone.now())
+        raise
+    order.gateway_order_id = gateway_order['id']
+    await Order.objects.filter(pk=order.pk).aupdate(gateway_order_id=order.gateway_order_id, updated_at=timezone.now())
+    return order
+
+
+def record_payment(gateway_order_id, payment_id):
+    """
+    Mark the order paid and start its subscription. Returns
+    (order, applied) where `applied` is False when the payment had already
+    been recorded; order is None for unknown or empty order ids.
+    """
+    if not gateway_order_id:
+        # Would match every order created without a gateway order id
+        return None, False
+    try:
+        with transaction.atomic():
+            applied = Order.objects.filter(
+                gateway_order_id=gateway_order_id, status__in=[Order.CREATED, Order.FAILED],
+            ).update(status=Order.PAID, payment_id=payment_id, updated_at=timezone.now())
+            order = Order.objects.filter(gateway_order_id=gateway_order_id).first()
+            if applied:
+                Subscription.objects.create(order=order, user_id=order.user_id, service_id=order.service_id)
+    except IntegrityError:
+        # The payment id is already recorded against another order
+        return Order.objects.filter(gateway_order_id=gateway_order_id).first(), False
+    return order, bool(applied)
+
+
+# The ORM has no async transactions, so the atomic block runs in a worker thread
+arecord_payment = sync_to_async(record_payment)
+
+
+def reconcile_orders(batch_size=200, older_than=None):
+    """
+    Walk unpaid orders in id order, `batch_size` at a time, and record any
+    payment the gateway has captured for them. Only orders created before
+    `older_than` are checked. Returns (checked, recovered).
+    """
+    gateway = get_gateway()
+    queryset = Order.objects.filter(status=Order.CREATED, gateway_order_id__isnull=False)
+    if older_than is not None:
+        queryset = queryset.filter(created_at__lt=older_than)
+    checked = recovered = 0
+    last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(id__gt=last_id).order_by('id').only('id', 'gateway_order_id')[:batch_size]
+        )
+        if not batch:
+            return checked, recovered
+        for order in batch:
+            checked += 1
+            captured = [p for p in gateway.order_payments(order.gateway_order_id) if p.get('status') == 'captured']
+            if captured and record_payment(order.gateway_order_id, captured[0]['id'])[1]:
+                recovered += 1
+        last_id = batch[-1].id
@@ -0,0 +1,134 @@
+"""
+Periodic clean-up of rows that nothing else deletes.
+
+Registrations that are never verified leave an inactive User (and its
+OTP) behind, expired sessions stay in the session table and delivered
+emails in the outbox, so these tables, and their indexes, only grow. The `run_maintenance` command runs
+the tasks below, each every MAINTENANCE_INTERVALS[task] seconds with
+--loop. Every task deletes at most `batch_size` rows per statement, each
+batch in its own short transaction, so the SQLite write lock is released
+between batches and request writes interleave with the clean-up.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import changefeed, otp
+from .models import Order, OutboundEmail, Subscription
+
+logger = logging.getLogger(__name__)
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    Delete the rows of `queryset` (and whatever cascades from them) in
+    batches of `batch_size`. Returns the number of `queryset` rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            deleted += model.objects.filter(pk__in=pks).delete()[1].get(model._meta.label, 0)
+        if len(pks) < batch_size:
+            return deleted
+
+
+def purge_inactive_users(batch_size):
+    """
+    Delete users who registered (or were onboarded) more than
+    MAINTENANCE_INACTIVE_USER_AGE seconds ago and never verified their
+    email. Staff and anyone who has ever logged in, ordered or subscribed
+    are kept.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.MAINTENANCE_INACTIVE_USER_AGE)
+    abandoned = User.objects.filter(
+        is_active=False, is_staff=False, is_superuser=False, last_login__isnull=True, date_joined__lt=cutoff,
+    ).exclude(Exists(Order.objects.filter(user=OuterRef('pk')))).exclude(
+        Exists(Subscription.objects.filter(user=OuterRef('pk')))
+    )
+    return delete_in_batches(abandoned, batch_size)
+
+
+def purge_expired_sessions(batch_size):
+    # Like `manage.py clearsessions`, but in batches (cached_db sessions also
+    # expire from the cache on their own)
+    return delete_in_batches(Session.objects.filter(expire_date__lt=timezone.now()), batch_size)
+
+
+def purge_sent_emails(batch_size):
+    # Pending emails are still to be delivered and dead ones are kept for
+    # inspection; only those sent MAINTENANCE_SENT_EMAIL_AGE seconds ago go
+    cutoff = timezone.now() - timedelta(seconds=settings.MAINTENANCE_SENT_EMAIL_AGE)
+    return delete_in_batches(OutboundEmail.objects.filter(status=OutboundEmail.SENT, sent_at__lt=cutoff), batch_size)
+
+
+def purge_expired_otps(batch_size):
+    return otp.purge_expired_otps(batch_size=batch_size)
+
+
+def compact_changes(batch_size):
+    return changefeed.compact(batch_size=batch_size)
+
+
+# name: function(batch_size) returning the number of deleted rows
+TASKS = {
+    'otps': purge_expired_otps,
+    'sessions': purge_expired_sessions,
+    'users': purge_inactive_users,
+    'outbox': purge_sent_emails,
+    'changes': compact_changes,
+}
+
+
+def run_task(name, batch_size=None):
+    """
+    Run one task and return its counts: {'task', 'deleted', 'elapsed'}.
+    """
+    started = time.monotonic()
+    deleted = TASKS[name](batch_size or settings.MAINTENANCE_BATCH_SIZE)
+    result = {'task': name, 'deleted': deleted, 'elapsed': time.monotonic() - started}
+    logger.info('Maintenance task %s deleted %d rows in %.3fs', name, deleted, result['elapsed'])
+    return result
+
+
+class Scheduler:
+    """
+    Runs each of `tasks` whenever its interval (MAINTENANCE_INTERVALS) has
+    passed, starting with all of them.
+    """
+
+    def __init__(self, tasks=None, batch_size=None):
+        self.tasks = list(tasks or TASKS)
+        self.batch_size = batch_size
+        self.next_run = dict.fromkeys(self.tasks, 0.0)
+
+    def due(self):
+        now = time.monotonic()
+        return [name for name in self.tasks if self.next_run[name] <= now]
+
+    def run_due(self):
+        """
+        Run the due tasks and return their counts; a failing task is
+        logged and retried at its next interval.
+        """
+        results = []
+        for name in self.due():
+            self.next_run[name] = time.monotonic() + settings.MAINTENANCE_INTERVALS[name]
+            try:
+                results.append(run_task(name, self.batch_size))
+            except Exception:
+                logger.exception('Maintenance task %s failed', name)
+        return results
+
+    def seconds_until_due(self):
+        return max(0.0, min(self.next_run.values()) - time.monotonic())
@@ -0,0 +1,80 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib.util import find_spec
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from IT_Services.passwords import HASHERS, password_hashers
+
+PASSWORD = 'Bench-Pass-2024!'
+EXECUTORS = ('inline', 'thread', 'process')
+
+
+def verify_many(encoded, count):
+    for _ in range(count):
+        verify_password(PASSWORD, encoded)
+    return count
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure password verifications (i.e. logins) per second, overall and per core, for each '
+        'PASSWORD_HASHER with the costs in PASSWORD_HASHER_PARAMS, verified inline and on thread and '
+        'process pools.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasher', action='append', choices=list(HASHERS), help='Default: all installed.')
+        parser.add_argument('--executor', action='append', choices=EXECUTORS, help='Default: all.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Pool size.')
+        parser.add_argument('--duration', type=float, default=3.0, help='Seconds per measurement.')
+
+    def handle(self, *args, **options):
+        names = options['hasher'] or [name for name in HASHERS if name != 'argon2' or find_spec('argon2')]
+        executors = options['executor'] or list(EXECUTORS)
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"{cores} cores, {options['workers']} pool workers\n")
+        self.stdout.write(f"{'hasher':<15}{'executor':<10}{'ms/login':>10}{'logins/s':>10}{'per core':>10}  params")
+        for name in names:
+            try:
+                hashers = password_hashers(name)
+            except ImproperlyConfigured as e:
+                raise CommandError(e)
+            with override_settings(PASSWORD_HASHERS=hashers):
+                encoded = make_password(PASSWORD)
+                for executor in executors:
+                    rate = self.measure(encoded, executor, options['workers'], options['duration'])
+                    used = 1 if executor == 'inline' else min(options['workers'], cores)
+                    self.stdout.write(
+                        f"{name:<15}{executor:<10}{1000 * used / rate:>10.1f}{rate:>10.1f}{rate / used:>10.1f}  "
+                        f"{settings.PASSWORD_HASHER_PARAMS.get(name, {})}"
+                    )
+
+    def measure(self, encoded, executor, workers, duration):
+        """
+        Verifications per second, counted over at least `duration` seconds.
+        """
+        started = time.perf_counter()
+        if executor == 'inline':
+            done = 0
+            while time.perf_counter() - started < duration:
+                done += verify_many(encoded, 1)
+            return done / (time.perf_counter() - started)
+
+        # One verification per task: the pool's own overhead is part of the measurement
+        pool = (ProcessPoolExecutor(workers, initializer=django.setup) if executor == 'process'
+                else ThreadPoolExecutor(workers))
+        with pool:
+            # Let the process pool start its workers before timing
+            list(pool.map(verify_many, [encoded] * workers, [1] * workers))
+            started = time.perf_counter()
+            done = 0
+            while time.perf_counter() - started < duration:
+                done += sum(pool.map(verify_many, [encoded] * workers * 2, [1] * workers * 2))
+            return done / (time.perf_counter() - started)
@@ -0,0 +1,332 @@
+import asyncio
+import itertools
+import json
+import platform
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import django
+import requests
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.testcases import LiveServerThread
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from IT_App import catalog, instrumentation, payments, pricing, search
+from IT_App.benchmarking import scratch_database, session_key_for, summarize
+from IT_App.fake_gateway import FakeRazorpayServer
+from IT_App.models import Service
+
+PASSWORD = 'Bench-Pass-2024!'
+SCENARIOS = ('register', 'login', 'home', 'subscribe')
+MODES = ('client', 'asgi', 'server')
+# Metrics compared between runs, and whether higher is better
+COMPARED = {'rps': True, 'p50': False, 'p95': False, 'p99': False, 'queries_per_request': False}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the registration, login, catalog and checkout flows against a throwaway database '
+        'seeded with a configurable catalog and user base. Razorpay is replaced by the in-process fake '
+        'gateway and email by the locmem backend. Writes a JSON baseline that --compare diffs against.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=1000, help='Catalog size.')
+        parser.add_argument('--users', type=int, default=100, help='Existing (active) users.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and mode.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Default: all.')
+        parser.add_argument(
+            '--mode', action='append', choices=MODES,
+            help='client: test client over WSGI handler; asgi: AsyncClient over the ASGI handler; '
+                 'server: HTTP against a local threaded WSGI server. Default: all.',
+        )
+        parser.add_argument('--server-url', help='Also run the server mode against this externally started server '
+                                                 '(e.g. uvicorn on a copy of the benchmark database).')
+        parser.add_argument('--gateway-latency', type=float, default=0.05, help='Seconds per fake Razorpay call.')
+        parser.add_argument('--stock-sessions', action='store_true',
+                            help="Use Django's database session engine and uncached ModelBackend, to compare "
+                                 "queries per request against the cached setup.")
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+        parser.add_argument('--compare', help='Baseline JSON file to diff the results against.')
+        parser.add_argument('--max-regression', type=float,
+                            help='Fail if any compared metric is this many percent worse than the baseline.')
+
+    def handle(self, *args, **options):
+        if options['users'] < options['concurrency']:
+            raise CommandError('--users must be at least --concurrency (each client logs in as its own user).')
+        scenarios = options['scenario'] or list(SCENARIOS)
+        modes = options['mode'] or list(MODES)
+
+        gateway = FakeRazorpayServer(latency=options['gateway_latency'])
+        overrides = override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=['*'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            RAZORPAY_BASE_URL=gateway.start(),
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark',
+                'OPTIONS': {'MAX_ENTRIES': 20000},
+            }},
+        )
+        session_overrides = override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+        )
+        setup_test_environment()
+        overrides.enable()
+        if options['stock_sessions']:
+            session_overrides.enable()
+        session_engine = settings.SESSION_ENGINE
+        payments.reset_gateway()
+        try:
+            with scratch_database():
+                self.seed(options['services'], options['users'])
+                results = {}
+                for mode in modes:
+                    results[mode] = self.run_mode(mode, None, scenarios, options)
+                if options['server_url']:
+                    results['external'] = self.run_mode('server', options['server_url'].rstrip('/'), scenarios, options)
+        finally:
+            payments.reset_gateway()
+            if options['stock_sessions']:
+                session_overrides.disable()
+            overrides.disable()
+            teardown_test_environment()
+            gateway.stop()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'services': options['services'],
+                'users': options['users'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'gateway_latency': options['gateway_latency'],
+                'session_engine': session_engine,
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        self.print_table(results)
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            self.compare(baseline['results'], results, options['max_regression'])
+
+    def seed(self, service_count, user_count):
+        started = time.monotonic()
+        services = []
+        for i in range(service_count):
+            service = Service(
+                service_name=f'Benchmark service {i}',
+                payment_terms='Monthly',
+                service_price=Decimal(100 + i % 900),
+                service_package=f'Package {i % 10}',
+                service_tax=Decimal('18.00'),
+                service_image='services/benchmark.jpg',
+                active=i % 10 != 0,
+            )
+            pricing.apply_pricing(service)
+            services.append(service)
+        Service.objects.bulk_create(services, batch_size=500)
+        search.rebuild_index()
+        catalog.bump_catalog_version()
+
+        # One hash for every seeded user keeps seeding fast
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            [User(username=f'bench_{i}', email=f'bench_{i}@example.com', password=password) for i in range(user_count)],
+            batch_size=500,
+        )
+        self.service_ids = list(Service.objects.filter(active=True).values_list('id', flat=True))
+        self.stderr.write(f'Seeded {service_count} services and {user_count} users in {time.monotonic() - started:.1f}s')
+
+    def build_request(self, scenario, i, run_id):
+        """
+        Return (method, path, data, logged in, expected status) for the
+        i-th request of a scenario.
+        """
+        if scenario == 'register':
+            username = f'new_{run_id}_{i}'
+            data = {'username': username, 'email': f'{username}@example.com',
+                    'password': PASSWORD, 'confirm_password': PASSWORD}
+            return 'POST', '/register/', data, False, 302
+        if scenario == 'login':
+            return 'POST', '/login/', {'username': f'bench_{i % len(self.users)}', 'password': PASSWORD}, False, 302
+        if scenario == 'home':
+            return 'GET', '/', None, True, 200
+        service_id = self.service_ids[i % len(self.service_ids)]
+        return 'POST', f'/service/{service_id}/subscribe/', {'address': 'Benchmark street 1'}, True, 200
+
+    def run_mode(self, mode, base_url, scenarios, options):
+        self.users = list(User.objects.filter(username__startswith='bench_').order_by('id')[:options['users']])
+        concurrency = options['concurrency']
+        # Each worker is logged in as its own user
+        sessions = [session_key_for(user) for user in self.users[:concurrency]]
+        results = {}
+        for scenario in scenarios:
+            run_id = f'{mode}{secrets.token_hex(3)}'
+            instrumentation.get_buffer().clear()
+            if mode == 'asgi':
+                latencies, errors, elapsed = asyncio.run(
+                    self.run_async(scenario, run_id, sessions, options['requests'], concurrency)
+                )
+            else:
+                latencies, errors, elapsed = self.run_threads(
+                    mode, base_url, scenario, run_id, sessions, options['requests'], concurrency
+                )
+            result = summarize(latencies, errors, elapsed)
+            totals = [view['totals'] for view in instrumentation.get_buffer().summary().values()]
+            counted = sum(total.get('count', 0) for total in totals)
+            # Only known when the server runs in this process
+            result['queries_per_request'] = (
+                round(sum(total.get('queries', 0) for total in totals) / counted, 2) if counted and not base_url else None
+            )
+            results[scenario] = result
+            self.stderr.write(f"{mode:<8} {scenario:<10} {result['rps']:>8.1f} req/s  p95={result['p95']}ms  "
+                              f"errors={result['errors']}")
+        return results
+
+    def run_threads(self, mode, base_url, scenario, run_id, sessions, total, concurrency):
+        server = None
+        if mode == 'server' and base_url is None:
+            server = LiveServerThread('127.0.0.1', StaticFilesHandler)
+            server.daemon = True
+            server.start()
+            server.is_ready.wait()
+            if server.error:
+                raise server.error
+            base_url = f'http://127.0.0.1:{server.port}'
+
+        counter = itertools.count()
+        lock = threading.Lock()
+        latencies = []
+        errors = 0
+
+        def worker(session_key):
+            nonlocal errors
+            token = secrets.token_hex(16)
+            if mode == 'client':
+                anonymous, logged_in = Client(), Client()
+                logged_in.cookies[settings.SESSION_COOKIE_NAME] = session_key
+            else:
+                anonymous, logged_in = requests.Session(), requests.Session()
+                for http in (anonymous, logged_in):
+                    http.headers['X-CSRFToken'] = token
+                logged_in.cookies.set(settings.CSRF_COOKIE_NAME, token)
+                logged_in.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+            while True:
+                with lock:
+                    i = next(counter)
+                if i >= total:
+                    break
+                method, path, data, authenticated, expected = self.build_request(scenario, i, run_id)
+                http = logged_in if authenticated else anonymous
+                if not authenticated:
+                    # Every anonymous request is a new visitor (logging in rotates the CSRF token)
+                    http.cookies.clear()
+                    if mode != 'client':
+                        http.cookies.set(settings.CSRF_COOKIE_NAME, token)
+                started = time.perf_counter()
+                try:
+                    if mode == 'client':
+                        response = http.post(path, data) if method == 'POST' else http.get(path)
+                    else:
+                        response = http.request(method, base_url + path, data=data, allow_redirects=False, timeout=30)
+                    failed = response.status_code != expected
+                except Exception:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += failed
+            if mode == 'client':
+                connection.close()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(worker, sessions))
+        finally:
+            if server is not None:
+                server.terminate()
+        return latencies, errors, time.perf_counter() - started
+
+    async def run_async(self, scenario, run_id, sessions, total, concurrency):
+        counter = itertools.count()
+        latencies = []
+        errors = 0
+
+        async def worker(session_key):
+            nonlocal errors
+            anonymous, logged_in = AsyncClient(), AsyncClient()
+            logged_in.cookies[settings.SESSION_COOKIE_NAME] = session_key
+            while True:
+                i = next(counter)
+                if i >= total:
+                    break
+                method, path, data, authenticated, expected = self.build_request(scenario, i, run_id)
+                http = logged_in if authenticated else anonymous
+                if not authenticated:
+                    http.cookies.clear()
+                started = time.perf_counter()
+                try:
+                    response = await (http.post(path, data) if method == 'POST' else http.get(path))
+                    failed = response.status_code != expected
+                except Exception:
+                    failed = True
+                latencies.append(time.perf_counter() - started)
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session_key) for session_key in sessions))
+        return latencies, errors, time.perf_counter() - started
+
+    def print_table(self, results):
+        self.stdout.write(f"\n{'mode':<9}{'scenario':<11}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'queries':>9}{'errors':>8}")
+        for mode, scenarios in results.items():
+            for scenario, r in scenarios.items():
+                queries = '-' if r['queries_per_request'] is None else r['queries_per_request']
+                self.stdout.write(f"{mode:<9}{scenario:<11}{r['rps']:>9}{r['p50']:>9}{r['p95']:>9}{r['p99']:>9}"
+                                  f"{queries:>9}{r['errors']:>8}")
+
+    def compare(self, baseline, results, max_regression):
+        self.stdout.write(f"\n{'mode':<9}{'scenario':<11}{'metric':<21}{'baseline':>10}{'current':>10}{'change':>9}")
+        regressions = []
+        for mode, scenarios in results.items():
+            for scenario, current in scenarios.items():
+                previous = baseline.get(mode, {}).get(scenario)
+                if previous is None:
+                    continue
+                for metric, higher_is_better in COMPARED.items():
+                    old, new = previous.get(metric), current.get(metric)
+                    if not old or new is None:
+                        continue
+                    change = (new - old) / old * 100
+                    worse = -change if higher_is_better else change
+                    self.stdout.write(f'{mode:<9}{scenario:<11}{metric:<21}{old:>10}{new:>10}{change:>+8.1f}%')
+                    if max_regression is not None and worse > max_regression:
+                        regressions.append(f'{mode}/{scenario} {metric} {old} -> {new}')
+        if regressions:
+            raise CommandError('Regressions beyond {}%:\n  {}'.format(max_regression, '\n  '.join(regressions)))
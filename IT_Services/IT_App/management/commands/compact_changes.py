@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from IT_App import changefeed
+
+
+class Command(BaseCommand):
+    help = 'Delete old change feed entries that a later change of the same service supersedes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=None,
+                            help='Only delete changes older than this (default: CHANGE_FEED_COMPACT_AFTER).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement.')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+        deleted = changefeed.compact(older_than, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} superseded changes.'))
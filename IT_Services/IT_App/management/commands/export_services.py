@@ -0,0 +1,32 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from IT_App import catalog_io
+
+
+class Command(BaseCommand):
+    help = 'Export the service catalog as CSV or JSON Lines, streaming rows from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: stdout).')
+        parser.add_argument('--format', choices=catalog_io.FORMATS, help='Defaults to the file extension, else csv.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or catalog_io.guess_format(options['output'])
+        started = time.monotonic()
+        rows = 0
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='', encoding='utf-8')
+        try:
+            for chunk in catalog_io.EXPORTERS[fmt](catalog_io.iter_rows(chunk_size=options['chunk_size'])):
+                output.write(chunk)
+                rows += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if fmt == 'csv':
+            rows -= 1  # header
+        elapsed = time.monotonic() - started
+        self.stderr.write(f'Exported {rows} services in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s).')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from IT_App import images
+from IT_App.models import Service
+
+
+class Command(BaseCommand):
+    help = 'Generate resized/WebP variants for service images that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants for every service.')
+        parser.add_argument('--batch-size', type=int, default=200, help='Services loaded per query.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        processed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Service.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'service_image', 'image_hash', 'image_variants')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            for service in batch:
+                if not service.service_image or (service.image_variants and not options['force']):
+                    continue
+                if not default_storage.exists(service.service_image.name):
+                    self.stderr.write(f'Service {service.pk}: {service.service_image.name} is missing')
+                    continue
+                if not service.image_hash:
+                    # Images uploaded before content addressing; hash them in place
+                    with default_storage.open(service.service_image.name) as file:
+                        service.image_hash = images.content_hash(file)
+                    Service.objects.filter(pk=service.pk).update(image_hash=service.image_hash)
+                images.generate_variants(service.pk, force=options['force'])
+                processed += 1
+            last_id = batch[-1].id
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {processed} services in {elapsed:.1f}s.'))
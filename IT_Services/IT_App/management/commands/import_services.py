@@ -0,0 +1,46 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from IT_App import catalog_io
+
+
+class Command(BaseCommand):
+    help = (
+        'Import services from a CSV or JSON Lines file (- for stdin). Rows whose id matches an '
+        'existing service update it; other rows are created. service_image must name a stored file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=catalog_io.FORMATS, help='Defaults to the file extension, else csv.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per transaction.')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or catalog_io.guess_format(options['path'])
+
+        def on_error(line, errors):
+            self.stderr.write(f'Row {line}: {json.dumps(errors)}')
+
+        if options['path'] == '-':
+            file = sys.stdin
+        else:
+            try:
+                file = open(options['path'], newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(e)
+        try:
+            counts = catalog_io.import_services(
+                catalog_io.READERS[fmt](file), batch_size=options['batch_size'], on_error=on_error,
+            )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        rows = counts['created'] + counts['updated'] + counts['invalid']
+        rate = rows / counts['elapsed'] if counts['elapsed'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']}, updated {counts['updated']}, skipped {counts['invalid']} invalid "
+            f"rows in {counts['elapsed']:.2f}s ({rate:.0f} rows/s)."
+        ))
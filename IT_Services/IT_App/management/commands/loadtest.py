@@ -0,0 +1,82 @@
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from IT_App.benchmarking import session_key_for, summarize
+from IT_App.models import Service
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent requests against running servers and report throughput and latency. '
+        'Compare the two entry points by starting e.g. `uvicorn IT_Services.asgi:application` '
+        '(with ASYNC_VIEWS = True) and `gunicorn IT_Services.wsgi` on the same database and passing '
+        'both with --url. Point RAZORPAY_BASE_URL at `run_fake_gateway --latency` for --checkout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True, help='Base URL of a server; repeat to compare.')
+        parser.add_argument('--username', required=True, help='Existing user the requests are authenticated as.')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per server.')
+        parser.add_argument('--checkout', action='store_true', help='Also POST the subscribe form (creates orders).')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        service = Service.objects.filter(active=True).order_by('id').first()
+        if service is None:
+            raise CommandError('The catalog has no active services.')
+
+        requests_to_make = [('GET', '/'), ('GET', f'/service/{service.pk}/')]
+        if options['checkout']:
+            requests_to_make.append(('POST', f'/service/{service.pk}/subscribe/'))
+
+        cookies = {settings.SESSION_COOKIE_NAME: session_key_for(user), settings.CSRF_COOKIE_NAME: secrets.token_hex(16)}
+        for url in options['url']:
+            result = self.run(url.rstrip('/'), requests_to_make, cookies, options['concurrency'], options['duration'])
+            self.stdout.write(
+                f"{url}: {result['requests']} requests, {result['errors']} errors, {result['rps']:.1f} req/s, "
+                f"p50={result['p50']:.1f}ms p95={result['p95']:.1f}ms p99={result['p99']:.1f}ms"
+            )
+
+    def run(self, base_url, requests_to_make, cookies, concurrency, duration):
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def worker(offset):
+            nonlocal errors
+            session = requests.Session()
+            session.cookies.update(cookies)
+            headers = {'X-CSRFToken': cookies[settings.CSRF_COOKIE_NAME], 'Referer': base_url + '/'}
+            i = offset
+            while time.monotonic() < deadline:
+                method, path = requests_to_make[i % len(requests_to_make)]
+                i += 1
+                data = {'address': 'Load test'} if method == 'POST' else None
+                started = time.monotonic()
+                try:
+                    response = session.request(method, base_url + path, data=data, headers=headers,
+                                               allow_redirects=False, timeout=30)
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    failed = True
+                elapsed = time.monotonic() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += failed
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, range(concurrency)))
+        return summarize(latencies, errors, time.monotonic() - started)
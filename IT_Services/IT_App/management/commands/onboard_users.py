@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from IT_App import onboarding
+from IT_App.catalog_io import read_csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Create inactive users from a CSV file (- for stdin) with username, email and password columns, '
+        'issue each an OTP and queue the OTP emails for the process_outbox worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=500, help='Users written per transaction.')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: one per CPU).')
+
+    def handle(self, *args, **options):
+        def on_error(line, errors):
+            self.stderr.write(f'Row {line}: {json.dumps(errors)}')
+
+        if options['path'] == '-':
+            file = sys.stdin
+        else:
+            try:
+                file = open(options['path'], newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(e)
+        try:
+            counts = onboarding.onboard_users(
+                read_csv(file), batch_size=options['batch_size'], workers=options['workers'], on_error=on_error,
+            )
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        rate = counts['created'] / counts['elapsed'] if counts['elapsed'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']} users and skipped {counts['invalid']} invalid rows "
+            f"in {counts['elapsed']:.2f}s ({rate:.0f} users/s). Run process_outbox to send their OTPs."
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from IT_App import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued outbox emails in batches over a reused SMTP connection. '
+        'Run a single worker per database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per SMTP connection.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new emails instead of exiting.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            counts = outbox.drain_outbox(batch_size=options['batch_size'])
+            processed = sum(counts.values())
+            if processed:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"sent={counts['sent']} retried={counts['retried']} dead={counts['dead']} "
+                    f"({processed / elapsed:.1f} emails/s)"
+                )
+            if processed < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from IT_App import webhooks
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply queued Razorpay webhook events to orders in batches, one transaction per batch. '
+        'Run a single worker per database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events applied per transaction.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events instead of exiting.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the inbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            counts = webhooks.process_batch(batch_size=options['batch_size'])
+            handled = sum(counts.values())
+            if handled:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"processed={counts['processed']} ignored={counts['ignored']} failed={counts['failed']} "
+                    f"({handled / elapsed:.1f} events/s)"
+                )
+            if handled < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
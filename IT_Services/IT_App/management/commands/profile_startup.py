@@ -0,0 +1,124 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each entry point does before it can serve: manage.py imports the
+# management machinery and sets Django up, wsgi.py and asgi.py build their
+# application (which sets Django up too)
+ENTRY_POINTS = {
+    'manage': 'import django\nfrom django.core.management import execute_from_command_line\ndjango.setup()',
+    'wsgi': 'import IT_Services.wsgi',
+    'asgi': 'import IT_Services.asgi',
+}
+
+# Run in a fresh interpreter per measurement; the URLconf (and with it
+# every view module) is otherwise only loaded by the first request
+BOOTSTRAP = '''\
+import json, time
+started = time.perf_counter()
+{entry}
+ready = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({{'ready': ready - started, 'urls': time.perf_counter() - ready}}))
+'''
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$')
+
+
+def parse_import_times(stderr):
+    """
+    {module: seconds} spent in each module's own body (its imports
+    excluded) from `python -X importtime` output.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            modules[match.group(2)] = int(match.group(1)) / 1e6
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold start-up of manage.py, wsgi.py and asgi.py in fresh interpreters: total time, '
+        'app registry ready time, URLconf load time and per-module import times (python -X importtime).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entry-point', action='append', choices=list(ENTRY_POINTS), help='Default: all.')
+        parser.add_argument('--repeat', type=int, default=5, help='Interpreters started per entry point; medians are reported.')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules and packages listed.')
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name in options['entry_point'] or list(ENTRY_POINTS):
+            runs = [self.measure(ENTRY_POINTS[name]) for _ in range(options['repeat'])]
+            results[name] = self.summarize(runs, options['top'])
+            self.report(name, results[name])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def measure(self, entry):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'IT_Services.settings')}
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOTSTRAP.format(entry=entry)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        total = time.perf_counter() - started
+        if process.returncode:
+            raise CommandError(process.stderr.strip().splitlines()[-1])
+        timings = json.loads(process.stdout.strip().splitlines()[-1])
+        return {'total': total, **timings, 'modules': parse_import_times(process.stderr)}
+
+    def summarize(self, runs, top):
+        def median(values):
+            return round(statistics.median(values) * 1000, 1)
+
+        own = defaultdict(list)
+        for run in runs:
+            for module, seconds in run['modules'].items():
+                own[module].append(seconds)
+        modules = {module: statistics.median(values) for module, values in own.items()}
+        packages = defaultdict(float)
+        for module, seconds in modules.items():
+            packages[module.split('.')[0]] += seconds
+
+        def slowest(times):
+            return [(name, round(seconds * 1000, 1))
+                    for name, seconds in sorted(times.items(), key=lambda item: item[1], reverse=True)[:top]]
+
+        return {
+            'total_ms': median([run['total'] for run in runs]),
+            'ready_ms': median([run['ready'] for run in runs]),
+            'urls_ms': median([run['urls'] for run in runs]),
+            'import_ms': round(sum(modules.values()) * 1000, 1),
+            'modules': len(modules),
+            'slowest_modules': slowest(modules),
+            'slowest_packages': slowest(packages),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"\n{name}: {result['total_ms']} ms in total, app registry ready after {result['ready_ms']} ms, "
+            f"URLconf loaded in {result['urls_ms']} ms; {result['modules']} modules imported in "
+            f"{result['import_ms']} ms"
+        )
+        # A module's own time includes whatever its body runs, e.g. wsgi.py setting Django up
+        self.stdout.write(f"  {'slowest modules':<44}{'ms':>8}    {'slowest packages':<26}{'ms':>8}")
+        modules, packages = result['slowest_modules'], result['slowest_packages']
+        for i in range(max(len(modules), len(packages))):
+            module, module_ms = modules[i] if i < len(modules) else ('', '')
+            package, package_ms = packages[i] if i < len(packages) else ('', '')
+            self.stdout.write(f'  {module:<44}{module_ms:>8}    {package:<26}{package_ms:>8}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from IT_App import otp
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from the OTP table (used by DatabaseOTPBackend).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement.')
+
+    def handle(self, *args, **options):
+        deleted = otp.purge_expired_otps(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired OTPs.'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from IT_App import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the service full-text search index from the Service table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Services indexed per batch.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = search.rebuild_index(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} services in {elapsed:.2f}s.'))
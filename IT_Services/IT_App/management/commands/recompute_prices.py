@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from IT_App import pricing
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored net/tax/gross amounts of every service, e.g. after tax rules change.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Services loaded and updated per batch.')
+
+    def handle(self, *args, **options):
+        checked, updated = pricing.recompute_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} services, updated {updated}.'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from IT_App import ledger
+
+
+class Command(BaseCommand):
+    help = 'Check unpaid orders against Razorpay and record payments whose callback never arrived.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Orders loaded per query.')
+        parser.add_argument(
+            '--min-age', type=int, default=15,
+            help='Only check orders at least this many minutes old (their callback may still be in flight).',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(minutes=options['min_age'])
+        checked, recovered = ledger.reconcile_orders(batch_size=options['batch_size'], older_than=older_than)
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} orders, recorded {recovered} missed payments.'))
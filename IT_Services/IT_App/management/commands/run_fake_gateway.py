@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from IT_App.fake_gateway import FakeRazorpayServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local fake Razorpay API for development and load tests (set RAZORPAY_BASE_URL to its URL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response.')
+
+    def handle(self, *args, **options):
+        server = FakeRazorpayServer(options['host'], options['port'], latency=options['latency'])
+        self.stdout.write(f'Fake Razorpay API listening on {server.base_url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
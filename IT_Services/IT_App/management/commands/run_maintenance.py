@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from IT_App import maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        'Purge expired OTPs, expired sessions, unverified users and sent emails, and compact the service change feed, '
+        'in short batches. With --loop, each task runs every MAINTENANCE_INTERVALS seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', action='append', choices=list(maintenance.TASKS), help='Default: all.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows deleted per transaction (default: MAINTENANCE_BATCH_SIZE).')
+        parser.add_argument('--loop', action='store_true', help='Keep running the tasks on schedule instead of exiting.')
+
+    def handle(self, *args, **options):
+        scheduler = maintenance.Scheduler(options['task'], batch_size=options['batch_size'])
+        while True:
+            started = time.monotonic()
+            results = scheduler.run_due()
+            for result in results:
+                self.stdout.write(f"{result['task']}: deleted={result['deleted']} ({result['elapsed']:.3f}s)")
+            if results:
+                self.stdout.write(f'Run took {time.monotonic() - started:.3f}s.')
+            if not options['loop']:
+                break
+            time.sleep(scheduler.seconds_until_due())
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from IT_Services.database import replica_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into every DATABASE_REPLICAS file with the SQLite online backup '
+        'API. Run with --loop at an interval shorter than DATABASE_PIN_SECONDS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying instead of exiting.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between copies.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No DATABASE_REPLICAS are configured.')
+        primary = str(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                self.copy(primary, replica_path(settings.DATABASES[alias]))
+                self.stdout.write(f'{alias}: synced in {time.monotonic() - started:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, target_name):
+        # The backup reads a consistent snapshot of the primary, even while
+        # it is being written to (WAL). It goes to a new file that then
+        # replaces the replica in one rename: readers never see (or lock) a
+        # half-written replica, and reopen the new file once their
+        # connection notices the old one was replaced (see
+        # IT_Services/sqlite_backend).
+        temp_name = f'{target_name}.sync'
+        source = sqlite3.connect(source_name)
+        try:
+            target = sqlite3.connect(temp_name)
+            try:
+                source.backup(target)
+                # Readers open replicas read-only, which works for rollback
+                # journal files without needing to create WAL side files
+                target.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target.close()
+            os.replace(temp_name, target_name)
+        finally:
+            source.close()
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+FTS_TABLE = 'IT_App_service_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    # Only SQLite gets the FTS5 table; other backends use the in-process index
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" '
+        'USING fts5(service_name, service_package, payment_terms, tokenize="unicode61", prefix="2 3")'
+    )
+    schema_editor.execute(
+        f'INSERT INTO "{FTS_TABLE}" (rowid, service_name, service_package, payment_terms) '
+        'SELECT id, service_name, service_package, payment_terms FROM "IT_App_service"'
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS "{FTS_TABLE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('IT_App', '0004_service_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
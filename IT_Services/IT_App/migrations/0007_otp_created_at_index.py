@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('IT_App', '0006_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='otp',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
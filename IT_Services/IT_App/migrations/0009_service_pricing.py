@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:55
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+# Frozen copies of IT_App.pricing as of this migration, so later changes to
+# the pricing code don't change what it does
+PRICING_FIELDS = ['net_amount_paise', 'tax_amount_paise', 'gross_amount_paise']
+
+
+def compute_amounts(price, tax_percent):
+    net = int((Decimal(price) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    tax = int((Decimal(net) * Decimal(tax_percent) / 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    return net, tax, net + tax
+
+
+def backfill_pricing(apps, schema_editor):
+    Service = apps.get_model('IT_App', 'Service')
+    services = list(Service.objects.only('id', 'service_price', 'service_tax'))
+    for service in services:
+        for field, value in zip(PRICING_FIELDS, compute_amounts(service.service_price, service.service_tax)):
+            setattr(service, field, value)
+    Service.objects.bulk_update(services, PRICING_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('IT_App', '0008_order_subscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='gross_amount_paise',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='net_amount_paise',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='tax_amount_paise',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['gross_amount_paise', 'id'], name='service_payable_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['active', 'gross_amount_paise', 'id'], name='service_active_payable_idx'),
+        ),
+        migrations.RunPython(backfill_pricing, migrations.RunPython.noop),
+    ]
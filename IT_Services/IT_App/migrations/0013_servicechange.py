@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def record_existing_services(apps, schema_editor):
+    # Start the feed with every current service, so that syncing from the
+    # beginning of the feed yields the whole catalog
+    Service = apps.get_model('IT_App', 'Service')
+    ServiceChange = apps.get_model('IT_App', 'ServiceChange')
+    ids = Service.objects.order_by('id').values_list('id', flat=True)
+    ServiceChange.objects.bulk_create([ServiceChange(service_id=service_id) for service_id in ids], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('IT_App', '0012_webhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('service_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], default='upsert', max_length=6)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['service_id', 'id'], name='service_change_service_idx')],
+            },
+        ),
+        migrations.RunPython(record_existing_services, migrations.RunPython.noop),
+    ]
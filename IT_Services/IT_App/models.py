@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 
+from . import images, pricing
+
 class Service(models.Model):
     service_name = models.CharField(max_length=100)
     payment_terms = models.CharField(max_length=255)
@@ -11,22 +14,201 @@ class Service(models.Model):
     service_tax = models.DecimalField(max_digits=5, decimal_places=2)
     service_image = models.ImageField(upload_to='services/')
     active = models.BooleanField(default=True)
-    
+    # Denormalized amounts in paise, maintained by save() (see pricing.py)
+    net_amount_paise = models.PositiveBigIntegerField(default=0, editable=False)
+    tax_amount_paise = models.PositiveBigIntegerField(default=0, editable=False)
+    gross_amount_paise = models.PositiveBigIntegerField(default=0, editable=False)
+    # SHA-256 of service_image and its resized variants (see images.py)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Set explicitly by bulk updates
+
+    class Meta:
+        # Back the keyset orderings in pagination.py, with and without the active filter
+        indexes = [
+            models.Index(fields=['active', 'id'], name='service_active_id_idx'),
+            models.Index(fields=['service_price', 'id'], name='service_price_id_idx'),
+            models.Index(fields=['active', 'service_price', 'id'], name='service_active_price_idx'),
+            models.Index(fields=['service_name'], name='service_name_idx'),
+            models.Index(fields=['gross_amount_paise', 'id'], name='service_payable_id_idx'),
+            models.Index(fields=['active', 'gross_amount_paise', 'id'], name='service_active_payable_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        pricing.apply_pricing(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'service_price', 'service_tax'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(pricing.PRICING_FIELDS)
+        if self.service_image and not self.service_image._committed:
+            images.store_original(self)
+        super().save(*args, **kwargs)
+        if self.image_hash and not self.image_variants:
+            images.schedule_variants(self.pk)
+
+    @property
+    def tax_amount(self):
+        return pricing.from_paise(self.tax_amount_paise)
+
+    @property
+    def gross_amount(self):
+        return pricing.from_paise(self.gross_amount_paise)
+
     def __str__(self):
         return self.service_name
 
+class ServiceChange(models.Model):
+    """
+    Append-only log of Service changes; its id is the cursor of the change
+    feed (see changefeed.py). Not a foreign key, so deletions are kept.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    service_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, default=UPSERT)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # Compaction looks for a later change of the same service
+        indexes = [
+            models.Index(fields=['service_id', 'id'], name='service_change_service_idx'),
+        ]
+
+    def __str__(self):
+        return f"Service {self.service_id} {self.action} (#{self.id})"
+
 class OTP(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)  # Link OTP to user
     otp_code = models.CharField(max_length=6)  # Store OTP code
-    created_at = models.DateTimeField(auto_now_add=True)  # Track when the OTP was created
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Track when the OTP was created
 
     def is_valid(self):
         """
         Check if the OTP is still valid based on the time of creation.
-        Let's assume OTP is valid for 10 minutes.
+        OTPs are valid for settings.OTP_TTL seconds (10 minutes by default).
         """
-        expiration_time = self.created_at + timedelta(minutes=10)
+        expiration_time = self.created_at + timedelta(seconds=settings.OTP_TTL)
         return timezone.now() < expiration_time
 
     def __str__(self):
         return f"OTP for {self.user.username}: {self.otp_code}"
+
+class OutboundEmail(models.Model):
+    """
+    Outbox row for an email that is delivered by the `process_outbox`
+    worker instead of inside the request that queued it.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'  # gave up after OUTBOX_MAX_ATTEMPTS
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.TextField()  # Comma-separated recipient addresses
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # The worker polls for due pending rows in id order
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def recipients(self):
+        return [address for address in self.to.split(',') if address]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
+
+class Order(models.Model):
+    """
+    A checkout attempt, created before the gateway order so that the
+    receipt can be used as the gateway idempotency key.
+    """
+    CREATED = 'created'
+    PAID = 'paid'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (CREATED, 'Created'),
+        (PAID, 'Paid'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    service = models.ForeignKey(Service, on_delete=models.SET_NULL, null=True, related_name='orders')
+    service_name = models.CharField(max_length=100)  # Kept if the service is deleted
+    receipt = models.CharField(max_length=40, unique=True)
+    gateway_order_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    payment_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    amount_paise = models.PositiveBigIntegerField()
+    currency = models.CharField(max_length=3, default='INR')
+    address = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=CREATED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # reconcile_orders walks unpaid orders in id order
+        indexes = [
+            models.Index(fields=['status', 'id'], name='order_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.receipt} for {self.service_name} ({self.status})"
+
+class Subscription(models.Model):
+    order = models.OneToOneField(Order, on_delete=models.CASCADE)  # At most one per paid order
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriptions')
+    service = models.ForeignKey(Service, on_delete=models.SET_NULL, null=True, related_name='subscriptions')
+    started_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Subscription to {self.order.service_name} for order {self.order.receipt}"
+
+class WebhookEvent(models.Model):
+    """
+    Inbox row for a verified Razorpay webhook, stored as received and
+    applied to orders later by the `process_webhooks` worker.
+    """
+    PENDING = 'pending'
+    PROCESSED = 'processed'
+    IGNORED = 'ignored'  # event type or order this app doesn't handle
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSED, 'Processed'),
+        (IGNORED, 'Ignored'),
+        (FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=64, unique=True)  # Redeliveries reuse the id and are dropped
+    event = models.CharField(max_length=64)
+    payload = models.TextField()  # Raw request body
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # The worker polls for pending rows in id order
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.status})"
@@ -0,0 +1,150 @@
+"""
+Bulk user onboarding from CSV.
+
+Rows are handled `batch_size` at a time, so memory use depends on the
+batch size only, never on the size of the file. Password hashing, which
+dominates the cost, is spread over a process pool (`workers`; 1 hashes
+in the calling process). Each batch is then
+written in one transaction: one bulk_create of the (inactive) users, one
+write of their OTPs and one bulk_create of their OTP emails, which the
+`process_outbox` worker delivers over one SMTP connection per batch.
+"""
+import os
+import time
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import transaction
+
+from .catalog_io import batched
+from .forms import UserOnboardingForm
+from .otp import get_otp_backend
+from .outbox import enqueue_emails
+
+
+class RowValidator:
+    """
+    Validates row dicts with the fields of UserOnboardingForm, built once.
+    """
+
+    def __init__(self):
+        self.fields = UserOnboardingForm().fields
+
+    def __call__(self, row):
+        """
+        Return (cleaned, errors) for one row.
+        """
+        cleaned = {}
+        errors = {}
+        for name, field in self.fields.items():
+            try:
+                cleaned[name] = field.clean(field.widget.value_from_datadict(row, {}, name))
+            except ValidationError as e:
+                errors[name] = e.messages
+        return (None, errors) if errors else (cleaned, None)
+
+
+def hash_passwords(pool, workers, passwords):
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def otp_email(username, code):
+    return (
+        'Your OTP Code',
+        f'An account with the username {username} has been created for you. '
+        f'Log in and verify your email address with this OTP: {code}',
+    )
+
+
+def onboard_users(rows, batch_size=500, workers=None, on_error=None):
+    """
+    Create inactive users from an iterable of row dicts with username,
+    email and password, issue each an OTP and queue the OTP email. Rows
+    that fail validation or name a taken username are skipped and passed
+    to `on_error(line, errors)`. Returns a dict of counts and the elapsed
+    time.
+
+    Raises ImproperlyConfigured if the OTP backend keeps codes in this
+    process only: users would get codes the web server can't verify.
+    """
+    otp_backend = get_otp_backend()
+    if not otp_backend.shared:
+        raise ImproperlyConfigured(
+            'Onboarding needs OTP codes shared between processes: set OTP_BACKEND to '
+            "'IT_App.otp.DatabaseOTPBackend' or OTP_CACHE_ALIAS to a shared cache."
+        )
+    started = time.monotonic()
+    validate_row = RowValidator()
+    counts = {'created': 0, 'invalid': 0}
+    workers = workers or os.cpu_count() or 1
+    # Imported here: multiprocessing is slow to import and only bulk uploads need it
+    from concurrent.futures import ProcessPoolExecutor
+    # django.setup() makes the settings (hashers) usable in spawned workers
+    pool = ProcessPoolExecutor(workers, initializer=django.setup) if workers > 1 else None
+    line = 0
+    try:
+        for batch in batched(rows, batch_size):
+            valid = []
+            for row in batch:
+                line += 1
+                cleaned, errors = validate_row(row)
+                if errors:
+                    counts['invalid'] += 1
+                    if on_error:
+                        on_error(line, errors)
+                else:
+                    valid.append((line, cleaned))
+
+            taken = set(User.objects.filter(
+                username__in=[cleaned['username'] for _, cleaned in valid]
+            ).values_list('username', flat=True))
+            accepted = []
+            for line_number, cleaned in valid:
+                if cleaned['username'] in taken:
+                    counts['invalid'] += 1
+                    if on_error:
+                        on_error(line_number, {'username': ['This username is already taken.']})
+                else:
+                    taken.add(cleaned['username'])  # Later rows of the file
+                    accepted.append((line_number, cleaned))
+
+            hashes = hash_passwords(pool, workers, [cleaned['password'] for _, cleaned in accepted])
+            users = {
+                cleaned['username']: (line_number, User(
+                    username=cleaned['username'], email=cleaned['email'], password=password_hash, is_active=False,
+                ))
+                for (line_number, cleaned), password_hash in zip(accepted, hashes)
+            }
+            with transaction.atomic():
+                # A username can be taken between the check above and this
+                # insert (registration, another upload): skip those rows
+                # rather than fail the batch, then read back the users that
+                # were inserted, which bulk_create() can't tell with
+                # ignore_conflicts. Each salted hash is unique to its row.
+                User.objects.bulk_create([user for _, user in users.values()], ignore_conflicts=True)
+                created = []
+                for user in User.objects.filter(username__in=users).only('id', 'username', 'email', 'password'):
+                    if user.password == users[user.username][1].password:
+                        created.append(user)
+                        del users[user.username]
+                codes = otp_backend.issue_many([user.pk for user in created])
+                enqueue_emails([
+                    (*otp_email(user.username, codes[user.pk]), [user.email]) for user in created
+                ])
+            counts['created'] += len(created)
+            # What is left lost its username to a concurrent insert
+            for line_number, _ in users.values():
+                counts['invalid'] += 1
+                if on_error:
+                    on_error(line_number, {'username': ['This username is already taken.']})
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    counts['elapsed'] = time.monotonic() - started
+    return counts
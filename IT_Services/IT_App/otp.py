@@ -0,0 +1,163 @@
+"""
+One-time password storage and rate limiting.
+
+The backend is chosen with settings.OTP_BACKEND. DatabaseOTPBackend, the
+default, keeps codes in the OTP table, so every process sees them; expired
+rows are cleaned up by the `purge_expired_otps` command. CacheOTPBackend
+keeps codes in the Django cache with a native TTL, so verification is a
+single cache read, but it needs a cache shared by all processes (Redis,
+Memcached): with the local-memory cache a code issued by one worker can't
+be verified by another, nor by the web server after a management command
+issued it.
+"""
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+from .models import OTP
+
+
+def generate_code():
+    return str(random.SystemRandom().randint(100000, 999999))
+
+
+class DatabaseOTPBackend:
+    # Codes are visible to every process
+    shared = True
+
+    def issue(self, user_id):
+        code = generate_code()
+        OTP.objects.update_or_create(
+            user_id=user_id, defaults={'otp_code': code, 'created_at': timezone.now()}
+        )
+        return code
+
+    def issue_many(self, user_ids):
+        """
+        Issue codes for many users with one INSERT; returns {user_id: code}.
+        """
+        codes = {user_id: generate_code() for user_id in user_ids}
+        OTP.objects.bulk_create(
+            [OTP(user_id=user_id, otp_code=code) for user_id, code in codes.items()],
+            update_conflicts=True, unique_fields=['user'], update_fields=['otp_code', 'created_at'],
+        )
+        return codes
+
+    def verify(self, user_id, code):
+        otp = OTP.objects.filter(user_id=user_id).first()
+        if otp is None or not otp.is_valid():
+            return False
+        if not constant_time_compare(otp.otp_code, str(code)):
+            return False
+        otp.delete()
+        return True
+
+    def discard(self, user_id):
+        OTP.objects.filter(user_id=user_id).delete()
+
+
+class CacheOTPBackend:
+
+    def __init__(self):
+        self.cache = caches[settings.OTP_CACHE_ALIAS]
+
+    @property
+    def shared(self):
+        """
+        False if codes only live in this process (the local-memory cache).
+        """
+        return not isinstance(self.cache, (LocMemCache, DummyCache))
+
+    def key(self, user_id):
+        return f'otp:code:{user_id}'
+
+    def issue(self, user_id):
+        code = generate_code()
+        self.cache.set(self.key(user_id), code, timeout=settings.OTP_TTL)
+        return code
+
+    def issue_many(self, user_ids):
+        codes = {user_id: generate_code() for user_id in user_ids}
+        self.cache.set_many({self.key(user_id): code for user_id, code in codes.items()}, timeout=settings.OTP_TTL)
+        return codes
+
+    def verify(self, user_id, code):
+        stored = self.cache.get(self.key(user_id))
+        if stored is None or not constant_time_compare(stored, str(code)):
+            return False
+        self.cache.delete(self.key(user_id))
+        return True
+
+    def discard(self, user_id):
+        self.cache.delete(self.key(user_id))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_otp_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.OTP_BACKEND)()
+    return _backend
+
+
+def allow(action, *identities):
+    """
+    Count one attempt at `action` for every identity (e.g. 'user:42',
+    'ip:10.0.0.1'). Returns False if any of them is over its limit.
+
+    Limits are fixed windows of `period` seconds: one counter per identity
+    and window, created with cache.add() and bumped with cache.incr(),
+    which Redis and Memcached (and the local-memory cache, within its
+    process) do atomically, so concurrent requests can't both take the
+    last attempt. A client can get up to twice the capacity across a
+    window boundary. Like the codes of CacheOTPBackend, the counters are
+    only shared between worker processes if OTP_CACHE_ALIAS is a shared
+    cache; with the local-memory cache every process enforces its own
+    limits.
+    """
+    capacity, period = settings.OTP_RATE_LIMITS[action]
+    cache = caches[settings.OTP_CACHE_ALIAS]
+    window = int(time.time() // period)
+    allowed = True
+    for identity in identities:
+        key = f'otp:rate:{action}:{identity}:{window}'
+        if cache.add(key, 1, timeout=period):
+            attempts = 1
+        else:
+            try:
+                attempts = cache.incr(key)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.add(key, 1, timeout=period)
+                attempts = 1
+        if attempts > capacity:
+            allowed = False
+    return allowed
+
+
+def purge_expired_otps(batch_size=1000):
+    """
+    Delete expired OTP rows in batches of `batch_size`, each in its own
+    short statement. Returns the number of deleted rows.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.OTP_TTL)
+    deleted = 0
+    while True:
+        ids = list(OTP.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += OTP.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,112 @@
+"""
+Durable email outbox.
+
+Requests only insert an OutboundEmail row; the `process_outbox` worker
+drains due rows in batches over a single SMTP connection per batch,
+retrying failures with exponential backoff until OUTBOX_MAX_ATTEMPTS,
+after which the row is left in the dead-letter state.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=','.join(recipients),
+    )
+
+
+def enqueue_emails(messages, from_email=None):
+    """
+    Queue many emails with one INSERT; `messages` holds (subject, body,
+    recipients) tuples.
+    """
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject,
+            body=body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=','.join(recipients),
+        )
+        for subject, body, recipients in messages
+    ])
+
+
+def retry_delay(attempts):
+    delay = settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_DELAY))
+
+
+def due_emails(batch_size):
+    return list(
+        OutboundEmail.objects
+        .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=timezone.now())
+        .order_by('next_attempt_at', 'id')[:batch_size]
+    )
+
+
+def send_batch(emails):
+    """
+    Deliver `emails` over one SMTP connection and record the outcome of
+    each. Returns a dict with the number of sent, retried and dead rows.
+    """
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    if not emails:
+        return counts
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        connection_error = None
+    except Exception as e:
+        connection_error = e
+
+    try:
+        for email in emails:
+            email.attempts += 1
+            try:
+                if connection_error is not None:
+                    raise connection_error
+                EmailMessage(
+                    email.subject,
+                    email.body,
+                    email.from_email,
+                    email.recipients(),
+                    connection=connection,
+                ).send()
+            except Exception as e:
+                email.last_error = str(e)
+                if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    email.status = OutboundEmail.DEAD
+                    counts['dead'] += 1
+                else:
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                    counts['retried'] += 1
+            else:
+                email.status = OutboundEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                counts['sent'] += 1
+    finally:
+        if connection_error is None:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return counts
+
+
+def drain_outbox(batch_size=100):
+    """
+    Send one batch of due emails. Returns the counts from send_batch.
+    """
+    return send_batch(due_emails(batch_size))
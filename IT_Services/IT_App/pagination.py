@@ -0,0 +1,183 @@
+"""
+Keyset (cursor) pagination for the service catalog.
+
+Pages are addressed by an opaque cursor holding the ordering key of the
+last row on the previous page, so fetching page N is a single indexed
+range scan of `limit + 1` rows no matter how deep N is.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+
+from .pricing import to_paise
+
+# Ordering name -> model fields, most significant first. The last field is
+# always the primary key so that every ordering is total.
+ORDERINGS = {
+    'id': ('id',),
+    'price': ('service_price', 'id'),
+    'payable': ('gross_amount_paise', 'id'),  # tax-inclusive amount
+}
+
+# Converters used to turn cursor values back into field values
+FIELD_TYPES = {
+    'id': int,
+    'service_price': Decimal,
+    'gross_amount_paise': int,
+}
+
+
+def encode_cursor(ordering, values):
+    payload = json.dumps({'o': ordering, 'k': [str(value) for value in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        fields = ORDERINGS[ordering]
+        if payload['o'] != ordering or len(payload['k']) != len(fields):
+            raise ValueError('cursor does not match ordering')
+        return [FIELD_TYPES[field](value) for field, value in zip(fields, payload['k'])]
+    except (ValueError, KeyError, TypeError, InvalidOperation, binascii.Error):
+        raise BadRequest('Invalid cursor.')
+
+
+def keyset_filter(fields, values):
+    """
+    Build the "row comes after (values)" condition for an ascending keyset,
+    e.g. price >= p AND ((price > p) OR (price = p AND id > i)). The
+    leading range on the first field is implied by the rest, but SQLite
+    only seeks into the (price, id) index with it; the OR alone scans the
+    index from the start.
+    """
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__gt': values[i]})
+        for previous, value in zip(fields[:i], values[:i]):
+            step &= Q(**{previous: value})
+        condition |= step
+    if len(fields) > 1:
+        condition = Q(**{f'{fields[0]}__gte': values[0]}) & condition
+    return condition
+
+
+def _parse_decimal(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise BadRequest(f'Invalid {name}.')
+    if not value.is_finite():
+        raise BadRequest(f'Invalid {name}.')
+    return value
+
+
+def _parse_bool(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise BadRequest(f'Invalid {name}.')
+
+
+class CatalogQuery:
+    """
+    A validated catalog listing request: filters, ordering and cursor.
+    """
+
+    def __init__(self, ordering='id', cursor=None, limit=None, min_price=None, max_price=None,
+                 min_payable=None, max_payable=None, active=None):
+        if ordering not in ORDERINGS:
+            raise BadRequest('Invalid ordering.')
+        self.ordering = ordering
+        self.cursor = cursor or None
+        self.limit = limit or settings.CATALOG_PAGE_SIZE
+        self.min_price = min_price
+        self.max_price = max_price
+        self.min_payable = min_payable
+        self.max_payable = max_payable
+        self.active = active
+
+    @classmethod
+    def from_params(cls, params, **overrides):
+        """
+        Build a query from request GET parameters; `overrides` win over the
+        parameters (e.g. home forces active=True).
+        """
+        try:
+            limit = int(params.get('limit') or settings.CATALOG_PAGE_SIZE)
+        except ValueError:
+            raise BadRequest('Invalid limit.')
+        options = {
+            'ordering': params.get('order') or 'id',
+            'cursor': params.get('cursor'),
+            'limit': max(1, min(limit, settings.CATALOG_MAX_PAGE_SIZE)),
+            'min_price': _parse_decimal(params, 'min_price'),
+            'max_price': _parse_decimal(params, 'max_price'),
+            'min_payable': _parse_decimal(params, 'min_payable'),
+            'max_payable': _parse_decimal(params, 'max_payable'),
+            'active': _parse_bool(params, 'active'),
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def cache_key(self):
+        parts = [
+            self.ordering, self.cursor, self.limit, self.min_price, self.max_price,
+            self.min_payable, self.max_payable, self.active,
+        ]
+        return hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def filter(self, queryset):
+        if self.active is not None:
+            # active=True compiles to a bare `WHERE active`, which SQLite
+            # can't match against the (active, ...) indexes; IN can
+            queryset = queryset.filter(active__in=[self.active])
+        if self.min_price is not None:
+            queryset = queryset.filter(service_price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(service_price__lte=self.max_price)
+        # Payable bounds are given in rupees and compared with the stored paise
+        if self.min_payable is not None:
+            queryset = queryset.filter(gross_amount_paise__gte=to_paise(self.min_payable))
+        if self.max_payable is not None:
+            queryset = queryset.filter(gross_amount_paise__lte=to_paise(self.max_payable))
+        return queryset
+
+    def paginate(self, queryset):
+        """
+        Return (rows, next_cursor) for this query; next_cursor is None on
+        the last page.
+        """
+        return self.page(list(self.page_queryset(queryset)))
+
+    async def apaginate(self, queryset):
+        return self.page([row async for row in self.page_queryset(queryset)])
+
+    def page_queryset(self, queryset):
+        # One row more than the page size tells whether there is a next page
+        fields = ORDERINGS[self.ordering]
+        queryset = self.filter(queryset).order_by(*fields)
+        if self.cursor:
+            queryset = queryset.filter(keyset_filter(fields, decode_cursor(self.cursor, self.ordering)))
+        return queryset[:self.limit + 1]
+
+    def page(self, rows):
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            next_cursor = encode_cursor(self.ordering, [getattr(rows[-1], field) for field in ORDERINGS[self.ordering]])
+        return rows, next_cursor
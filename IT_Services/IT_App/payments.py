@@ -0,0 +1,168 @@
+"""
+Razorpay gateway adapter.
+
+A single lazily created PaymentGateway is shared by all worker threads.
+It owns one requests.Session whose connection pool is sized by
+RAZORPAY_POOL_SIZE, so keep-alive connections to the gateway are reused
+across requests instead of being re-established per call. Every call is
+bounded by RAZORPAY_TIMEOUT, and order creation is retried with backoff
+using the order receipt as idempotency key. razorpay and requests are
+only imported when the gateway is first used, as they add noticeably to
+every worker's start-up.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .instrumentation import timed
+
+
+class GatewayUnavailable(Exception):
+    """The gateway could not be reached within the configured retries."""
+
+
+class PaymentGateway:
+
+    def __init__(self, key_id, key_secret, base_url=None, timeout=(3.05, 10), max_retries=2,
+                 retry_backoff=0.5, pool_size=10, async_workers=10):
+        import razorpay
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.errors = razorpay.errors
+        # Failures after which an order may or may not have been created:
+        # any transport error, including a 5xx page that isn't JSON (e.g.
+        # from a proxy), which the client reports as requests.JSONDecodeError
+        self.transient_errors = (requests.RequestException, razorpay.errors.ServerError)
+
+        # The session is only used for the stateless, cookie-free API calls
+        # below, so sharing it (and its urllib3 pool) between threads is safe.
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        options = {'base_url': base_url} if base_url else {}
+        self.client = razorpay.Client(session=session, auth=(key_id, key_secret), **options)
+
+        self.executor = ThreadPoolExecutor(max_workers=async_workers, thread_name_prefix='razorpay')
+
+    def _find_order(self, receipt):
+        result = self.client.order.all({'receipt': receipt}, timeout=self.timeout)
+        items = result.get('items', [])
+        return items[0] if items else None
+
+    def create_order(self, amount, currency='INR', receipt=None, notes=None):
+        """
+        Create an order for `amount` (in the smallest currency unit).
+
+        `receipt` identifies the order on our side. If a call fails in a way
+        that leaves its outcome unknown (connection drop, timeout, gateway
+        5xx, a response that isn't JSON), the gateway is first asked for an
+        order with that receipt before retrying, so a retry never creates a
+        second order.
+        """
+        receipt = receipt or uuid.uuid4().hex
+        payload = {
+            'amount': amount,
+            'currency': currency,
+            'receipt': receipt,
+            'payment_capture': '1',
+        }
+        if notes:
+            payload['notes'] = notes
+
+        with timed('gateway'):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    if attempt:
+                        existing = self._find_order(receipt)
+                        if existing is not None:
+                            return existing
+                    return self.client.order.create(payload, timeout=self.timeout)
+                except self.transient_errors as e:
+                    if attempt == self.max_retries:
+                        raise GatewayUnavailable(str(e)) from e
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def acreate_order(self, *args, **kwargs):
+        """
+        create_order() for async views. The blocking HTTP round trip runs on
+        the gateway's own bounded thread pool, so it holds neither the event
+        loop nor Django's shared sync thread.
+        """
+        loop = asyncio.get_running_loop()
+        # Carry the request's context (e.g. its metrics) into the pool thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, lambda: context.run(self.create_order, *args, **kwargs))
+
+    def fetch_order(self, order_id):
+        with timed('gateway'):
+            return self.client.order.fetch(order_id, timeout=self.timeout)
+
+    def order_payments(self, order_id):
+        with timed('gateway'):
+            return self.client.order.payments(order_id, timeout=self.timeout).get('items', [])
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        """
+        Return True if `signature` is valid for the order/payment pair. This
+        is a local HMAC check and does not call the gateway.
+        """
+        try:
+            self.client.utility.verify_payment_signature({
+                'razorpay_order_id': order_id,
+                'razorpay_payment_id': payment_id,
+                'razorpay_signature': signature,
+            })
+        except self.errors.SignatureVerificationError:
+            return False
+        return True
+
+    def verify_webhook_signature(self, body, signature, secret):
+        """
+        Return True if `signature` (the X-Razorpay-Signature header) is the
+        HMAC of the raw webhook `body` under the webhook `secret`.
+        """
+        if not secret or not signature:
+            return False
+        try:
+            self.client.utility.verify_webhook_signature(body, signature, secret)
+        except self.errors.SignatureVerificationError:
+            return False
+        return True
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = PaymentGateway(
+                    settings.RAZORPAY_KEY_ID,
+                    settings.RAZORPAY_KEY_SECRET,
+                    base_url=settings.RAZORPAY_BASE_URL,
+                    timeout=settings.RAZORPAY_TIMEOUT,
+                    max_retries=settings.RAZORPAY_MAX_RETRIES,
+                    pool_size=settings.RAZORPAY_POOL_SIZE,
+                    async_workers=settings.RAZORPAY_ASYNC_WORKERS,
+                )
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the shared gateway so the next get_gateway() reads the settings again."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
@@ -0,0 +1,106 @@
+"""
+Tax-inclusive pricing for services.
+
+Amounts are integer paise computed once from service_price and
+service_tax (a percentage) when a Service is saved, and stored on the
+row so that requests never redo the arithmetic and listings can sort and
+filter on the payable amount.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+PRICING_FIELDS = ['net_amount_paise', 'tax_amount_paise', 'gross_amount_paise']
+
+
+def to_paise(amount):
+    return int((Decimal(amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise):
+    return (Decimal(paise) / 100).quantize(Decimal('0.01'))
+
+
+def compute_amounts(price, tax_percent):
+    """
+    Return (net, tax, gross) in paise for a rupee price and a tax rate in
+    percent. Tax is rounded half-up to the nearest paisa.
+    """
+    net = to_paise(price)
+    tax = int((Decimal(net) * Decimal(tax_percent) / 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    return net, tax, net + tax
+
+
+def apply_pricing(service):
+    """
+    Set the stored amounts on `service` from its price and tax. Returns
+    True if any of them changed.
+    """
+    amounts = compute_amounts(service.service_price, service.service_tax)
+    changed = amounts != tuple(getattr(service, field) for field in PRICING_FIELDS)
+    for field, value in zip(PRICING_FIELDS, amounts):
+        setattr(service, field, value)
+    return changed
+
+
+def recompute_all(batch_size=1000):
+    """
+    Recompute the stored amounts of every Service, writing only the rows
+    whose amounts changed with one bulk UPDATE per batch. Returns
+    (checked, updated).
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from . import catalog, changefeed
+    from .models import Service
+
+    checked = updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Service.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'service_price', 'service_tax', *PRICING_FIELDS)[:batch_size]
+        )
+        if not batch:
+            break
+        changed = [service for service in batch if apply_pricing(service)]
+        if changed:
+            now = timezone.now()
+            for service in changed:
+                service.updated_at = now
+            with transaction.atomic():
+                Service.objects.bulk_update(changed, PRICING_FIELDS + ['updated_at'])
+                changefeed.record([service.pk for service in changed])
+        checked += len(batch)
+        updated += len(changed)
+        last_id = batch[-1].id
+    if updated:
+        # bulk_update() doesn't send post_save, so invalidate the catalog here
+        catalog.bump_catalog_version()
+    return checked, updated
+
+
+def repriced_amounts(percent):
+    """
+    Return update() keyword arguments that change service_price by
+    `percent` (at most two decimal places) and set the stored amounts to
+    match, so that any number of services are repriced by a single UPDATE.
+    Rounding follows compute_amounts(), in integer paise.
+    """
+    from django.db.models import DecimalField, ExpressionWrapper, F, IntegerField, Value
+    from django.db.models.functions import Cast, Round
+
+    factor = 10000 + int(Decimal(percent) * 100)  # in hundredths of a percent
+    if factor < 0:
+        raise ValueError('A price cannot drop by more than 100%.')
+    # Integer division, with +5000 rounding half up
+    net = (F('net_amount_paise') * factor + 5000) / 10000
+    tax_rate = Cast(Round(F('service_tax') * 100), IntegerField())
+    tax = (net * tax_rate + 5000) / 10000
+    return {
+        'service_price': ExpressionWrapper(
+            net * Value(Decimal('0.01')), output_field=DecimalField(max_digits=10, decimal_places=2)
+        ),
+        'net_amount_paise': net,
+        'tax_amount_paise': tax,
+        'gross_amount_paise': net + tax,
+    }
@@ -0,0 +1,189 @@
+"""
+Primary/replica database routing for catalog reads.
+
+ReplicaRouter sends reads of the catalog models to one of the
+DATABASE_REPLICAS aliases and everything else, including every write and
+any read inside a transaction on the primary, to the primary ('default').
+A request sticks to one replica, picked round robin or by fewest
+in-flight requests (DATABASE_REPLICA_SELECTION). A replica that can't be
+connected to is skipped for DATABASE_REPLICA_RETRY seconds, and with no
+replica available reads fall back to the primary.
+
+Replicas lag behind the primary, so ReplicaPinningMiddleware gives
+read-your-writes: once a request writes, it and the client's requests for
+the next DATABASE_PIN_SECONDS (tracked with a cookie) read from the
+primary only.
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .models import Service
+
+logger = logging.getLogger(__name__)
+
+# Models whose reads may be served by a replica
+REPLICATED_MODELS = {Service}
+
+
+class RequestState:
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state = contextvars.ContextVar('database_routing', default=None)
+
+
+class ReplicaPool:
+
+    def __init__(self, aliases, selection):
+        self.aliases = list(aliases)
+        self.selection = selection
+        self.lock = threading.Lock()
+        self.cycle = itertools.cycle(self.aliases)
+        self.in_flight = dict.fromkeys(self.aliases, 0)
+        self.down_until = {}
+
+    def is_available(self, alias):
+        if self.down_until.get(alias, 0) > time.monotonic():
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            logger.warning('Replica %s is unavailable, using other databases for %ss: %s',
+                           alias, settings.DATABASE_REPLICA_RETRY, e)
+            self.down_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY
+            return False
+        return True
+
+    def candidates(self):
+        with self.lock:
+            if self.selection == 'least_connections':
+                return sorted(self.aliases, key=self.in_flight.__getitem__)
+            first = next(self.cycle)
+        start = self.aliases.index(first)
+        return self.aliases[start:] + self.aliases[:start]
+
+    def acquire(self):
+        """
+        Return an available replica alias (counted as in flight until
+        release()), or None if there is none.
+        """
+        for alias in self.candidates():
+            if self.is_available(alias):
+                with self.lock:
+                    self.in_flight[alias] += 1
+                return alias
+        return None
+
+    def release(self, alias):
+        with self.lock:
+            self.in_flight[alias] -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ReplicaPool(settings.DATABASE_REPLICAS, settings.DATABASE_REPLICA_SELECTION)
+    return _pool
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model not in REPLICATED_MODELS or not settings.DATABASE_REPLICAS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction on the primary must see its writes
+            return DEFAULT_DB_ALIAS
+        state = _state.get()
+        if state is None:
+            # Outside a request (commands, workers): spread each read
+            pool = get_pool()
+            alias = pool.acquire()
+            if alias is not None:
+                pool.release(alias)
+            return alias
+        if state.pinned:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = get_pool().acquire() or DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary (see the sync_replicas command)
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Track database routing per request. Place it before SessionMiddleware
+    so that session writes pin the client too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(state, token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(state, token)
+        return self.pin(state, response)
+
+    def start(self, request):
+        state = RequestState(pinned=settings.DATABASE_PIN_COOKIE in request.COOKIES)
+        return state, _state.set(state)
+
+    def finish(self, state, token):
+        _state.reset(token)
+        if state.replica not in (None, DEFAULT_DB_ALIAS):
+            get_pool().release(state.replica)
+
+    def pin(self, state, response):
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                settings.DATABASE_PIN_COOKIE, '1', max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,236 @@
+"""
+Full-text search over the service catalog.
+
+On SQLite the index is an FTS5 virtual table (created by migration 0005)
+ranked with bm25. Other database backends fall back to an in-process
+inverted index. Both are kept up to date incrementally from the Service
+post_save/post_delete signals (see signals.py) and can be rebuilt in bulk
+with the `rebuild_search_index` management command.
+"""
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Service
+
+FTS_TABLE = 'IT_App_service_fts'
+
+# Indexed fields and their relative ranking weights
+SEARCH_FIELDS = ('service_name', 'service_package', 'payment_terms')
+FIELD_WEIGHTS = (10.0, 3.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class FTS5Backend:
+    """
+    SQLite FTS5 index keyed by Service id (the FTS rowid). Writes happen
+    on the same connection as the Service change, so they commit or roll
+    back together with it.
+    """
+
+    def index(self, services):
+        rows = [[service.pk] + [getattr(service, field) for field in SEARCH_FIELDS] for service in services]
+        if not rows:
+            return
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO "{FTS_TABLE}" (rowid, {", ".join(SEARCH_FIELDS)}) VALUES ({placeholders})',
+                rows,
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [[pk] for pk in ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{FTS_TABLE}"')
+
+    def search(self, text, limit):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        # Quote every token so user input can't use FTS5 query syntax; the
+        # last one is a prefix match for type-ahead.
+        match = ' '.join(f'"{token}"' for token in tokens) + '*'
+        weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS)
+        # bm25 costs a lookup per scored row, and a common word matches much
+        # of the catalog, so at most SEARCH_RANK_CANDIDATES matches are
+        # scored. When there are more, only the newest ones (the highest
+        # rowids) are ranked; the rowid range is a seek in the FTS index.
+        candidates = max(getattr(settings, 'SEARCH_RANK_CANDIDATES', 2000), limit)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s '
+                f'ORDER BY rowid DESC LIMIT 1 OFFSET %s',
+                [match, candidates - 1],
+            )
+            row = cursor.fetchone()
+            cursor.execute(
+                f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s AND rowid >= %s '
+                f'ORDER BY bm25("{FTS_TABLE}", {weights}) LIMIT %s',
+                [match, row[0] if row else 0, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """
+    Process-local inverted index for databases without FTS5. It is built
+    lazily from the database on first use and then maintained from the
+    signal handlers after each transaction commits.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.postings = defaultdict(dict)  # token -> {service id: weighted term frequency}
+        self.documents = {}  # service id -> set of tokens
+        self.vocabulary = []  # sorted tokens, for prefix lookups
+
+    def _load(self):
+        if not self.loaded:
+            self.loaded = True
+            self._add(Service.objects.only(*SEARCH_FIELDS).iterator(chunk_size=2000))
+
+    def _add(self, services):
+        new_tokens = False
+        for service in services:
+            self._discard(service.pk)
+            weights = defaultdict(float)
+            for field, weight in zip(SEARCH_FIELDS, FIELD_WEIGHTS):
+                for token in tokenize(getattr(service, field)):
+                    weights[token] += weight
+            for token, weight in weights.items():
+                if token not in self.postings:
+                    new_tokens = True
+                self.postings[token][service.pk] = weight
+            self.documents[service.pk] = set(weights)
+        if new_tokens:
+            self.vocabulary = sorted(self.postings)
+
+    def _discard(self, pk):
+        for token in self.documents.pop(pk, ()):
+            postings = self.postings[token]
+            postings.pop(pk, None)
+            if not postings:
+                del self.postings[token]
+
+    def index(self, services):
+        services = list(services)
+
+        def apply():
+            with self.lock:
+                if self.loaded:
+                    self._add(services)
+
+        transaction.on_commit(apply)
+
+    def remove(self, ids):
+        ids = list(ids)
+
+        def apply():
+            with self.lock:
+                for pk in ids:
+                    self._discard(pk)
+
+        transaction.on_commit(apply)
+
+    def clear(self):
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.vocabulary = []
+            self.loaded = True
+
+    def _prefix_terms(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, text, limit):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        with self.lock:
+            self._load()
+            total = len(self.documents) or 1
+            scores = None
+            # Every token must match; the last one may match as a prefix
+            for i, token in enumerate(tokens):
+                terms = self._prefix_terms(token) if i == len(tokens) - 1 else [token]
+                token_scores = defaultdict(float)
+                for term in terms:
+                    postings = self.postings.get(term, {})
+                    idf = math.log(1 + total / len(postings)) if postings else 0
+                    for pk, weight in postings.items():
+                        token_scores[pk] += weight * idf
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pk: score + token_scores[pk] for pk, score in scores.items() if pk in token_scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [pk for pk, score in ranked[:limit]]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+                if name == 'auto':
+                    name = 'fts5' if connection.vendor == 'sqlite' else 'python'
+                _backend = FTS5Backend() if name == 'fts5' else InvertedIndexBackend()
+    return _backend
+
+
+def search_services(text, limit=20):
+    """
+    Return up to `limit` Services matching `text`, best match first.
+    """
+    ids = get_backend().search(text, limit)
+    services = Service.objects.in_bulk(ids)
+    return [services[pk] for pk in ids if pk in services]
+
+
+def rebuild_index(batch_size=2000):
+    """
+    Drop and repopulate the search index from the Service table. Returns
+    the number of indexed services.
+    """
+    backend = get_backend()
+    count = 0
+    with transaction.atomic():
+        backend.clear()
+        batch = []
+        for service in Service.objects.only(*SEARCH_FIELDS).iterator(chunk_size=batch_size):
+            batch.append(service)
+            if len(batch) >= batch_size:
+                backend.index(batch)
+                count += len(batch)
+                batch = []
+        backend.index(batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import backends, catalog, changefeed, instrumentation, search
+from .models import Service, ServiceChange
+
+
+# Any change to a Service invalidates the cached catalog, once it is
+# committed: bumped earlier, a concurrent reader could cache the old rows
+# under the new version
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(catalog.bump_catalog_version)
+
+
+# Append to the change feed read by downstream consumers
+@receiver(post_save, sender=Service)
+def record_service_saved(sender, instance, **kwargs):
+    changefeed.record([instance.pk])
+
+
+@receiver(post_delete, sender=Service)
+def record_service_deleted(sender, instance, **kwargs):
+    changefeed.record([instance.pk], ServiceChange.DELETE)
+
+
+# Keep the full-text search index in step with the Service table
+@receiver(post_save, sender=Service)
+def index_service(sender, instance, **kwargs):
+    search.get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Service)
+def unindex_service(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
+
+
+# Drop the cached copy used by CachedModelBackend (including on login,
+# which saves last_login)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    backends.forget_user(instance.pk)
+
+
+# Record per-request query counts and timings on every database connection
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
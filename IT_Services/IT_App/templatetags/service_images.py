@@ -0,0 +1,53 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+# <source> type per variant format, best compression first
+SOURCE_TYPES = [
+    ('avif', 'image/avif'),
+    ('webp', 'image/webp'),
+]
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in sorted(variants.items(), key=lambda item: int(item[0]))
+    )
+
+
+@register.simple_tag
+def service_srcset(service, fmt='jpeg'):
+    """The srcset attribute value for one variant format of a service image."""
+    return _srcset((service.image_variants or {}).get(fmt, {}))
+
+
+@register.simple_tag
+def service_picture(service, sizes='100vw', width=None):
+    """
+    Render a <picture> for the service image that lets the browser pick the
+    smallest suitable variant. Falls back to the original image until the
+    variants have been generated.
+    """
+    variants = service.image_variants or {}
+    if not service.service_image:
+        return ''
+    if not variants:
+        return format_html(
+            '<img src="{}" alt="{}"{}>',
+            service.service_image.url, service.service_name,
+            format_html(' width="{}"', width) if width else '',
+        )
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, _srcset(variants[fmt]), sizes) for fmt, mime in SOURCE_TYPES if variants.get(fmt)),
+    )
+    fallback = variants.get('jpeg') or next(iter(variants.values()))
+    smallest = min(fallback.items(), key=lambda item: int(item[0]))[1]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        sources, default_storage.url(smallest), _srcset(fallback), sizes, service.service_name,
+        format_html(' width="{}"', width) if width else '',
+    )
@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from IT_App import changefeed
+from IT_App.models import Service, ServiceChange
+
+from .utils import make_service
+
+
+class ServiceAdminActionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+    def action(self, action, selected, **data):
+        return self.client.post(reverse('admin:IT_App_service_changelist'), {
+            'action': action, 'index': '0', '_selected_action': selected, **data,
+        })
+
+    def test_deactivate_all_records_every_deactivated_service(self):
+        services = [make_service(f'Service {i}') for i in range(3)]
+        make_service('Already inactive', active=False)
+        cursor = ServiceChange.objects.latest('id').id
+        response = self.action('deactivate', [services[0].pk], select_across='1')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Service.objects.filter(active=True).exists())
+        self.assertEqual(
+            list(ServiceChange.objects.filter(id__gt=cursor).values_list('service_id', flat=True)),
+            [service.pk for service in services],
+        )
+
+    def test_reprice_updates_the_stored_amounts(self):
+        services = [make_service('Backup'), make_service('Firewall')]
+        self.action('reprice', [services[0].pk], percent='10')
+        self.assertEqual(
+            list(Service.objects.order_by('id').values_list('service_price', 'gross_amount_paise')),
+            [(110, 12980), (100, 11800)],
+        )
+
+    def test_reprice_needs_a_percent(self):
+        service = make_service()
+        response = self.action('reprice', [service.pk], percent='')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Service.objects.get().service_price, 100)
+
+    def test_change_list_filters_by_price_band(self):
+        make_service('Backup', price='100.00')
+        make_service('Firewall', price='5000.00')
+        response = self.client.get(reverse('admin:IT_App_service_changelist'), {'price_band': 'under-1000'})
+        self.assertEqual([service.service_name for service in response.context['cl'].result_list], ['Backup'])
+
+
+class RecordQuerysetTests(TestCase):
+
+    def test_queryset_is_recorded_with_one_statement(self):
+        services = [make_service(f'Service {i}', active=i % 2 == 0) for i in range(4)]
+        cursor = ServiceChange.objects.latest('id').id
+        with self.assertNumQueries(1):
+            self.assertEqual(changefeed.record_queryset(Service.objects.filter(active=True).order_by('-id')), 2)
+        self.assertEqual(
+            list(ServiceChange.objects.filter(id__gt=cursor).values_list('service_id', 'action')),
+            [(services[0].pk, 'upsert'), (services[2].pk, 'upsert')],
+        )
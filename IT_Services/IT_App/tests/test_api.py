@@ -0,0 +1,105 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from IT_App import api, async_views
+
+from .utils import make_service
+
+
+class APIAuthenticationTests(TestCase):
+
+    def test_anonymous_requests_get_a_json_401(self):
+        service = make_service()
+        for url in (
+            reverse('api_service_list'),
+            reverse('api_service_detail', args=[service.pk]),
+            reverse('api_service_search'),
+            reverse('api_service_changes'),
+            reverse('api_service_change_stream'),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 401, url)
+            self.assertEqual(response.json(), {'error': 'Authentication required.'})
+
+    async def test_async_stream_rejects_anonymous_requests(self):
+        async def auser():
+            return AnonymousUser()
+
+        request = RequestFactory().get('/')
+        request.auser = auser
+        response = await async_views.service_change_stream(request)
+        self.assertEqual(response.status_code, 401)
+
+
+class ConditionalResponseTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('alice'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service = make_service()
+        self.urls = [reverse('api_service_list'), reverse('api_service_detail', args=[self.service.pk])]
+        # Warm the session, user and catalog caches
+        for url in self.urls:
+            self.client.get(url)
+
+    def test_responses_carry_validators(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('"'))
+            self.assertIn('Last-Modified', response)
+            self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'no-cache'})
+
+    def test_unchanged_resource_is_revalidated_without_queries(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+                self.assertEqual(
+                    self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']}).status_code, 304,
+                )
+
+    def test_saving_a_service_changes_the_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.service_name = 'Cloud backup'
+            self.service.save()
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['service_name'], 'Cloud backup')
+
+    def test_etag_depends_on_the_fields(self):
+        url = self.urls[1]
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'fields': 'id'})['ETag'])
+
+
+class FieldsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('alice'))
+        self.service = make_service(price='113.63')
+
+    def test_fields_subset_the_output(self):
+        detail = self.client.get(reverse('api_service_detail', args=[self.service.pk]), {'fields': 'id,service_price,gross_amount_paise'})
+        self.assertEqual(detail.json(), {'id': self.service.pk, 'service_price': '113.63', 'gross_amount_paise': 13408})
+        listing = self.client.get(reverse('api_service_list'), {'fields': 'service_name'})
+        self.assertEqual(listing.json()['results'], [{'service_name': 'Backup'}])
+
+    def test_all_fields_by_default(self):
+        data = self.client.get(reverse('api_service_detail', args=[self.service.pk])).json()
+        self.assertEqual(list(data), api.SERVICE_FIELDS)
+
+    def test_unknown_fields_are_rejected(self):
+        for fields in ('id,password', ','):
+            with self.subTest(fields=fields):
+                response = self.client.get(reverse('api_service_list'), {'fields': fields})
+                self.assertEqual(response.status_code, 400)
+        # Empty items, e.g. from a trailing comma, are ignored
+        response = self.client.get(reverse('api_service_list'), {'fields': 'service_name,'})
+        self.assertEqual(response.json()['results'], [{'service_name': 'Backup'}])
@@ -0,0 +1,163 @@
+import hashlib
+import hmac
+import importlib
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import clear_url_caches, resolve, reverse
+
+from IT_App import api, async_views, payments, urls, views
+from IT_App.fake_gateway import FakeRazorpayServer
+from IT_App.models import Order, Subscription
+
+from .utils import PaymentTestCase, make_service
+
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="[^"]+"')
+
+
+def reload_urls():
+    importlib.reload(urls)
+    # The project URLconf holds a resolver for the app URLs that has already
+    # cached their patterns
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+class AsyncViewsMixin:
+    """Serves the URLs from async_views, as with ASYNC_VIEWS = True."""
+
+    def setUp(self):
+        super().setUp()
+        # Registered first so it runs after the settings are restored
+        self.addCleanup(reload_urls)
+        self.enterContext(override_settings(ASYNC_VIEWS=True))
+        reload_urls()
+
+
+class URLSwapTests(AsyncViewsMixin, TestCase):
+
+    def test_async_views_replace_their_sync_counterparts(self):
+        for name, args, view in [
+            ('login', [], async_views.login_view),
+            ('home', [], async_views.home),
+            ('service_detail', [1], async_views.service_detail),
+            ('subscribe_service', [1], async_views.subscribe_service),
+            ('payment_callback', [], async_views.payment_callback),
+            ('api_service_change_stream', [], async_views.service_change_stream),
+        ]:
+            self.assertEqual(resolve(reverse(name, args=args)).func, view, name)
+        self.assertEqual(resolve(reverse('register')).func, views.register)
+
+    def test_sync_views_are_restored(self):
+        with override_settings(ASYNC_VIEWS=False):
+            reload_urls()
+            self.assertEqual(resolve(reverse('home')).func, views.home)
+            self.assertEqual(resolve(reverse('api_service_change_stream')).func, api.service_change_stream)
+
+
+class CatalogParityTests(AsyncViewsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user('alice')
+        self.services = [make_service(f'Service {i}', price=f'{100 + i}.00') for i in range(3)]
+        make_service('Retired', active=False)
+
+    def html(self, response):
+        self.assertEqual(response.status_code, 200)
+        return CSRF_TOKEN_RE.sub('', response.content.decode())
+
+    async def test_pages_match_the_sync_views(self):
+        await self.async_client.aforce_login(self.user)
+        await self.client.aforce_login(self.user)
+        for url in (
+            reverse('home'),
+            reverse('home') + '?limit=2',
+            reverse('service_detail', args=[self.services[1].pk]),
+        ):
+            with self.subTest(url=url):
+                expected = self.html(await views_response(self.client, url))
+                response = await self.async_client.get(url)
+                self.assertIn(response.resolver_match.func, (async_views.home, async_views.service_detail))
+                self.assertEqual(self.html(response), expected)
+
+    async def test_missing_service_is_a_404(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('service_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+async def views_response(client, url):
+    """GET `url` from the sync views, whatever the URLs currently point at."""
+    from asgiref.sync import sync_to_async
+
+    def get():
+        with override_settings(ASYNC_VIEWS=False):
+            reload_urls()
+            try:
+                return client.get(url)
+            finally:
+                with override_settings(ASYNC_VIEWS=True):
+                    reload_urls()
+
+    return await sync_to_async(get)()
+
+
+class AsyncCheckoutTests(AsyncViewsMixin, PaymentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeRazorpayServer()
+        self.addCleanup(self.server.stop)
+        self.enterContext(override_settings(RAZORPAY_BASE_URL=self.server.start()))
+        payments.reset_gateway()
+        self.addCleanup(payments.reset_gateway)
+
+    def callback_data(self, order_id, payment_id='pay_1'):
+        message = f'{order_id}|{payment_id}'.encode()
+        signature = hmac.new(settings.RAZORPAY_KEY_SECRET.encode(), message, hashlib.sha256).hexdigest()
+        return {'razorpay_order_id': order_id, 'razorpay_payment_id': payment_id, 'razorpay_signature': signature}
+
+    async def test_checkout_creates_the_gateway_order(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('subscribe_service', args=[self.service.pk]), {'address': '1 Main Street'},
+        )
+        self.assertEqual(response.status_code, 200)
+        order = await Order.objects.aget()
+        self.assertEqual(response.context['order_id'], order.gateway_order_id)
+        self.assertEqual(self.server.orders[order.gateway_order_id]['receipt'], order.receipt)
+        self.assertEqual(order.amount_paise, self.service.gross_amount_paise)
+
+    async def test_gateway_outage_is_reported(self):
+        self.server.proxy_errors = 10
+        gateway = payments.get_gateway()
+        gateway.retry_backoff = 0
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('subscribe_service', args=[self.service.pk]), {'address': '1 Main Street'},
+        )
+        self.assertContains(response, 'The payment gateway is not responding')
+        self.assertEqual((await Order.objects.aget()).status, Order.FAILED)
+
+    async def test_replayed_callback_subscribes_once(self):
+        await Order.objects.acreate(
+            user=self.user, service=self.service, service_name=self.service.service_name,
+            receipt='receipt-1', gateway_order_id='order_1', amount_paise=11800, address='1 Main Street',
+        )
+        for _ in range(2):
+            response = await self.async_client.post(reverse('payment_callback'), self.callback_data('order_1'))
+            self.assertEqual(response.json(), {'status': 'Payment Successful'})
+        self.assertEqual(await Subscription.objects.acount(), 1)
+        self.assertEqual((await Order.objects.aget()).status, Order.PAID)
+
+    async def test_bad_signature_and_unknown_order(self):
+        data = {**self.callback_data('order_1'), 'razorpay_signature': 'forged'}
+        response = await self.async_client.post(reverse('payment_callback'), data)
+        self.assertEqual(response.json(), {'status': 'Payment Verification Failed'})
+        response = await self.async_client.post(reverse('payment_callback'), self.callback_data('order_missing'))
+        self.assertEqual(response.json(), {'status': 'Unknown Order'})
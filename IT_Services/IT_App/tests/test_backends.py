@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from IT_App import backends
+
+
+class CachedModelBackendTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backend = backends.CachedModelBackend()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+
+    def test_cached_user_is_loaded_without_queries(self):
+        self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_logged_in_pages_need_no_session_or_user_queries(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.backend.get_user(self.user.pk)
+        self.user.first_name = 'Alice'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk).first_name, 'Alice')
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+        self.user.set_password('new-pass')
+        self.user.save()
+        response = self.client.get(reverse('home'))
+        self.assertRedirects(response, f'{settings.LOGIN_URL}?next=/', fetch_redirect_response=False)
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+        self.assertEqual(self.client.get(reverse('home')).status_code, 302)
+
+    def test_deleted_user_is_forgotten(self):
+        self.backend.get_user(self.user.pk)
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user(user_id))
+
+
+class UnverifiedUsersTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bob', 'bob@example.com', 'secret-pass', is_active=False)
+
+    def test_pending_accounts(self):
+        User.objects.create_user('carol', is_active=False, last_login=timezone.now())
+        User.objects.create_user('dave')
+        self.assertEqual(list(backends.unverified_users()), [self.user])
+
+    def test_verification_reads_the_database_not_the_cache(self):
+        backends.CachedModelBackend().get_user(self.user.pk)
+        # Activated elsewhere without a post_save, so the cached copy is stale
+        User.objects.filter(pk=self.user.pk).update(is_active=True, last_login=timezone.now())
+        self.assertFalse(backends.unverified_users().filter(pk=self.user.pk).exists())
+
+        session = self.client.session
+        session['user_id'] = self.user.pk
+        session.save()
+        self.assertEqual(self.client.post(reverse('resend_otp')).status_code, 404)
@@ -0,0 +1,132 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse, set_script_prefix
+
+from IT_App import catalog, catalog_io, pricing
+from IT_App.models import Service
+from IT_App.pagination import CatalogQuery
+
+from .utils import make_service
+
+
+class CatalogVersionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_moves_when_the_write_commits(self):
+        version = catalog.get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            make_service()
+            # Still the old version while the transaction is open
+            self.assertEqual(catalog.get_catalog_version(), version)
+        self.assertEqual(len(callbacks), 1)
+        self.assertGreater(catalog.get_catalog_version(), version)
+
+    def test_cached_service_is_refreshed_after_a_change(self):
+        service = make_service()
+        self.assertEqual(catalog.get_service(service.pk).service_name, 'Backup')
+        with self.captureOnCommitCallbacks(execute=True):
+            service.service_name = 'Cloud backup'
+            service.save()
+        self.assertEqual(catalog.get_service(service.pk).service_name, 'Cloud backup')
+
+    def test_missing_service_is_cached_too(self):
+        self.assertIsNone(catalog.get_service(12345))
+        with self.assertNumQueries(0):
+            self.assertIsNone(catalog.get_service(12345))
+
+    def test_page_is_served_from_the_cache_until_the_catalog_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_service('Backup')
+        query = CatalogQuery.from_params({}, active=True)
+        html, _ = catalog.render_page('_home_service.html', query)
+        self.assertIn('Backup', html)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog.render_page('_home_service.html', query)[0], html)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_service('Firewall')
+        html, _ = catalog.render_page('_home_service.html', query)
+        self.assertIn('Firewall', html)
+
+
+class FragmentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.services = [make_service('Backup'), make_service('Firewall')]
+        self.query = CatalogQuery.from_params({}, active=True)
+
+    def render(self, template_name='_home_service.html'):
+        with mock.patch.object(catalog, 'render_item', wraps=catalog.render_item) as render_item:
+            html, _ = catalog.render_page(template_name, self.query)
+        return html, [call.args[1].service_name for call in render_item.call_args_list]
+
+    def assertPriceChanged(self, service, price):
+        updated_at = service.updated_at
+        service.refresh_from_db()
+        # The item key moves with updated_at, so the row is rendered again
+        self.assertGreater(service.updated_at, updated_at)
+        html, rendered = self.render()
+        self.assertEqual(rendered, [service.service_name])
+        self.assertIn(f'<strong>{service.service_name}</strong> - ${price}', html)
+
+    def test_only_changed_items_are_rendered_again(self):
+        html, rendered = self.render()
+        self.assertEqual(sorted(rendered), ['Backup', 'Firewall'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.services[0].service_name = 'Cloud backup'
+            self.services[0].save()
+        html, rendered = self.render()
+        self.assertEqual(rendered, ['Cloud backup'])
+        self.assertIn('Cloud backup', html)
+        self.assertIn('Firewall', html)
+        # Each template keeps fragments of its own
+        self.assertEqual(sorted(self.render('_service_list_service.html')[1]), ['Cloud backup', 'Firewall'])
+
+    def test_item_urls_are_filled_in_per_row(self):
+        html, _ = self.render()
+        for service in self.services:
+            self.assertIn(f'<a href="{reverse("service_detail", args=[service.pk])}">View</a>', html)
+            self.assertIn(f'<a href="{reverse("subscribe_service", args=[service.pk])}">Buy</a>', html)
+        self.assertNotIn(catalog.URL_MARKER, html)
+
+        set_script_prefix('/shop/')
+        self.addCleanup(set_script_prefix, '/')
+        catalog.bump_catalog_version()
+        html, rendered = self.render()
+        # Cached items carry URLs for the old prefix, so they are rendered again
+        self.assertEqual(len(rendered), 2)
+        url = reverse('service_detail', args=[self.services[0].pk])
+        self.assertTrue(url.startswith('/shop/'))
+        self.assertIn(f'<a href="{url}">View</a>', html)
+
+    def test_admin_bulk_actions_move_updated_at(self):
+        self.render()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:IT_App_service_changelist'), {
+                'action': 'reprice', 'percent': '10', 'index': '0', '_selected_action': [self.services[0].pk],
+            })
+        self.assertPriceChanged(self.services[0], '110.00')
+
+    def test_recompute_all_moves_updated_at(self):
+        self.render()
+        Service.objects.filter(pk=self.services[0].pk).update(service_price=Decimal('50.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(pricing.recompute_all(), (2, 1))
+        self.assertPriceChanged(self.services[0], '50.00')
+
+    def test_import_moves_updated_at(self):
+        self.render()
+        row = next(catalog_io.iter_rows(Service.objects.filter(pk=self.services[0].pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = catalog_io.import_services([{**row, 'service_price': '200.00', 'service_image': 'services/backup.png'}])
+        self.assertEqual(counts['updated'], 1)
+        self.assertPriceChanged(self.services[0], '200.00')
@@ -0,0 +1,152 @@
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+
+from IT_App import catalog_io, search
+from IT_App.models import Service
+
+from .utils import make_service
+
+
+def export(fmt, queryset=None):
+    return ''.join(catalog_io.EXPORTERS[fmt](catalog_io.iter_rows(queryset)))
+
+
+class RoundTripTests(TestCase):
+
+    def setUp(self):
+        self.services = [
+            make_service('Backup', price='113.63', service_image='services/backup.png'),
+            make_service('Firewall, managed', price='20.00', service_image='services/firewall.png', active=False),
+        ]
+
+    def snapshot(self):
+        return list(Service.objects.order_by('id').values_list(*catalog_io.FIELDS, *catalog_io.pricing.PRICING_FIELDS))
+
+    def test_export_then_import_changes_nothing(self):
+        for fmt in catalog_io.FORMATS:
+            with self.subTest(fmt=fmt):
+                before = self.snapshot()
+                rows = catalog_io.READERS[fmt](io.StringIO(export(fmt), newline=''))
+                counts = catalog_io.import_services(rows, batch_size=1)
+                self.assertEqual((counts['created'], counts['updated'], counts['invalid']), (0, 2, 0))
+                self.assertEqual(self.snapshot(), before)
+
+    def test_edited_rows_update_and_rows_without_an_id_are_created(self):
+        rows = [json.loads(line) for line in export('jsonl').splitlines()]
+        rows[0]['service_price'] = '200.00'
+        rows.append({**rows[1], 'id': None, 'service_name': 'Cloud storage'})
+
+        counts = catalog_io.import_services(rows)
+
+        self.assertEqual((counts['created'], counts['updated']), (1, 2))
+        backup = Service.objects.get(pk=self.services[0].pk)
+        self.assertEqual((backup.service_price, backup.gross_amount_paise), (200, 23600))
+        created = Service.objects.get(service_name='Cloud storage')
+        self.assertFalse(created.active)
+        self.assertEqual(search.search_services('cloud'), [created])
+
+
+class InvalidRowTests(TestCase):
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        good = {
+            'service_name': 'Backup', 'payment_terms': 'Monthly', 'service_price': '10.00',
+            'service_package': 'Basic', 'service_tax': '18.00', 'service_image': 'services/backup.png',
+        }
+        lines = [
+            json.dumps(good),
+            '{"service_name": "Truncated",',
+            json.dumps({**good, 'service_price': 'free'}),
+            '["not", "an", "object"]',
+            '',
+            json.dumps({**good, 'id': 'abc'}),
+            json.dumps({**good, 'service_name': 'Firewall'}),
+        ]
+        errors = []
+        counts = catalog_io.import_services(
+            catalog_io.read_jsonl(io.StringIO('\n'.join(lines))), batch_size=2,
+            on_error=lambda line, row_errors: errors.append((line, row_errors)),
+        )
+
+        self.assertEqual((counts['created'], counts['invalid']), (2, 4))
+        self.assertEqual([line for line, _ in errors], [2, 3, 4, 5])
+        self.assertEqual(errors[0][1], {'__all__': ["Invalid JSON: Expecting property name enclosed in double quotes."]})
+        self.assertEqual(list(errors[1][1]), ['service_price'])
+        self.assertEqual(errors[2][1], {'__all__': ['Expected a JSON object.']})
+        self.assertEqual(errors[3][1], {'id': ['Enter a whole number.']})
+        self.assertEqual(sorted(Service.objects.values_list('service_name', flat=True)), ['Backup', 'Firewall'])
+
+
+class StreamingExportTests(TestCase):
+
+    def test_rows_are_read_lazily_in_one_query(self):
+        for i in range(5):
+            make_service(f'Service {i}')
+        with self.assertNumQueries(0):
+            stream = catalog_io.EXPORTERS['csv'](catalog_io.iter_rows(chunk_size=2))
+            self.assertEqual(next(stream), ','.join(catalog_io.FIELDS) + '\r\n')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(stream)), 5)
+
+    def test_admin_export_action_streams(self):
+        services = [make_service(f'Service {i}') for i in range(3)]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        response = self.client.post(reverse('admin:IT_App_service_changelist'), {
+            'action': 'export_jsonl', 'index': '0', '_selected_action': [services[0].pk, services[2].pk],
+        })
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="services.jsonl"')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [services[0].pk, services[2].pk])
+
+
+class AdminImportTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+    def upload(self, name, content, **data):
+        return self.client.post(reverse('admin:IT_App_service_import'), {
+            'file': SimpleUploadedFile(name, content.encode()), **data,
+        })
+
+    def messages(self, response):
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_upload_imports_and_reports_invalid_rows(self):
+        service = make_service('Backup', service_image='services/backup.png')
+        content = export('csv').replace('Backup', 'Cloud backup') + 'x,Firewall,Monthly,free,Basic,18.00,a.png,True\r\n'
+        response = self.upload('services.csv', content)
+
+        self.assertRedirects(response, reverse('admin:IT_App_service_changelist'))
+        messages = self.messages(response)
+        self.assertTrue(messages[0].startswith('Created 0 services, updated 1, skipped 1 invalid rows'))
+        self.assertEqual(messages[1], 'Row 2: service_price: Enter a number.')
+        service.refresh_from_db()
+        self.assertEqual(service.service_name, 'Cloud backup')
+
+    def test_format_comes_from_the_form_or_the_file_name(self):
+        row = json.dumps({
+            'service_name': 'Backup', 'payment_terms': 'Monthly', 'service_price': '10.00',
+            'service_package': 'Basic', 'service_tax': '18.00', 'service_image': 'services/backup.png',
+        })
+        self.upload('services.jsonl', row + '\n{oops\n')
+        self.upload('upload.txt', row, format='jsonl')
+        self.assertEqual(Service.objects.count(), 2)
+
+    def test_change_list_links_to_the_import(self):
+        response = self.client.get(reverse('admin:IT_App_service_changelist'))
+        self.assertContains(response, reverse('admin:IT_App_service_import'))
+        self.assertEqual(self.client.get(reverse('admin:IT_App_service_import')).status_code, 200)
+
+    def test_staff_without_add_permission_is_turned_away(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.upload('services.csv', export('csv'))
+        self.assertEqual(response.status_code, 302)
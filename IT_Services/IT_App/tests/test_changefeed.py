@@ -0,0 +1,111 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from IT_App import changefeed, pricing
+from IT_App.models import Service, ServiceChange
+
+from .utils import make_service
+
+
+class ChangeFeedTests(TestCase):
+
+    def test_saves_and_deletes_are_recorded(self):
+        kept = make_service('Kept')
+        gone = make_service('Gone')
+        kept.active = False
+        kept.save()
+        gone_id = gone.pk
+        gone.delete()
+
+        self.assertEqual(
+            list(ServiceChange.objects.order_by('id').values_list('service_id', 'action')),
+            [(kept.pk, 'upsert'), (gone_id, 'upsert'), (kept.pk, 'upsert'), (gone_id, 'delete')],
+        )
+        entries, next_cursor, has_more = changefeed.changes_since(0, 100)
+        # One entry per service, with its current state
+        self.assertEqual([(change.service_id, action) for change, action, _ in entries],
+                         [(kept.pk, 'upsert'), (gone_id, 'delete')])
+        self.assertFalse(entries[0][2].active)
+        self.assertIsNone(entries[1][2])
+        self.assertEqual(next_cursor, ServiceChange.objects.latest('id').id)
+        self.assertFalse(has_more)
+        self.assertEqual(changefeed.changes_since(next_cursor, 100), ([], next_cursor, False))
+
+    def test_service_deleted_after_the_page_is_reported_deleted(self):
+        service = make_service()
+        first = ServiceChange.objects.get()
+        make_service('Other')
+        service.delete()
+        entries, next_cursor, has_more = changefeed.changes_since(0, 1)
+        self.assertEqual([(change.id, action) for change, action, _ in entries], [(first.id, 'delete')])
+        self.assertEqual(next_cursor, first.id)
+        self.assertTrue(has_more)
+
+    def test_bulk_writes_are_recorded(self):
+        service = make_service()
+        Service.objects.filter(pk=service.pk).update(net_amount_paise=1)
+        cursor = ServiceChange.objects.latest('id').id
+        self.assertEqual(pricing.recompute_all(), (1, 1))
+        entries, _, _ = changefeed.changes_since(cursor, 100)
+        self.assertEqual([change.service_id for change, _, _ in entries], [service.pk])
+
+    def test_compaction_keeps_the_last_change_of_every_service(self):
+        kept = make_service('Kept')
+        kept.save()
+        kept.save()
+        gone = make_service('Gone')
+        gone_id = gone.pk
+        gone.delete()
+        last = {ServiceChange.objects.filter(service_id=pk).latest('id').id for pk in (kept.pk, gone_id)}
+
+        self.assertEqual(changefeed.compact(timedelta(0)), 3)
+
+        self.assertEqual(set(ServiceChange.objects.values_list('id', flat=True)), last)
+        self.assertEqual(ServiceChange.objects.get(service_id=gone_id).action, ServiceChange.DELETE)
+
+    def test_recent_changes_are_not_compacted(self):
+        service = make_service()
+        service.save()
+        self.assertEqual(changefeed.compact(timedelta(days=1)), 0)
+
+
+
+class ChangeFeedAPITests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('alice'))
+
+    def test_changes_are_paged_by_cursor(self):
+        first = make_service('First')
+        second = make_service('Second')
+        response = self.client.get(reverse('api_service_changes'), {'limit': 1})
+        data = response.json()
+        self.assertEqual([result['id'] for result in data['results']], [first.pk])
+        self.assertEqual(data['results'][0]['service']['service_name'], 'First')
+        self.assertTrue(data['has_more'])
+
+        data = self.client.get(reverse('api_service_changes'), {'cursor': data['next_cursor']}).json()
+        self.assertEqual([result['id'] for result in data['results']], [second.pk])
+        self.assertFalse(data['has_more'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api_service_changes'), {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CHANGE_FEED_STREAM_TIMEOUT=0.1)
+    def test_stream_resumes_from_the_last_event_id(self):
+        first = make_service('First')
+        second = make_service('Second')
+        last_event_id = ServiceChange.objects.get(service_id=first.pk).id
+        response = self.client.get(reverse('api_service_change_stream'), headers={'Last-Event-ID': str(last_event_id)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = b''.join(response.streaming_content).decode().split('\n\n')
+        self.assertTrue(events[0].startswith('retry: '))
+        change = ServiceChange.objects.get(service_id=second.pk)
+        self.assertTrue(events[1].startswith(f'id: {change.id}\nevent: upsert\ndata: '))
+        self.assertEqual(json.loads(events[1].split('data: ', 1)[1])['service']['service_name'], 'Second')
+        self.assertEqual(events[2:], [''])
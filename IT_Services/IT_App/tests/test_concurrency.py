@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase
+
+from IT_App.models import OutboundEmail, Service
+from IT_App.otp import DatabaseOTPBackend
+from IT_App.pagination import CatalogQuery
+
+
+class SQLiteWriteConcurrencyTests(TransactionTestCase):
+    """
+    Many threads registering users, issuing OTPs, editing services and
+    reading the catalog at once must never hit "database is locked" (see
+    IT_Services/database.py; tests run on a database file, not in memory).
+    """
+    threads = 12
+    duration = 3.0
+    write_ratio = 0.3
+
+    def setUp(self):
+        Service.objects.bulk_create([
+            Service(
+                service_name=f'Stress service {i}', payment_terms='Monthly', service_price=Decimal(100 + i),
+                service_package='Basic', service_tax=Decimal('18.00'), service_image='services/stress.jpg',
+            )
+            for i in range(200)
+        ])
+        self.service_ids = list(Service.objects.values_list('id', flat=True))
+        User.objects.bulk_create([User(username=f'stress_user_{i}', password='!') for i in range(100)])
+        self.user_ids = list(User.objects.values_list('id', flat=True))
+
+    # The write paths of registration (user + queued OTP email in one
+    # transaction), of issuing an OTP (update_or_create: a read, then a
+    # write, in one transaction) and of editing a service (save with its
+    # signal handlers)
+    def register(self, n):
+        with transaction.atomic():
+            user = User(username=f'stress_{threading.get_ident()}_{n}', email='stress@example.com', is_active=False)
+            user.set_unusable_password()
+            user.save()
+            OutboundEmail.objects.create(subject='Your OTP Code', body='Your OTP is 123456', to=user.email)
+
+    def issue_otp(self, n):
+        DatabaseOTPBackend().issue(random.choice(self.user_ids))
+
+    def edit_service(self, n):
+        service = Service.objects.get(pk=random.choice(self.service_ids))
+        service.service_price = Decimal(100 + n % 500)
+        service.save()
+
+    def read_catalog(self, n):
+        query = CatalogQuery.from_params({'order': random.choice(['id', 'price'])}, active=True)
+        query.paginate(Service.objects.all())
+        Service.objects.get(pk=random.choice(self.service_ids))
+
+    def test_no_lock_errors_under_concurrent_writes(self):
+        lock = threading.Lock()
+        operations = Counter()
+        errors = Counter()
+        deadline = time.monotonic() + self.duration
+
+        def worker():
+            n = 0
+            try:
+                while time.monotonic() < deadline:
+                    n += 1
+                    if random.random() < self.write_ratio:
+                        operation = (self.register, self.issue_otp, self.edit_service)[n % 3]
+                    else:
+                        operation = self.read_catalog
+                    try:
+                        operation(n)
+                        failed = None
+                    except OperationalError as e:
+                        failed = str(e)
+                    with lock:
+                        operations[operation.__name__] += 1
+                        if failed:
+                            errors[failed] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, Counter())
+        for name in ('register', 'issue_otp', 'edit_service', 'read_catalog'):
+            self.assertGreater(operations[name], 0, name)
+        self.assertEqual(
+            User.objects.filter(username__startswith='stress_').exclude(username__startswith='stress_user_').count(),
+            operations['register'],
+        )
+
+
+class SQLiteSettingsTests(TransactionTestCase):
+
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store'):
+                cursor.execute(f'PRAGMA {pragma}')
+                pragmas[pragma] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+
+    def test_write_gate_is_held_for_the_transaction(self):
+        self.assertFalse(connection.holds_write_gate)
+        with transaction.atomic():
+            User.objects.create(username='alice')
+            self.assertTrue(connection.holds_write_gate)
+        self.assertFalse(connection.holds_write_gate)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from IT_App import ledger, payments
+from IT_App.fake_gateway import FakeRazorpayServer
+from IT_App.models import Order
+
+from .utils import PaymentTestCase
+
+
+class PaymentGatewayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeRazorpayServer()
+        self.addCleanup(self.server.stop)
+        self.server.start()
+
+    def gateway(self, **options):
+        gateway = payments.PaymentGateway(
+            settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET, base_url=self.server.base_url,
+            retry_backoff=0, **options,
+        )
+        self.addCleanup(gateway.executor.shutdown)
+        return gateway
+
+    def test_lost_response_is_not_retried_into_a_second_order(self):
+        self.server.drop_responses = 1
+        order = self.gateway().create_order(11800, receipt='receipt-1')
+        self.assertEqual(list(self.server.orders), [order['id']])
+        self.assertEqual(order['receipt'], 'receipt-1')
+
+    def test_slow_gateway_times_out(self):
+        self.server.latency = 0.5
+        with self.assertRaises(payments.GatewayUnavailable):
+            self.gateway(timeout=(1, 0.1), max_retries=0).create_order(11800)
+
+    async def test_async_order_creation(self):
+        order = await self.gateway().acreate_order(11800, receipt='receipt-1')
+        self.assertEqual(self.server.orders[order['id']]['amount'], 11800)
+
+
+class CreateOrderTests(PaymentTestCase):
+
+    def setUp(self):
+        self.server = FakeRazorpayServer()
+        self.addCleanup(self.server.stop)
+        base_url = self.server.start()
+        self.enterContext(override_settings(RAZORPAY_BASE_URL=base_url, RAZORPAY_MAX_RETRIES=1))
+        payments.reset_gateway()
+        self.addCleanup(payments.reset_gateway)
+        # No backoff between retries
+        self.enterContext(mock.patch.object(payments.get_gateway(), 'retry_backoff', 0))
+
+    def test_proxy_error_page_is_retried(self):
+        self.server.proxy_errors = 1
+        order = ledger.create_order(self.user, self.service, 11800, '1 Main Street')
+        self.assertEqual(list(self.server.orders), [order.gateway_order_id])
+
+    def test_persistent_proxy_errors_make_the_gateway_unavailable(self):
+        self.server.proxy_errors = 10
+        with self.assertRaises(payments.GatewayUnavailable):
+            ledger.create_order(self.user, self.service, 11800, '1 Main Street')
+        self.assertEqual(Order.objects.get().status, Order.FAILED)
+
+    def test_subscribe_reports_the_gateway_unavailable(self):
+        self.server.proxy_errors = 10
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('subscribe_service', args=[self.service.pk]), {'address': '1 Main Street'},
+        )
+        self.assertContains(response, 'The payment gateway is not responding')
@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import identify_hasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from IT_App import hashers
+from IT_Services.passwords import password_hashers
+
+FAST_PARAMS = {
+    'pbkdf2_sha256': {'iterations': 1000},
+    'scrypt': {'work_factor': 2 ** 8, 'block_size': 8, 'parallelism': 1},
+}
+
+
+def with_params(algorithm, **params):
+    return {**FAST_PARAMS, algorithm: {**FAST_PARAMS[algorithm], **params}}
+
+
+@override_settings(PASSWORD_HASHERS=password_hashers('pbkdf2_sha256'), PASSWORD_HASHER_PARAMS=FAST_PARAMS)
+class RehashTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'S3cret-pass')
+
+    def stored_hash(self):
+        return User.objects.get(pk=self.user.pk).password
+
+    def login(self, password='S3cret-pass'):
+        return self.client.post(reverse('login'), {'username': 'alice', 'password': password})
+
+    def test_hashes_use_the_configured_iterations(self):
+        self.assertTrue(self.stored_hash().startswith('pbkdf2_sha256$1000$'))
+
+    def test_login_rehashes_when_the_iterations_change(self):
+        with override_settings(PASSWORD_HASHER_PARAMS=with_params('pbkdf2_sha256', iterations=2000)):
+            self.assertRedirects(self.login(), reverse('home'), fetch_redirect_response=False)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2_sha256$2000$'))
+
+    def test_wrong_password_is_not_rehashed(self):
+        old_hash = self.stored_hash()
+        with override_settings(PASSWORD_HASHER_PARAMS=with_params('pbkdf2_sha256', iterations=2000)):
+            self.login('wrong')
+        self.assertEqual(self.stored_hash(), old_hash)
+
+    def test_login_rehashes_when_the_work_factor_changes(self):
+        with override_settings(PASSWORD_HASHERS=password_hashers('scrypt')):
+            # Other algorithms are upgraded to the preferred one
+            self.assertTrue(hashers.check_password(self.user, 'S3cret-pass'))
+            self.assertEqual(identify_hasher(self.stored_hash()).algorithm, 'scrypt')
+            self.assertIn('$256$', self.stored_hash())
+            with override_settings(PASSWORD_HASHER_PARAMS=with_params('scrypt', work_factor=2 ** 9)):
+                self.assertRedirects(self.login(), reverse('home'), fetch_redirect_response=False)
+            self.assertIn('$512$', self.stored_hash())
+
+    def test_pending_user_is_checked_and_rehashed(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        pending = User.objects.get(pk=self.user.pk)
+        with override_settings(PASSWORD_HASHER_PARAMS=with_params('pbkdf2_sha256', iterations=2000)):
+            self.assertFalse(hashers.check_password(pending, 'wrong'))
+            self.assertRedirects(self.login(), reverse('otp_verification'))
+        pending.refresh_from_db()
+        self.assertTrue(pending.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertFalse(pending.is_active)
+        self.assertIsNone(pending.last_login)
+
+    async def test_async_check_rehashes(self):
+        user = await User.objects.aget(pk=self.user.pk)
+        with override_settings(PASSWORD_HASHER_PARAMS=with_params('pbkdf2_sha256', iterations=2000)):
+            self.assertTrue(await hashers.acheck_password(user, 'S3cret-pass'))
+            self.assertFalse(await hashers.acheck_password(user, 'wrong'))
+        self.assertTrue((await User.objects.aget(pk=user.pk)).password.startswith('pbkdf2_sha256$2000$'))
+
+
+@override_settings(PASSWORD_HASHERS=password_hashers('pbkdf2_sha256'), PASSWORD_HASHER_PARAMS=FAST_PARAMS)
+class HashingPoolTests(TestCase):
+
+    def use_pool(self, executor, workers=2):
+        self.enterContext(override_settings(PASSWORD_HASHING_WORKERS=workers, PASSWORD_HASHING_EXECUTOR=executor))
+        self.enterContext(mock.patch.object(hashers, '_executor', None))
+        pool = hashers.get_executor()
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def check_and_rehash(self):
+        user = User.objects.create_user('alice', 'alice@example.com', 'S3cret-pass')
+        with override_settings(PASSWORD_HASHER_PARAMS=with_params('pbkdf2_sha256', iterations=2000)):
+            self.assertFalse(hashers.check_password(user, 'wrong'))
+            self.assertTrue(hashers.check_password(user, 'S3cret-pass'))
+        self.assertTrue(User.objects.get(pk=user.pk).password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_no_pool_by_default(self):
+        self.assertIsNone(hashers.get_executor())
+
+    def test_thread_pool(self):
+        pool = self.use_pool('thread')
+        self.assertEqual(pool._max_workers, 2)
+        # One pool, shared by every request
+        self.assertIs(hashers.get_executor(), pool)
+        with mock.patch.object(pool, 'submit', wraps=pool.submit) as submit:
+            self.check_and_rehash()
+        self.assertEqual(submit.call_count, 3)
+
+    def test_process_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.assertIsInstance(self.use_pool('process'), ProcessPoolExecutor)
+        self.check_and_rehash()
+
+    async def test_async_check_uses_the_pool(self):
+        pool = self.use_pool('thread')
+        user = await User.objects.acreate(username='alice', password=await hashers.amake_password('S3cret-pass'))
+        with mock.patch.object(pool, 'submit', wraps=pool.submit) as submit:
+            self.assertTrue(await hashers.acheck_password(user, 'S3cret-pass'))
+        submit.assert_called_once()
+
+
+class PasswordHashersSettingTests(TestCase):
+
+    def test_preferred_hasher_comes_first(self):
+        self.assertEqual(password_hashers('scrypt')[0], 'IT_App.hashers.ScryptPasswordHasher')
+        self.assertIn('IT_App.hashers.PBKDF2PasswordHasher', password_hashers('scrypt'))
+
+    def test_unknown_hasher_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            password_hashers('md5')
@@ -0,0 +1,144 @@
+import io
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from IT_App import images
+from IT_App.models import Service
+from IT_App.templatetags.service_images import service_picture
+
+from .utils import make_service
+
+
+def image_upload(color='red', size=(400, 300), name='photo.png'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageTestMixin:
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root, MEDIA_URL='/media/', SERVICE_IMAGE_ASYNC=False,
+            SERVICE_IMAGE_WIDTHS=(160, 320, 640), SERVICE_IMAGE_FORMATS=('webp', 'jpeg'),
+        ))
+
+    def stored_files(self, path):
+        return sorted(default_storage.listdir(path)[1])
+
+
+class ImagePipelineTests(ImageTestMixin, TestCase):
+
+    def make_service(self, name='Backup', upload=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = make_service(name, service_image=upload or image_upload())
+        service.refresh_from_db()
+        return service
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.make_service('First', image_upload(name='a.png'))
+        second = self.make_service('Second', image_upload(name='b.png'))
+        third = self.make_service('Third', image_upload('blue'))
+
+        self.assertEqual(first.service_image.name, second.service_image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        self.assertNotEqual(first.image_hash, third.image_hash)
+        digest = first.image_hash
+        self.assertEqual(first.service_image.name, f'services/{digest[:2]}/{digest}.png')
+        self.assertEqual(self.stored_files(f'services/{digest[:2]}'), [f'{digest}.png'])
+
+    def test_variants_are_generated_without_upscaling(self):
+        service = self.make_service()
+        digest = service.image_hash
+        self.assertEqual({fmt: sorted(variants, key=int) for fmt, variants in service.image_variants.items()},
+                         {'webp': ['160', '320'], 'jpeg': ['160', '320']})
+        self.assertEqual(service.image_variants['webp']['160'], f'services/variants/{digest[:2]}/{digest}_160.webp')
+        with default_storage.open(service.image_variants['jpeg']['320']) as file:
+            from PIL import Image
+
+            self.assertEqual(Image.open(file).size, (320, 240))
+
+    def test_picture_falls_back_to_the_original_until_variants_exist(self):
+        with mock.patch.object(images, 'schedule_variants'):
+            service = make_service(service_image=image_upload())
+        self.assertEqual(service.image_variants, {})
+        self.assertEqual(
+            service_picture(service, width=200),
+            f'<img src="/media/{service.service_image.name}" alt="Backup" width="200">',
+        )
+
+        images.generate_variants(service.pk)
+        service.refresh_from_db()
+        html = service_picture(service, sizes='200px')
+        self.assertTrue(html.startswith('<picture><source type="image/webp" srcset="/media/services/variants/'))
+        self.assertIn(f'<img src="/media/{service.image_variants["jpeg"]["160"]}"', html)
+
+    def test_force_re_encodes_existing_variants(self):
+        service = self.make_service()
+        name = service.image_variants['webp']['160']
+        with default_storage.open(name, 'wb') as file:
+            file.write(b'stale')
+
+        call_command('generate_image_variants', stdout=io.StringIO())
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), b'stale')
+
+        call_command('generate_image_variants', '--force', stdout=io.StringIO())
+        service.refresh_from_db()
+        self.assertEqual(service.image_variants['webp']['160'], name)
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(4), b'RIFF')
+
+
+class DigestLockTests(ImageTestMixin, TransactionTestCase):
+
+    def test_identical_images_are_encoded_one_at_a_time(self):
+        with mock.patch.object(images, 'schedule_variants'):
+            services = [make_service(f'Service {i}', service_image=image_upload()) for i in range(3)]
+        running = []
+        overlapped = threading.Event()
+        build_variants = images.build_variants
+
+        def build(*args, **kwargs):
+            running.append(1)
+            if len(running) > 1:
+                overlapped.set()
+            try:
+                time.sleep(0.2)
+                return build_variants(*args, **kwargs)
+            finally:
+                running.pop()
+
+        def generate(service_id):
+            try:
+                images.generate_variants(service_id)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=generate, args=[service.pk]) for service in services]
+        with mock.patch.object(images, 'build_variants', build):
+            threads[0].start()
+            threads[1].start()
+            # The third arrives after the first has finished, while the
+            # second is still encoding
+            threads[0].join()
+            threads[2].start()
+            threads[1].join()
+            threads[2].join()
+
+        self.assertFalse(overlapped.is_set())
+        self.assertEqual(images._digest_locks, {})
+        self.assertEqual(len({str(service.image_variants) for service in Service.objects.all()}), 1)
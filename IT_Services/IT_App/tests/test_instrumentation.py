@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from IT_App import instrumentation
+from IT_App.models import OutboundEmail
+
+from .utils import make_service
+
+
+@override_settings(METRICS_N_PLUS_ONE_THRESHOLD=3)
+class NPlusOneTests(TestCase):
+
+    def measure(self, work):
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation._current.set(metrics)
+        try:
+            work()
+        finally:
+            instrumentation._current.reset(token)
+        return metrics
+
+    def test_select_in_a_loop_is_flagged(self):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(3)])
+        metrics = self.measure(lambda: [User.objects.get(pk=user.pk) for user in users])
+        self.assertEqual(len(metrics.n_plus_one()), 1)
+        self.assertTrue(metrics.n_plus_one()[0].startswith('SELECT'))
+
+    def test_batched_writes_are_not_flagged(self):
+        def work():
+            emails = OutboundEmail.objects.bulk_create(
+                [OutboundEmail(subject='Hello', body='Body', to=f'{i}@example.com') for i in range(6)], batch_size=2,
+            )
+            OutboundEmail.objects.bulk_update(emails, ['subject'], batch_size=2)
+
+        metrics = self.measure(work)
+        self.assertGreaterEqual(metrics.queries, 6)
+        self.assertEqual(metrics.n_plus_one(), [])
+
+
+class MetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.get_buffer().clear()
+        self.client.force_login(User.objects.create_user('alice'))
+        self.service = make_service()
+
+    def records(self, view):
+        return [record for record in instrumentation.get_buffer().records if record['view'] == view]
+
+    def test_queries_and_time_are_recorded_per_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('service_detail', args=[self.service.pk]))
+        [record] = self.records('service_detail')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], len(queries))
+        self.assertGreater(record['db'], 0)
+        self.assertGreater(record['render'], 0)
+        self.assertGreaterEqual(record['duration'], record['db'] + record['render'])
+        self.assertEqual(record['gateway'], 0)
+
+    async def test_async_requests_are_recorded(self):
+        await self.async_client.aforce_login(await User.objects.aget(username='alice'))
+        response = await self.async_client.get(reverse('api_service_detail', args=[self.service.pk]))
+        self.assertEqual(response.status_code, 200)
+        [record] = self.records('api_service_detail')
+        self.assertGreater(record['queries'], 0)
+
+    def test_queries_outside_a_request_are_not_recorded(self):
+        self.client.get(reverse('service_detail', args=[self.service.pk]))
+        User.objects.count()
+        with instrumentation.timed('gateway'):
+            pass
+        self.assertEqual(len(instrumentation.get_buffer().records), 1)
+
+    def test_summary_reports_percentiles_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('service_detail', args=[self.service.pk]))
+        summary = instrumentation.get_buffer().summary()['service_detail']
+        self.assertEqual(summary['window'], 3)
+        self.assertEqual(summary['totals']['count'], 3)
+        self.assertEqual(set(summary['duration']), {'0.5', '0.95', '0.99'})
+
+
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        instrumentation.get_buffer().clear()
+
+    def test_json_report_is_staff_only(self):
+        url = reverse('metrics')
+        self.assertRedirects(self.client.get(url), f"{reverse('admin:login')}?next={url}")
+        self.client.force_login(User.objects.create_user('alice'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The refused requests above are in the report
+        self.assertEqual(response.json()['metrics']['window'], 2)
+
+    def test_prometheus_scrape_is_limited_to_staff_and_listed_addresses(self):
+        url = reverse('metrics_prometheus')
+        self.client.force_login(User.objects.create_user('alice'))
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 403)
+        response = self.client.get(url, REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE it_app_request_duration_seconds summary', response.content.decode())
@@ -0,0 +1,138 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from IT_App import maintenance
+from IT_App.models import OTP, Order, OutboundEmail, Subscription
+
+from .utils import make_service
+
+INTERVALS = {'otps': 60, 'sessions': 600, 'users': 3600, 'outbox': 600, 'changes': 3600}
+
+
+@override_settings(MAINTENANCE_INTERVALS=INTERVALS)
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.enterContext(mock.patch.object(maintenance.time, 'monotonic', lambda: self.now))
+
+    def test_tasks_run_on_their_intervals(self):
+        scheduler = maintenance.Scheduler(['otps', 'users'])
+        self.assertEqual(scheduler.due(), ['otps', 'users'])
+        self.assertEqual([result['task'] for result in scheduler.run_due()], ['otps', 'users'])
+        self.assertEqual(scheduler.due(), [])
+        self.assertEqual(scheduler.seconds_until_due(), 60)
+
+        self.now += 60
+        self.assertEqual([result['task'] for result in scheduler.run_due()], ['otps'])
+        self.assertEqual(scheduler.seconds_until_due(), 60)
+        self.now += 3540
+        self.assertEqual(scheduler.due(), ['otps', 'users'])
+
+    def test_all_tasks_by_default(self):
+        self.assertEqual(maintenance.Scheduler().due(), list(maintenance.TASKS))
+
+    def test_failing_task_does_not_stop_the_others(self):
+        def fail(batch_size):
+            raise RuntimeError('database is locked')
+
+        scheduler = maintenance.Scheduler(['otps', 'sessions', 'users'])
+        with mock.patch.dict(maintenance.TASKS, {'sessions': fail}):
+            with self.assertLogs('IT_App.maintenance', 'ERROR') as logs:
+                results = scheduler.run_due()
+        self.assertEqual([result['task'] for result in results], ['otps', 'users'])
+        self.assertIn('Maintenance task sessions failed', logs.output[0])
+        # Retried at its next interval, not straight away
+        self.assertEqual(scheduler.due(), [])
+        self.now += 600
+        self.assertIn('sessions', scheduler.due())
+
+    def test_command_reports_per_task_counts(self):
+        stdout = io.StringIO()
+        call_command('run_maintenance', '--task', 'otps', '--task', 'outbox', stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('otps: deleted=0 ('))
+        self.assertTrue(lines[1].startswith('outbox: deleted=0 ('))
+        self.assertTrue(lines[2].startswith('Run took '))
+
+
+@override_settings(MAINTENANCE_INACTIVE_USER_AGE=24 * 60 * 60, MAINTENANCE_SENT_EMAIL_AGE=24 * 60 * 60)
+class PurgeTests(TestCase):
+
+    def days_ago(self, days):
+        return timezone.now() - timedelta(days=days)
+
+    def test_abandoned_registrations_are_deleted_with_their_otps(self):
+        abandoned = User.objects.create_user('abandoned', is_active=False, date_joined=self.days_ago(2))
+        OTP.objects.create(user=abandoned, otp_code='123456')
+        kept = [
+            User.objects.create_user('recent', is_active=False),
+            User.objects.create_user('active', date_joined=self.days_ago(2)),
+            User.objects.create_user('deactivated', is_active=False, date_joined=self.days_ago(2),
+                                     last_login=self.days_ago(1)),
+            User.objects.create_user('staff', is_active=False, is_staff=True, date_joined=self.days_ago(2)),
+        ]
+        ordered = User.objects.create_user('ordered', is_active=False, date_joined=self.days_ago(2))
+        subscribed = User.objects.create_user('subscribed', is_active=False, date_joined=self.days_ago(2))
+        service = make_service()
+        for user, gateway_order_id in [(ordered, 'order_1'), (subscribed, 'order_2')]:
+            order = Order.objects.create(
+                user=user, service=service, service_name=service.service_name, receipt=f'receipt-{gateway_order_id}',
+                gateway_order_id=gateway_order_id, amount_paise=11800, address='1 Main Street',
+            )
+        Subscription.objects.create(order=order, user=subscribed, service=service)
+
+        self.assertEqual(maintenance.run_task('users')['deleted'], 1)
+
+        self.assertEqual(set(User.objects.all()), {*kept, ordered, subscribed})
+        self.assertFalse(OTP.objects.exists())
+
+    def test_expired_otps_are_deleted(self):
+        users = [User.objects.create_user(f'user{i}', is_active=False) for i in range(3)]
+        for user in users:
+            OTP.objects.create(user=user, otp_code='123456')
+        OTP.objects.filter(user__in=users[:2]).update(created_at=self.days_ago(1))
+        self.assertEqual(maintenance.run_task('otps')['deleted'], 2)
+        self.assertEqual(list(OTP.objects.values_list('user', flat=True)), [users[2].pk])
+
+    def test_only_old_sent_emails_are_deleted(self):
+        def email(status, sent_at=None):
+            return OutboundEmail.objects.create(
+                subject='Your OTP Code', body='123456', from_email='noreply@example.com', to='alice@example.com',
+                status=status, sent_at=sent_at,
+            )
+
+        email(OutboundEmail.SENT, self.days_ago(2))
+        kept = [
+            email(OutboundEmail.SENT, self.days_ago(0)),
+            email(OutboundEmail.PENDING),
+            email(OutboundEmail.DEAD),
+        ]
+        self.assertEqual(maintenance.run_task('outbox')['deleted'], 1)
+        self.assertEqual(set(OutboundEmail.objects.all()), set(kept))
+
+    def test_expired_sessions_are_deleted(self):
+        Session.objects.create(session_key='expired', session_data='', expire_date=self.days_ago(1))
+        Session.objects.create(session_key='current', session_data='', expire_date=timezone.now() + timedelta(days=1))
+        self.assertEqual(maintenance.run_task('sessions')['deleted'], 1)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['current'])
+
+    def test_rows_are_deleted_in_batches(self):
+        OTP.objects.bulk_create([
+            OTP(user=User.objects.create_user(f'user{i}', is_active=False), otp_code='123456') for i in range(5)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(maintenance.delete_in_batches(OTP.objects.all(), batch_size=2), 5)
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        # One statement per batch of 2
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(OTP.objects.exists())
@@ -0,0 +1,150 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from IT_App import onboarding, otp
+from IT_App.models import OutboundEmail
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OnboardingTests(TestCase):
+    rows = [
+        {'username': 'alice', 'email': 'alice@example.com', 'password': 'S3cret-pass'},
+        {'username': 'bob', 'email': 'bob@example.com', 'password': 'S3cret-pass'},
+    ]
+
+    def assertCanVerify(self, user):
+        self.assertFalse(user.is_active)
+        code = OutboundEmail.objects.get(to=user.email).body.rsplit(' ', 1)[1]
+        self.assertTrue(otp.DatabaseOTPBackend().verify(user.id, code))
+
+    def test_onboarded_users_verify_with_the_emailed_codes(self):
+        counts = onboarding.onboard_users(self.rows, workers=1)
+        self.assertEqual((counts['created'], counts['invalid']), (2, 0))
+        for user in User.objects.all():
+            self.assertCanVerify(user)
+
+    def test_taken_and_invalid_rows_are_reported(self):
+        User.objects.create_user('alice')
+        rows = [*self.rows, {'username': 'carol', 'email': 'not-an-email', 'password': 'S3cret-pass'}, self.rows[1]]
+        errors = []
+        counts = onboarding.onboard_users(rows, batch_size=2, workers=1, on_error=lambda *error: errors.append(error))
+        self.assertEqual((counts['created'], counts['invalid']), (1, 3))
+        self.assertEqual([(line, list(row_errors)) for line, row_errors in errors],
+                         [(1, ['username']), (3, ['email']), (4, ['username'])])
+
+    def test_username_taken_during_the_upload_skips_only_that_row(self):
+        hash_passwords = onboarding.hash_passwords
+
+        def register_bob_first(*args):
+            # Another request registers the name after the upload checked it
+            User.objects.create_user('bob', 'robert@example.com', is_active=False)
+            return hash_passwords(*args)
+
+        errors = []
+        with mock.patch.object(onboarding, 'hash_passwords', register_bob_first):
+            counts = onboarding.onboard_users(self.rows, workers=1, on_error=lambda *error: errors.append(error))
+
+        self.assertEqual((counts['created'], counts['invalid']), (1, 1))
+        self.assertEqual(errors, [(2, {'username': ['This username is already taken.']})])
+        self.assertEqual(User.objects.get(username='bob').email, 'robert@example.com')
+        self.assertEqual(list(OutboundEmail.objects.values_list('to', flat=True)), ['alice@example.com'])
+        self.assertCanVerify(User.objects.get(username='alice'))
+
+    def test_codes_in_a_process_local_cache_are_refused(self):
+        with mock.patch.object(otp, '_backend', otp.CacheOTPBackend()):
+            with self.assertRaises(ImproperlyConfigured):
+                onboarding.onboard_users(self.rows, workers=1)
+        self.assertFalse(User.objects.exists())
+
+    def test_command_hashes_on_a_process_pool(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('username,email,password\r\n')
+            for row in self.rows:
+                file.write(f"{row['username']},{row['email']},{row['password']}\r\n")
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        call_command('onboard_users', file.name, '--workers', '2', stdout=stdout)
+        self.assertIn('Created 2 users', stdout.getvalue())
+        for user in User.objects.all():
+            self.assertTrue(user.check_password('S3cret-pass'))
+
+    def test_admin_upload_hashes_in_the_request(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        content = 'username,email,password\r\n' + ''.join(
+            f"{row['username']},{row['email']},{row['password']}\r\n" for row in self.rows
+        )
+        with mock.patch('concurrent.futures.ProcessPoolExecutor') as pool:
+            response = self.client.post(reverse('admin:auth_user_onboard'), {
+                'file': SimpleUploadedFile('users.csv', content.encode()),
+            })
+        pool.assert_not_called()
+        self.assertRedirects(response, reverse('admin:auth_user_changelist'))
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertTrue(messages[0].startswith('Created 2 users, skipped 0 rows'))
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+
+class CountingHasher(MD5PasswordHasher):
+    verified = 0
+
+    def verify(self, password, encoded):
+        CountingHasher.verified += 1
+        return super().verify(password, encoded)
+
+
+@override_settings(PASSWORD_HASHERS=['IT_App.tests.test_onboarding.CountingHasher'])
+class UnverifiedLoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        CountingHasher.verified = 0
+
+    def login(self, username, password='S3cret-pass'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password})
+
+    def messages(self, response):
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+
+    def test_wrong_password_of_unverified_user(self):
+        User.objects.create_user('alice', 'alice@example.com', 'S3cret-pass', is_active=False)
+        response = self.login('alice', 'wrong')
+        self.assertEqual(self.messages(response), ['Invalid credentials'])
+        self.assertNotIn('user_id', self.client.session)
+        self.assertEqual(CountingHasher.verified, 1)
+
+    def test_active_user_logs_in_with_one_hash(self):
+        User.objects.create_user('alice', 'alice@example.com', 'S3cret-pass')
+        self.assertRedirects(self.login('alice'), reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(CountingHasher.verified, 1)
+
+    def test_deactivated_user_cannot_reactivate_with_an_otp(self):
+        user = User.objects.create_user(
+            'alice', 'alice@example.com', 'S3cret-pass', is_active=False, last_login=timezone.now(),
+        )
+        response = self.login('alice')
+        self.assertEqual(self.messages(response), ['Invalid credentials'])
+        self.assertNotIn('user_id', self.client.session)
+
+        # Even with the user id in the session, no OTP is sent or accepted
+        session = self.client.session
+        session['user_id'] = user.id
+        session.save()
+        self.assertEqual(self.client.post(reverse('resend_otp')).status_code, 404)
+        code = otp.get_otp_backend().issue(user.id)
+        self.assertEqual(self.client.post(reverse('otp_verification'), {'otp': code}).status_code, 404)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
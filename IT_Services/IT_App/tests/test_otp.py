@@ -0,0 +1,140 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from IT_App import otp
+from IT_App.models import OTP, OutboundEmail
+
+
+class OTPBackendTests:
+    backend_class = None
+
+    def setUp(self):
+        cache.clear()
+        self.backend = self.backend_class()
+        self.user = User.objects.create_user('alice', 'alice@example.com', is_active=False)
+
+    def test_issued_code_verifies_once(self):
+        code = self.backend.issue(self.user.id)
+        self.assertEqual(len(code), 6)
+        self.assertFalse(self.backend.verify(self.user.id, '000000' if code != '000000' else '111111'))
+        self.assertTrue(self.backend.verify(self.user.id, code))
+        self.assertFalse(self.backend.verify(self.user.id, code))
+
+    def test_new_code_replaces_the_old_one(self):
+        old = self.backend.issue(self.user.id)
+        new = self.backend.issue(self.user.id)
+        if old != new:
+            self.assertFalse(self.backend.verify(self.user.id, old))
+        self.assertTrue(self.backend.verify(self.user.id, new))
+
+    def test_issue_many(self):
+        other = User.objects.create_user('bob', 'bob@example.com', is_active=False)
+        codes = self.backend.issue_many([self.user.id, other.id])
+        self.assertTrue(self.backend.verify(other.id, codes[other.id]))
+        self.assertTrue(self.backend.verify(self.user.id, codes[self.user.id]))
+
+    def test_discard(self):
+        code = self.backend.issue(self.user.id)
+        self.backend.discard(self.user.id)
+        self.assertFalse(self.backend.verify(self.user.id, code))
+
+
+class DatabaseOTPBackendTests(OTPBackendTests, TestCase):
+    backend_class = otp.DatabaseOTPBackend
+
+    def test_expired_code_is_rejected_and_purged(self):
+        code = self.backend.issue(self.user.id)
+        OTP.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertFalse(self.backend.verify(self.user.id, code))
+        self.assertEqual(otp.purge_expired_otps(), 1)
+        self.assertFalse(OTP.objects.exists())
+
+
+class CacheOTPBackendTests(OTPBackendTests, TestCase):
+    backend_class = otp.CacheOTPBackend
+
+
+@override_settings(OTP_RATE_LIMITS={'verify': (2, 60)})
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_attempts_are_counted_per_identity_and_window(self):
+        with mock.patch('IT_App.otp.time.time', return_value=600.0):
+            self.assertTrue(otp.allow('verify', 'user:1', 'ip:a'))
+            self.assertTrue(otp.allow('verify', 'user:1', 'ip:b'))
+            self.assertFalse(otp.allow('verify', 'user:1', 'ip:c'))
+            # Another user from a known IP
+            self.assertTrue(otp.allow('verify', 'user:2', 'ip:a'))
+            self.assertFalse(otp.allow('verify', 'user:3', 'ip:a'))
+        with mock.patch('IT_App.otp.time.time', return_value=660.0):
+            self.assertTrue(otp.allow('verify', 'user:1', 'ip:a'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RegistrationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def register(self):
+        return self.client.post(reverse('register'), {
+            'username': 'alice', 'email': 'alice@example.com',
+            'password': 'S3cret-pass', 'confirm_password': 'S3cret-pass',
+        })
+
+    def emailed_code(self):
+        return OutboundEmail.objects.latest('id').body.rsplit(' ', 1)[1]
+
+    def test_registration_is_activated_by_the_emailed_code(self):
+        response = self.register()
+        self.assertRedirects(response, reverse('otp_verification'))
+        user = User.objects.get(username='alice')
+        self.assertFalse(user.is_active)
+        self.assertEqual(OutboundEmail.objects.get().to, 'alice@example.com')
+
+        response = self.client.post(reverse('otp_verification'), {'otp': self.emailed_code()})
+
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.is_active)
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.id)
+
+    def test_wrong_code_is_rejected(self):
+        self.register()
+        code = self.emailed_code()
+        wrong = '100000' if code != '100000' else '100001'
+        response = self.client.post(reverse('otp_verification'), {'otp': wrong})
+        self.assertContains(response, 'Invalid OTP')
+        self.assertFalse(User.objects.get(username='alice').is_active)
+
+    def test_verification_attempts_are_limited(self):
+        self.register()
+        code = self.emailed_code()
+        wrong = '100000' if code != '100000' else '100001'
+        capacity, _ = settings.OTP_RATE_LIMITS['verify']
+        for _ in range(capacity):
+            self.client.post(reverse('otp_verification'), {'otp': wrong})
+        response = self.client.post(reverse('otp_verification'), {'otp': code})
+        self.assertContains(response, 'Too many attempts')
+        self.assertFalse(User.objects.get(username='alice').is_active)
+
+    def test_resend_issues_a_new_code(self):
+        self.register()
+        first = self.emailed_code()
+        self.client.post(reverse('resend_otp'))
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+        second = self.emailed_code()
+        if first != second:
+            self.client.post(reverse('otp_verification'), {'otp': first})
+            self.assertFalse(User.objects.get(username='alice').is_active)
+        self.client.post(reverse('otp_verification'), {'otp': second})
+        self.assertTrue(User.objects.get(username='alice').is_active)
@@ -0,0 +1,101 @@
+import io
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from IT_App import outbox
+from IT_App.models import OutboundEmail
+
+
+class FailingBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise SMTPException('Service unavailable')
+
+
+class UnreachableBackend(EmailBackend):
+
+    def open(self):
+        raise ConnectionRefusedError('Connection refused')
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BACKOFF=30, OUTBOX_RETRY_MAX_DELAY=60)
+class OutboxTests(TestCase):
+
+    def drain(self):
+        call_command('process_outbox', stdout=io.StringIO())
+
+    def test_queued_email_is_delivered_by_the_worker(self):
+        email = outbox.enqueue_email('Your OTP Code', 'Your OTP is 123456', ['a@example.com', 'b@example.com'])
+        self.assertEqual(mail.outbox, [])
+
+        self.drain()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Your OTP Code')
+        self.assertEqual(mail.outbox[0].to, ['a@example.com', 'b@example.com'])
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.SENT)
+        self.assertEqual(email.attempts, 1)
+        self.assertIsNotNone(email.sent_at)
+
+    def test_sent_email_is_not_sent_again(self):
+        outbox.enqueue_email('Hello', 'Body', ['a@example.com'])
+        self.drain()
+        self.drain()
+        self.assertEqual(outbox.drain_outbox(), {'sent': 0, 'retried': 0, 'dead': 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_batch_is_sent_in_queue_order(self):
+        outbox.enqueue_emails([(f'Email {i}', 'Body', [f'{i}@example.com']) for i in range(5)])
+        self.assertEqual(outbox.drain_outbox(batch_size=3), {'sent': 3, 'retried': 0, 'dead': 0})
+        self.assertEqual(outbox.drain_outbox(batch_size=3), {'sent': 2, 'retried': 0, 'dead': 0})
+        self.assertEqual([message.subject for message in mail.outbox], [f'Email {i}' for i in range(5)])
+
+    @override_settings(EMAIL_BACKEND='IT_App.tests.test_outbox.FailingBackend')
+    def test_failure_is_retried_with_backoff(self):
+        email = outbox.enqueue_email('Hello', 'Body', ['a@example.com'])
+        before = timezone.now()
+
+        self.assertEqual(outbox.drain_outbox(), {'sent': 0, 'retried': 1, 'dead': 0})
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('Service unavailable', email.last_error)
+        self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=30))
+        # Not due yet, so the next poll leaves it alone
+        self.assertEqual(outbox.drain_outbox(), {'sent': 0, 'retried': 0, 'dead': 0})
+
+    def test_retry_delay_doubles_up_to_the_maximum(self):
+        self.assertEqual(
+            [outbox.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)], [30, 60, 60]
+        )
+
+    @override_settings(EMAIL_BACKEND='IT_App.tests.test_outbox.UnreachableBackend')
+    def test_email_is_dead_after_max_attempts(self):
+        email = outbox.enqueue_email('Hello', 'Body', ['a@example.com'])
+        for _ in range(3):
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+            outbox.drain_outbox()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.DEAD)
+        self.assertEqual(email.attempts, 3)
+        self.assertIn('Connection refused', email.last_error)
+
+    def test_retried_email_is_delivered_once_the_server_recovers(self):
+        email = outbox.enqueue_email('Hello', 'Body', ['a@example.com'])
+        with override_settings(EMAIL_BACKEND='IT_App.tests.test_outbox.FailingBackend'):
+            outbox.drain_outbox()
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+
+        self.assertEqual(outbox.drain_outbox(), {'sent': 1, 'retried': 0, 'dead': 0})
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), (OutboundEmail.SENT, 2, ''))
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from IT_App.models import Service
+from IT_App.pagination import CatalogQuery, encode_cursor
+
+from .utils import make_service
+
+
+class CatalogQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Prices repeat, so pages split runs of equal prices
+        cls.services = [
+            make_service(f'Service {i}', price=price, active=i % 3 != 0)
+            for i, price in enumerate(['300.00', '100.00', '200.00', '100.00', '100.00', '200.00', '100.00'])
+        ]
+
+    def walk(self, **options):
+        rows, cursor = [], None
+        while True:
+            page, cursor = CatalogQuery(cursor=cursor, limit=2, **options).paginate(Service.objects.all())
+            self.assertLessEqual(len(page), 2)
+            rows += page
+            if cursor is None:
+                return rows
+
+    def test_pages_follow_the_ordering_across_ties(self):
+        expected = sorted(self.services, key=lambda service: (service.service_price, service.pk))
+        self.assertEqual(self.walk(ordering='price'), expected)
+
+    def test_filtered_pages(self):
+        expected = sorted(
+            (service for service in self.services if service.active),
+            key=lambda service: (service.service_price, service.pk),
+        )
+        self.assertEqual(self.walk(ordering='price', active=True), expected)
+        self.assertEqual(self.walk(ordering='id', active=False), [s for s in self.services if not s.active])
+
+    def test_last_page_has_no_cursor(self):
+        rows, cursor = CatalogQuery(limit=7).paginate(Service.objects.all())
+        self.assertEqual((len(rows), cursor), (7, None))
+        rows, cursor = CatalogQuery(limit=6).paginate(Service.objects.all())
+        self.assertEqual(len(rows), 6)
+        rows, cursor = CatalogQuery(limit=6, cursor=cursor).paginate(Service.objects.all())
+        self.assertEqual((rows, cursor), ([self.services[-1]], None))
+
+    def test_cursor_of_another_ordering_is_rejected(self):
+        cursor = encode_cursor('id', [1])
+        with self.assertRaises(BadRequest):
+            CatalogQuery(ordering='price', cursor=cursor).paginate(Service.objects.all())
+
+    def test_deep_pages_seek_the_index(self):
+        cursor = encode_cursor('price', ['100.00', self.services[3].pk])
+        for active, index in ((None, 'service_price_id_idx'), (True, 'service_active_price_idx')):
+            queryset = CatalogQuery(ordering='price', cursor=cursor, active=active).page_queryset(Service.objects.all())
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as db:
+                plan = ' '.join(row[-1] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall())
+            self.assertIn(f'SEARCH IT_App_service USING INDEX {index}', plan)
+
+
+class CatalogListingAPITests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('alice'))
+
+    def test_cursor_round_trip(self):
+        services = [make_service(f'Service {i}', price='100.00') for i in range(3)]
+        url = reverse('api_service_list')
+        data = self.client.get(url, {'order': 'price', 'limit': 2}).json()
+        self.assertEqual([result['id'] for result in data['results']], [services[0].pk, services[1].pk])
+        data = self.client.get(url, {'order': 'price', 'limit': 2, 'cursor': data['next_cursor']}).json()
+        self.assertEqual([result['id'] for result in data['results']], [services[2].pk])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_bad_cursor(self):
+        for cursor in ('not-a-cursor', encode_cursor('id', [1])):
+            response = self.client.get(reverse('api_service_list'), {'order': 'price', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,91 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+from IT_App import ledger, payments
+from IT_App.fake_gateway import FakeRazorpayServer
+from IT_App.models import Order, Subscription
+
+from .utils import PaymentTestCase
+
+
+class RecordPaymentTests(PaymentTestCase):
+
+    def test_first_confirmation_pays_the_order_and_subscribes(self):
+        order = self.make_order()
+        recorded, applied = ledger.record_payment('order_1', 'pay_1')
+        self.assertTrue(applied)
+        self.assertEqual(recorded.pk, order.pk)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.payment_id), (Order.PAID, 'pay_1'))
+        self.assertEqual(Subscription.objects.get().order, order)
+
+    def test_replayed_confirmation_does_nothing(self):
+        self.make_order()
+        ledger.record_payment('order_1', 'pay_1')
+        recorded, applied = ledger.record_payment('order_1', 'pay_1')
+        self.assertFalse(applied)
+        self.assertEqual(recorded.status, Order.PAID)
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_failed_order_can_still_be_paid(self):
+        self.make_order(status=Order.FAILED)
+        self.assertTrue(ledger.record_payment('order_1', 'pay_1')[1])
+
+    def test_unknown_order(self):
+        self.assertEqual(ledger.record_payment('order_missing', 'pay_1'), (None, False))
+
+    def test_payment_id_recorded_against_another_order(self):
+        self.make_order('order_1')
+        self.make_order('order_2')
+        ledger.record_payment('order_1', 'pay_1')
+        recorded, applied = ledger.record_payment('order_2', 'pay_1')
+        self.assertFalse(applied)
+        self.assertEqual(recorded.status, Order.CREATED)
+        self.assertEqual(Subscription.objects.count(), 1)
+
+
+class PaymentCallbackTests(PaymentTestCase):
+
+    def callback(self, order_id='order_1', payment_id='pay_1', secret=settings.RAZORPAY_KEY_SECRET):
+        signature = hmac.new(secret.encode(), f'{order_id}|{payment_id}'.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(reverse('payment_callback'), {
+            'razorpay_order_id': order_id, 'razorpay_payment_id': payment_id, 'razorpay_signature': signature,
+        }).json()
+
+    def test_replayed_callback_subscribes_once(self):
+        self.make_order()
+        self.assertEqual(self.callback(), {'status': 'Payment Successful'})
+        self.assertEqual(self.callback(), {'status': 'Payment Successful'})
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_bad_signature_pays_nothing(self):
+        self.make_order()
+        self.assertEqual(self.callback(secret='wrong'), {'status': 'Payment Verification Failed'})
+        self.assertEqual(Order.objects.get().status, Order.CREATED)
+
+
+class ReconcileOrdersTests(PaymentTestCase):
+
+    def setUp(self):
+        self.server = FakeRazorpayServer()
+        self.addCleanup(self.server.stop)
+        self.enterContext(override_settings(RAZORPAY_BASE_URL=self.server.start()))
+        payments.reset_gateway()
+        self.addCleanup(payments.reset_gateway)
+
+    def test_captured_payments_are_recorded(self):
+        paid = payments.get_gateway().create_order(11800, receipt='receipt-paid')
+        unpaid = payments.get_gateway().create_order(11800, receipt='receipt-unpaid')
+        self.server.add_payment(paid['id'])
+        self.make_order(paid['id'])
+        self.make_order(unpaid['id'])
+
+        self.assertEqual(ledger.reconcile_orders(batch_size=1), (2, 1))
+
+        self.assertEqual(Order.objects.get(gateway_order_id=paid['id']).status, Order.PAID)
+        self.assertEqual(Order.objects.get(gateway_order_id=unpaid['id']).status, Order.CREATED)
+        self.assertEqual(ledger.reconcile_orders(), (1, 0))
@@ -0,0 +1,93 @@
+import importlib
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.cache import cache
+from django.test import TestCase
+
+from IT_App import catalog, pricing
+from IT_App.models import Service
+
+from .utils import make_service
+
+migration_0009 = importlib.import_module('IT_App.migrations.0009_service_pricing')
+
+
+def stored_amounts(service):
+    service.refresh_from_db()
+    return tuple(getattr(service, field) for field in pricing.PRICING_FIELDS)
+
+
+class ComputeAmountsTests(TestCase):
+
+    def test_tax_is_rounded_half_up_to_the_paisa(self):
+        self.assertEqual(pricing.compute_amounts(Decimal('113.63'), Decimal('18.00')), (11363, 2045, 13408))
+        self.assertEqual(pricing.compute_amounts(Decimal('1.50'), Decimal('5.00')), (150, 8, 158))
+        self.assertEqual(pricing.compute_amounts(Decimal('0.10'), Decimal('12.50')), (10, 1, 11))
+
+    def test_saved_service_stores_its_amounts(self):
+        service = make_service(price='113.63')
+        self.assertEqual(stored_amounts(service), (11363, 2045, 13408))
+        self.assertEqual(pricing.from_paise(service.gross_amount_paise), Decimal('134.08'))
+
+
+class RepriceTests(TestCase):
+
+    def reprice(self, price, percent, tax='18.00'):
+        service = make_service(price=price, tax=tax)
+        Service.objects.filter(pk=service.pk).update(**pricing.repriced_amounts(percent))
+        service.refresh_from_db()
+        return service
+
+    def test_amounts_match_compute_amounts(self):
+        for price, percent, expected in [
+            ('113.63', '12.5', Decimal('127.83')),  # 12783.375 paise
+            ('113.63', '-33.33', Decimal('75.76')),  # 7575.7121 paise
+            ('1.01', '50', Decimal('1.52')),  # 151.5 paise rounds up
+            ('99.99', '0', Decimal('99.99')),
+        ]:
+            for tax in ('18.00', '12.50', '0.00'):
+                with self.subTest(price=price, percent=percent, tax=tax):
+                    service = self.reprice(price, percent, tax)
+                    self.assertEqual(service.service_price, expected)
+                    self.assertEqual(stored_amounts(service), pricing.compute_amounts(expected, Decimal(tax)))
+
+    def test_price_cannot_drop_below_zero(self):
+        with self.assertRaises(ValueError):
+            pricing.repriced_amounts('-100.01')
+        self.assertEqual(self.reprice('113.63', '-100').service_price, Decimal('0.00'))
+
+
+class RecomputeAllTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_only_stale_rows_are_updated(self):
+        stale = make_service('Stale', price='113.63')
+        make_service('Fresh')
+        Service.objects.filter(pk=stale.pk).update(net_amount_paise=1, tax_amount_paise=1, gross_amount_paise=2)
+        updated_at = Service.objects.get(pk=stale.pk).updated_at
+        version = catalog.get_catalog_version()
+
+        self.assertEqual(pricing.recompute_all(batch_size=1), (2, 1))
+
+        self.assertEqual(stored_amounts(stale), (11363, 2045, 13408))
+        self.assertGreater(stale.updated_at, updated_at)
+        self.assertGreater(catalog.get_catalog_version(), version)
+        self.assertEqual(pricing.recompute_all(), (2, 0))
+
+
+class PricingMigrationTests(TestCase):
+
+    def test_backfill_matches_compute_amounts(self):
+        services = [
+            make_service(f'Service {i}', price=price, tax=tax)
+            for i, (price, tax) in enumerate([('113.63', '18.00'), ('0.10', '12.50'), ('1.50', '5.00'), ('99999.99', '28.00')])
+        ]
+        Service.objects.update(net_amount_paise=0, tax_amount_paise=0, gross_amount_paise=0)
+
+        migration_0009.backfill_pricing(apps, None)
+
+        for service in services:
+            self.assertEqual(stored_amounts(service), pricing.compute_amounts(service.service_price, service.service_tax))
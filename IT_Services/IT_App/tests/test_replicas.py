@@ -0,0 +1,167 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from IT_App import routers
+from IT_App.management.commands.sync_replicas import Command as SyncReplicas
+from IT_App.models import Service
+from IT_Services.database import sqlite_replica
+
+
+class SyncReplicasTests(SimpleTestCase):
+    # Replica connections are opened on temporary files, not the test database
+    databases = {'default'}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.primary = str(Path(directory.name, 'primary.sqlite3'))
+        self.replica = str(Path(directory.name, 'replica.sqlite3'))
+        with sqlite3.connect(self.primary) as primary:
+            primary.execute('PRAGMA journal_mode = WAL')
+            primary.execute('CREATE TABLE item (name TEXT)')
+            primary.execute("INSERT INTO item VALUES ('first')")
+        primary.close()
+
+    def write(self, name):
+        with sqlite3.connect(self.primary) as primary:
+            primary.execute('INSERT INTO item VALUES (?)', [name])
+        primary.close()
+
+    def test_copy_does_not_wait_for_readers_of_the_replica(self):
+        SyncReplicas().copy(self.primary, self.replica)
+        reader = sqlite3.connect(f'file:{self.replica}?mode=ro', uri=True, timeout=0)
+        self.addCleanup(reader.close)
+        # An open read transaction holds a shared lock on the replica
+        reader.execute('BEGIN')
+        self.assertEqual(reader.execute('SELECT count(*) FROM item').fetchone(), (1,))
+
+        self.write('second')
+        SyncReplicas().copy(self.primary, self.replica)
+
+        self.assertEqual(reader.execute('SELECT count(*) FROM item').fetchone(), (1,))
+        with sqlite3.connect(f'file:{self.replica}?mode=ro', uri=True) as fresh:
+            self.assertEqual(fresh.execute('SELECT count(*) FROM item').fetchone(), (2,))
+        fresh.close()
+        self.assertFalse(Path(f'{self.replica}.sync').exists())
+
+    def test_replica_connection_reopens_the_synced_file(self):
+        SyncReplicas().copy(self.primary, self.replica)
+        # A handler of its own, with the replica as its only database
+        connection = ConnectionHandler({'default': sqlite_replica(self.replica)})['default']
+        self.addCleanup(connection.close)
+        connection.ensure_connection()
+        self.assertTrue(connection.is_usable())
+
+        self.write('second')
+        SyncReplicas().copy(self.primary, self.replica)
+
+        self.assertFalse(connection.is_usable())
+        # As at the start of the next request
+        connection.close_if_unusable_or_obsolete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM item')
+            self.assertEqual(cursor.fetchone(), (2,))
+        self.assertTrue(connection.is_usable())
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = {alias: Path(directory.name, f'{alias}.sqlite3') for alias in ('replica1', 'replica2', 'missing')}
+        for alias in ('replica1', 'replica2'):
+            with sqlite3.connect(paths[alias]) as replica:
+                replica.execute('CREATE TABLE item (name TEXT)')
+            replica.close()
+        # A handler of its own for the replicas, next to the test database
+        handler = ConnectionHandler({
+            DEFAULT_DB_ALIAS: sqlite_replica(paths['replica1']),
+            **{alias: sqlite_replica(path) for alias, path in paths.items()},
+        })
+        self.addCleanup(handler.close_all)
+        self.enterContext(mock.patch.object(routers, 'connections', {
+            DEFAULT_DB_ALIAS: connections[DEFAULT_DB_ALIAS], **{alias: handler[alias] for alias in paths},
+        }))
+        self.enterContext(override_settings(DATABASE_REPLICAS=['replica1', 'replica2']))
+        self.enterContext(mock.patch.object(routers, '_pool', None))
+        self.router = routers.ReplicaRouter()
+
+    def request(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return routers.ReplicaPinningMiddleware(view)(request)
+
+    def test_reads_are_spread_over_the_replicas(self):
+        self.assertEqual([self.router.db_for_read(Service) for _ in range(4)],
+                         ['replica1', 'replica2', 'replica1', 'replica2'])
+        # Only catalog models are replicated
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_writes_and_reads_in_a_transaction_use_the_primary(self):
+        self.assertEqual(self.router.db_for_write(Service), DEFAULT_DB_ALIAS)
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Service), DEFAULT_DB_ALIAS)
+        self.assertIn(self.router.db_for_read(Service), ['replica1', 'replica2'])
+
+    def test_request_sticks_to_one_replica_until_it_writes(self):
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(Service))
+            reads.append(self.router.db_for_read(Service))
+            self.router.db_for_write(Service)
+            reads.append(self.router.db_for_read(Service))
+            return HttpResponse()
+
+        response = self.request(view)
+        self.assertEqual(reads, ['replica1', 'replica1', DEFAULT_DB_ALIAS])
+        cookie = response.cookies[settings.DATABASE_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.DATABASE_PIN_SECONDS)
+        self.assertEqual(routers.get_pool().in_flight, {'replica1': 0, 'replica2': 0})
+
+    def test_pin_cookie_sends_the_next_reads_to_the_primary(self):
+        def view(request):
+            reads.append(self.router.db_for_read(Service))
+            return HttpResponse()
+
+        reads = []
+        response = self.request(view, cookies={settings.DATABASE_PIN_COOKIE: '1'})
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+        # A read-only request doesn't extend the pin
+        self.assertNotIn(settings.DATABASE_PIN_COOKIE, response.cookies)
+        self.request(view)
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS, 'replica1'])
+
+    @override_settings(DATABASE_REPLICAS=['missing', 'replica1'], DATABASE_REPLICA_SELECTION='least_connections')
+    def test_missing_replica_is_skipped(self):
+        with self.assertLogs('IT_App.routers', 'WARNING'):
+            self.assertEqual(self.router.db_for_read(Service), 'replica1')
+        self.assertIn('missing', routers.get_pool().down_until)
+        with mock.patch.object(routers.connections['missing'], 'ensure_connection') as ensure_connection:
+            self.assertEqual(self.router.db_for_read(Service), 'replica1')
+        # Not retried until DATABASE_REPLICA_RETRY has passed
+        ensure_connection.assert_not_called()
+
+    @override_settings(DATABASE_REPLICAS=['missing'])
+    def test_reads_fall_back_to_the_primary_without_replicas(self):
+        with self.assertLogs('IT_App.routers', 'WARNING'):
+            self.assertIsNone(self.router.db_for_read(Service))
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(Service))
+            return HttpResponse()
+
+        self.request(view)
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
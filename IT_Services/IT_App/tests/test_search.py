@@ -0,0 +1,65 @@
+from django.test import TestCase, override_settings
+
+from IT_App import search
+
+from .utils import make_service
+
+
+class SearchTests(TestCase):
+
+    def test_best_match_is_found_among_many_matches(self):
+        best = make_service('Backup')
+        for i in range(5):
+            make_service(f'Storage {i}', package='Backup')
+        self.assertEqual(search.search_services('backup', limit=1), [best])
+        self.assertEqual(len(search.search_services('backup', limit=10)), 6)
+
+    def test_last_token_is_a_prefix(self):
+        service = make_service('Cloud backup')
+        make_service('Cloud storage')
+        self.assertEqual(search.search_services('cloud back'), [service])
+
+    def test_query_syntax_is_treated_as_text(self):
+        service = make_service('Backup OR restore')
+        self.assertEqual(search.search_services('backup OR ("restore*'), [service])
+        self.assertEqual(search.search_services('***'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        service = make_service('Backup')
+        service.service_name = 'Firewall'
+        service.save()
+        self.assertEqual(search.search_services('backup'), [])
+        self.assertEqual(search.search_services('firewall'), [service])
+        service.delete()
+        self.assertEqual(search.search_services('firewall'), [])
+
+    @override_settings(SEARCH_RANK_CANDIDATES=3)
+    def test_broad_queries_rank_the_newest_matches(self):
+        make_service('Backup')
+        newer = [make_service(f'Storage {i}', package='Backup') for i in range(5)]
+        # The exact name match is older than the three newest matches, so
+        # it is not scored. A larger limit widens the window.
+        self.assertEqual(set(search.search_services('backup', limit=3)), set(newer[2:]))
+        self.assertEqual(len(search.search_services('backup', limit=10)), 6)
+
+
+class InvertedIndexTests(TestCase):
+
+    def setUp(self):
+        self.backend = search.InvertedIndexBackend()
+
+    def test_best_match_is_found_among_many_matches(self):
+        best = make_service('Backup')
+        for i in range(5):
+            make_service(f'Storage {i}', package='Backup')
+        self.assertEqual(self.backend.search('backup', 1), [best.pk])
+        self.assertEqual(self.backend.search('stor back', 10), [])
+        self.assertEqual(len(self.backend.search('storage back', 10)), 5)
+
+    def test_changes_apply_when_the_transaction_commits(self):
+        self.backend.search('backup', 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            service = make_service('Backup')
+            self.backend.index([service])
+            self.assertEqual(self.backend.search('backup', 10), [])
+        self.assertEqual(self.backend.search('backup', 10), [service.pk])
@@ -0,0 +1,43 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from IT_App.management.commands import profile_startup
+
+# Only needed once a payment, a gateway call or an image upload is handled
+DEFERRED_PACKAGES = {'razorpay', 'requests', 'PIL'}
+
+
+class StartupImportTests(SimpleTestCase):
+
+    def test_entry_points_defer_heavy_packages(self):
+        command = profile_startup.Command()
+        for name, entry in profile_startup.ENTRY_POINTS.items():
+            with self.subTest(entry_point=name):
+                run = command.measure(entry)
+                imported = {module.split('.')[0] for module in run['modules']}
+                self.assertIn('IT_App', imported)
+                self.assertEqual(imported & DEFERRED_PACKAGES, set())
+
+    def test_import_times_are_parsed(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   json.decoder\n'
+            'import time:      1500 |       1620 | json\n'
+        )
+        self.assertEqual(profile_startup.parse_import_times(stderr), {'json.decoder': 0.00012, 'json': 0.0015})
+
+    def test_command_writes_a_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'startup.json')
+            stdout = io.StringIO()
+            call_command('profile_startup', '--entry-point', 'wsgi', '--repeat', '1', '--output', output, stdout=stdout)
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(list(results), ['wsgi'])
+        self.assertGreater(results['wsgi']['modules'], 0)
+        self.assertIn('wsgi: ', stdout.getvalue())
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import json
+
+from django.test import override_settings
+from django.urls import reverse
+
+from IT_App import ledger, webhooks
+from IT_App.models import Order, Subscription, WebhookEvent
+
+from .utils import PaymentTestCase
+
+WEBHOOK_SECRET = 'whsec-test'
+
+
+def payment_event(event, order_id, payment_id='pay_1'):
+    return json.dumps({
+        'event': event,
+        'payload': {'payment': {'entity': {'id': payment_id, 'order_id': order_id, 'status': 'captured'}}},
+    })
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class WebhookTests(PaymentTestCase):
+
+    def post_webhook(self, body, event_id='evt_1', secret=WEBHOOK_SECRET):
+        signature = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('razorpay_webhook'), body, content_type='application/json',
+            headers={'X-Razorpay-Signature': signature, 'X-Razorpay-Event-Id': event_id},
+        )
+
+    def test_signed_event_is_stored_once(self):
+        body = payment_event('payment.captured', 'order_1')
+        self.assertEqual(self.post_webhook(body).status_code, 200)
+        self.assertEqual(self.post_webhook(body).status_code, 200)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.event_id, event.event, event.status), ('evt_1', 'payment.captured', WebhookEvent.PENDING))
+
+    def test_bad_signature_is_rejected(self):
+        response = self.post_webhook(payment_event('payment.captured', 'order_1'), secret='wrong')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_payment_events_pay_the_order_once(self):
+        order = self.make_order()
+        webhooks.receive(payment_event('payment.captured', 'order_1'), 'evt_1')
+        webhooks.receive(payment_event('order.paid', 'order_1'), 'evt_2')
+
+        counts = webhooks.process_batch()
+
+        self.assertEqual(counts, {WebhookEvent.PROCESSED: 2, WebhookEvent.IGNORED: 0, WebhookEvent.FAILED: 0})
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PAID)
+        self.assertEqual(Subscription.objects.count(), 1)
+        self.assertEqual(webhooks.process_batch(), {WebhookEvent.PROCESSED: 0, WebhookEvent.IGNORED: 0, WebhookEvent.FAILED: 0})
+
+    def test_other_events_and_unknown_orders_are_ignored(self):
+        webhooks.receive(json.dumps({'event': 'refund.created', 'payload': {}}), 'evt_1')
+        webhooks.receive(payment_event('payment.captured', 'order_missing'), 'evt_2')
+        counts = webhooks.process_batch()
+        self.assertEqual(counts[WebhookEvent.IGNORED], 2)
+
+    def test_payment_without_an_order_is_ignored(self):
+        order = self.make_order(gateway_order_id=None, status=Order.FAILED)
+        webhooks.receive(payment_event('payment.captured', None), 'evt_1')
+        self.assertEqual(webhooks.process_batch()[WebhookEvent.IGNORED], 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.FAILED)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_malformed_event_is_parked(self):
+        webhooks.receive(json.dumps({'event': 'payment.captured', 'payload': {}}), 'evt_1')
+        webhooks.process_batch()
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, WebhookEvent.FAILED)
+        self.assertIn('KeyError', event.last_error)
+
+    def test_browser_callback_and_webhook_record_one_payment(self):
+        order = self.make_order()
+        ledger.record_payment('order_1', 'pay_1')
+        webhooks.receive(payment_event('payment.captured', 'order_1'), 'evt_1')
+        webhooks.process_batch()
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PAID)
+        self.assertEqual(Subscription.objects.count(), 1)
+
+    def test_empty_order_id_pays_nothing(self):
+        order = self.make_order(gateway_order_id=None, status=Order.FAILED)
+        for gateway_order_id in (None, ''):
+            self.assertEqual(ledger.record_payment(gateway_order_id, 'pay_1'), (None, False))
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.FAILED)
+        self.assertFalse(Subscription.objects.exists())
@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from IT_App.models import Order, Service
+
+
+def make_service(name='Backup', price='100.00', package='Basic', tax='18.00', **fields):
+    return Service.objects.create(
+        service_name=name, payment_terms='Monthly', service_price=Decimal(price),
+        service_package=package, service_tax=Decimal(tax), **fields,
+    )
+
+
+class PaymentTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com')
+        cls.service = make_service()
+
+    def make_order(self, gateway_order_id='order_1', status=Order.CREATED, receipt=None):
+        return Order.objects.create(
+            user=self.user, service=self.service, service_name=self.service.service_name,
+            receipt=receipt or f'receipt-{gateway_order_id}', gateway_order_id=gateway_order_id,
+            amount_paise=11800, address='1 Main Street', status=status,
+        )
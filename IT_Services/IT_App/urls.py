@@ -1,21 +1,39 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, api, async_views, instrumentation
+
+# Views with an async counterpart, see settings.ASYNC_VIEWS
+checkout_views = async_views if settings.ASYNC_VIEWS else views
+stream_views = async_views if settings.ASYNC_VIEWS else api
 
 urlpatterns = [
     # User-related views
     path('register/', views.register, name='register'),
     path('otp-verification/', views.otp_verification, name='otp_verification'),
-    path('login/', views.login_view, name='login'),
+    path('otp-verification/resend/', views.resend_otp, name='resend_otp'),
+    path('login/', checkout_views.login_view, name='login'),
     
     # Service CRUD views
-    path('', views.home, name='home'),  # Home page showing active services
+    path('', checkout_views.home, name='home'),  # Home page showing active services
     path('service/create/', views.create_service, name='create_service'),  # Create a service
-    path('service/<int:pk>/', views.service_detail, name='service_detail'),  # Single service view
+    path('service/<int:pk>/', checkout_views.service_detail, name='service_detail'),  # Single service view
     path('service/<int:pk>/update/', views.update_service, name='update_service'),  # Update a service
     path('service/<int:pk>/delete/', views.delete_service, name='delete_service'),  # Delete a service
     path('services/', views.service_list, name='service_list'),  # List all services
+
+    # JSON catalog API
+    path('api/services/', api.service_list, name='api_service_list'),  # Cursor-paginated service list
+    path('api/services/<int:pk>/', api.service_detail, name='api_service_detail'),  # Single service
+    path('api/services/search/', api.service_search, name='api_service_search'),  # Full-text service search
+    path('api/services/changes/', api.service_changes, name='api_service_changes'),  # Change feed, paged by cursor
+    path('api/services/changes/stream/', stream_views.service_change_stream, name='api_service_change_stream'),  # Change feed as Server-Sent Events
     
+    # Request metrics
+    path('metrics/', instrumentation.metrics_json, name='metrics'),  # Per-view percentiles (staff only)
+    path('metrics/prometheus/', instrumentation.metrics_prometheus, name='metrics_prometheus'),  # Prometheus scrape target
+
     # Subscription and Razorpay integration views
-    path('service/<int:pk>/subscribe/', views.subscribe_service, name='subscribe_service'),  # Subscribe to a service
-    path('payment/callback/', views.payment_callback, name='payment_callback'),  # Razorpay payment callback
+    path('service/<int:pk>/subscribe/', checkout_views.subscribe_service, name='subscribe_service'),  # Subscribe to a service
+    path('payment/callback/', checkout_views.payment_callback, name='payment_callback'),  # Razorpay payment callback
+    path('payment/webhook/', views.razorpay_webhook, name='razorpay_webhook'),  # Razorpay server-to-server events
 ]
@@ -2,64 +2,65 @@ from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
 from django.http import JsonResponse
-import random
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
-import razorpay
+from django.views.decorators.http import require_POST
 
 from .forms import UserRegistrationForm, OTPVerificationForm, LoginForm, ServiceForm, SubscriptionForm
-from .models import Service, OTP
+from .models import Service
+from . import backends, catalog, hashers, ledger, otp, webhooks
+from .pagination import CatalogQuery
+from .outbox import enqueue_email
+from .otp import get_otp_backend
+from .payments import get_gateway, GatewayUnavailable
 
 
-# Razorpay client setup
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
 # User Registration View
 def register(request):
     if request.method == 'POST':
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
-            user.is_active = False  # Inactive until OTP is verified
-            user.save()
-
-            otp_code = random.randint(100000, 999999)
-            OTP.objects.create(user=user, otp_code=otp_code)
-
-            send_mail(
-                'Your OTP Code',
-                f'Your OTP is {otp_code}',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-            )
+            # The OTP mail is only queued here; the process_outbox worker delivers it
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    form.cleaned_data['username'],
+                    form.cleaned_data['email'],
+                    form.cleaned_data['password'],
+                    is_active=False,  # Inactive until OTP is verified
+                )
+                send_otp(user)
 
             request.session['user_id'] = user.id
-            return redirect('otp-verification')
+            return redirect('otp_verification')
     else:
         form = UserRegistrationForm()
     return render(request, 'register.html', {'form': form})
 
+# Issue a fresh OTP for the user and queue it for delivery
+def send_otp(user):
+    otp_code = get_otp_backend().issue(user.id)
+    enqueue_email('Your OTP Code', f'Your OTP is {otp_code}', [user.email])
+
 # OTP Verification View
 def otp_verification(request):
     user_id = request.session.get('user_id')
     if not user_id:
         return redirect('register')
 
-    user = get_object_or_404(User, id=user_id)
-
     if request.method == 'POST':
         form = OTPVerificationForm(request.POST)
         if form.is_valid():
-            otp_code = form.cleaned_data['otp_code']
-            otp_instance = OTP.objects.filter(user=user, otp_code=otp_code).first()
-            if otp_instance:
+            ip = request.META.get('REMOTE_ADDR')
+            if not otp.allow('verify', f'user:{user_id}', f'ip:{ip}'):
+                messages.error(request, "Too many attempts. Please wait a few minutes and try again.")
+            elif get_otp_backend().verify(user_id, form.cleaned_data['otp']):
+                user = get_object_or_404(backends.unverified_users(), id=user_id)
                 user.is_active = True
-                user.save()
-                otp_instance.delete()
+                user.save(update_fields=['is_active'])
+                del request.session['user_id']
                 login(request, user)
                 return redirect('home')
             else:
@@ -69,6 +70,22 @@ def otp_verification(request):
 
     return render(request, 'otp_verification.html', {'form': form})
 
+# Resend OTP View
+def resend_otp(request):
+    user_id = request.session.get('user_id')
+    if not user_id:
+        return redirect('register')
+
+    if request.method == 'POST':
+        ip = request.META.get('REMOTE_ADDR')
+        if not otp.allow('resend', f'user:{user_id}', f'ip:{ip}'):
+            messages.error(request, "Too many OTP requests. Please wait before requesting another.")
+        else:
+            user = get_object_or_404(backends.unverified_users(), id=user_id)
+            send_otp(user)
+            messages.success(request, "A new OTP has been sent to your email.")
+    return redirect('otp_verification')
+
 # Login View
 def login_view(request):
     if request.method == 'POST':
@@ -76,12 +93,20 @@ def login_view(request):
         if form.is_valid():
             username = form.cleaned_data['username']
             password = form.cleaned_data['password']
-            user = authenticate(request, username=username, password=password)
-            if user:
-                login(request, user)
-                return redirect('home')
-            else:
-                messages.error(request, 'Invalid credentials')
+            # One password hash either way: authenticate() rejects inactive
+            # users, so unverified ones are checked here instead
+            pending = backends.unverified_users().filter(username=username).first()
+            if pending is None:
+                user = authenticate(request, username=username, password=password)
+                if user:
+                    login(request, user)
+                    return redirect('home')
+            elif hashers.check_password(pending, password):
+                # Registered or onboarded, but the email isn't verified yet
+                request.session['user_id'] = pending.id
+                messages.info(request, 'Enter the OTP we emailed you, or request a new one.')
+                return redirect('otp_verification')
+            messages.error(request, 'Invalid credentials')
     else:
         form = LoginForm()
     return render(request, 'login.html', {'form': form})
@@ -92,19 +117,36 @@ def logout_view(request):
     logout(request)
     return redirect('login')
 
+# Link to the next catalog page, keeping the current filters
+def next_page_url(request, next_cursor):
+    if not next_cursor:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = next_cursor
+    return '?' + params.urlencode()
+
 # Home View (Requires Authentication)
 @login_required
 def home(request):
-    services = Service.objects.filter(active=True)  # Show only active services
-    return render(request, 'home.html', {'services': services})
+    # Show only active services, served from the versioned catalog cache
+    query = CatalogQuery.from_params(request.GET, active=True)
+    services_html, next_cursor = catalog.render_page('_home_service.html', query)
+    return render(request, 'home.html', {
+        'services_html': services_html,
+        'next_page_url': next_page_url(request, next_cursor),
+    })
 
 ### CRUD Operations for the Service Model ###
 
 # List all services
 @login_required
 def service_list(request):
-    services = Service.objects.all()
-    return render(request, 'service_list.html', {'services': services})
+    query = CatalogQuery.from_params(request.GET)
+    services_html, next_cursor = catalog.render_page('_service_list_service.html', query)
+    return render(request, 'service_list.html', {
+        'services_html': services_html,
+        'next_page_url': next_page_url(request, next_cursor),
+    })
 
 # Create Service View (Admin/Authorized Users)
 @login_required
@@ -158,22 +200,21 @@ def subscribe_service(request, pk):
         if form.is_valid():
             address = form.cleaned_data['address']
 
-            # Calculate total price with GST (if applicable)
-            gst = 0.18 * service.service_price  # 18% GST
-            total_amount = service.service_price + gst
-            amount_in_paise = int(total_amount * 100)  # Convert to paise
+            # Tax-inclusive total, precomputed from service_tax when the service was saved
+            total_amount = service.gross_amount
+            amount_in_paise = service.gross_amount_paise
 
-            # Create Razorpay Order
-            razorpay_order = razorpay_client.order.create({
-                'amount': amount_in_paise,
-                'currency': 'INR',
-                'payment_capture': '1'
-            })
+            # Record the order and create it on Razorpay (bounded by RAZORPAY_TIMEOUT, retried idempotently)
+            try:
+                order = ledger.create_order(request.user, service, amount_in_paise, address)
+            except GatewayUnavailable:
+                messages.error(request, 'The payment gateway is not responding. Please try again.')
+                return render(request, 'subscribe_service.html', {'form': form, 'service': service})
 
             context = {
                 'form': form,
                 'service': service,
-                'order_id': razorpay_order['id'],  # Razorpay order ID
+                'order_id': order.gateway_order_id,  # Razorpay order ID
                 'razorpay_key_id': settings.RAZORPAY_KEY_ID,  # Razorpay key from settings
                 'total_amount': total_amount,
                 'amount_in_paise': amount_in_paise,
@@ -196,17 +237,13 @@ def payment_callback(request):
             signature = request.POST.get('razorpay_signature', '')
 
             # Verify the payment signature
-            params_dict = {
-                'razorpay_order_id': order_id,
-                'razorpay_payment_id': payment_id,
-                'razorpay_signature': signature,
-            }
-
-            result = razorpay_client.utility.verify_payment_signature(params_dict)
-
-            if result is None:
-                # Payment was successful, you can add additional subscription logic here
-                messages.success(request, 'Payment was successful!')
+            if get_gateway().verify_payment_signature(order_id, payment_id, signature):
+                # Idempotent: a replayed callback finds the order already paid and does nothing
+                order, applied = ledger.record_payment(order_id, payment_id)
+                if order is None:
+                    return JsonResponse({'status': 'Unknown Order'})
+                if applied:
+                    messages.success(request, 'Payment was successful!')
                 return JsonResponse({'status': 'Payment Successful'})
             else:
                 return JsonResponse({'status': 'Payment Verification Failed'})
@@ -214,3 +251,16 @@ def payment_callback(request):
             return JsonResponse({'status': 'Error', 'message': str(e)})
     return JsonResponse({'status': 'Invalid Request'})
 
+# Razorpay webhook: verify and queue the event, process_webhooks applies it
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    try:
+        body = request.body.decode('utf-8')
+    except UnicodeDecodeError:
+        return JsonResponse({'status': 'Invalid Payload'}, status=400)
+    signature = request.headers.get('X-Razorpay-Signature', '')
+    if not get_gateway().verify_webhook_signature(body, signature, settings.RAZORPAY_WEBHOOK_SECRET):
+        return JsonResponse({'status': 'Invalid Signature'}, status=400)
+    webhooks.receive(body, request.headers.get('X-Razorpay-Event-Id'))
+    return JsonResponse({'status': 'Received'})
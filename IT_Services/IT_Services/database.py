@@ -0,0 +1,81 @@
+"""
+Database configuration for IT_Services.
+
+sqlite_database() builds a DATABASES entry for the tuned SQLite backend in
+IT_Services/sqlite_backend: WAL journaling (readers don't block the
+writer), synchronous=NORMAL (safe with WAL, far fewer fsyncs), a
+memory-mapped read path, a busy timeout instead of an immediate
+"database is locked", persistent connections, and BEGIN IMMEDIATE
+transactions behind a per-process write gate. sqlite_replica() builds a
+read-only replica entry for IT_App.routers.ReplicaRouter.
+"""
+from pathlib import Path
+
+SQLITE_PRAGMAS = {
+    # Persistent: the first connection converts the file (and WAL leaves
+    # -wal/-shm files beside it), so database files are kept out of git
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,  # KiB, i.e. 32 MB of page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_database(name, conn_max_age=600, timeout=20, write_gate=True, pragmas=None):
+    """
+    Return a DATABASES entry for the SQLite file `name`.
+
+    `timeout` is the busy timeout in seconds: how long a connection waits
+    for another process's write lock (and for the write gate) before
+    failing. With `write_gate`, writes in this process are serialized
+    before they reach SQLite, while reads run concurrently. `pragmas`
+    override SQLITE_PRAGMAS; None removes one.
+    """
+    pragmas = {pragma: value for pragma, value in {**SQLITE_PRAGMAS, **(pragmas or {})}.items() if value is not None}
+    return {
+        'ENGINE': 'IT_Services.sqlite_backend',
+        'NAME': name,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': timeout,
+            # Take the write lock when the transaction starts, so a read
+            # transaction never has to upgrade (which fails without waiting)
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {pragma} = {value}' for pragma, value in pragmas.items()),
+            'write_gate': write_gate,
+        },
+        # Tests use a file beside the database rather than an in-memory one,
+        # so they run with the same journal mode and write gate
+        'TEST': {'NAME': str(Path(name).with_name(f'test_{Path(name).name}'))},
+    }
+
+
+def sqlite_replica(name, conn_max_age=600, timeout=20, pragmas=None):
+    """
+    Return a read-only DATABASES entry for a replica file kept up to date
+    from the primary by the `sync_replicas` command. A missing file fails
+    to connect (so the router falls back to the primary) instead of being
+    created empty. Connections reopen the file after each sync, on the
+    health check at the start of a request.
+    """
+    database = sqlite_database(
+        f'file:{Path(name).resolve()}?mode=ro', conn_max_age=conn_max_age, timeout=timeout,
+        # The journal mode is the primary's business; a read-only connection can't change it
+        write_gate=False, pragmas={'journal_mode': None, **(pragmas or {}), 'query_only': 1},
+    )
+    database['OPTIONS']['transaction_mode'] = None  # BEGIN IMMEDIATE needs write access
+    # sync_replicas renames a fresh copy over the file; reconnect to it
+    database['OPTIONS']['reopen_replaced'] = True
+    # Tests read the primary's test database instead of a replica
+    database['TEST'] = {'MIRROR': 'default'}
+    return database
+
+
+def replica_path(database):
+    """
+    The file behind a sqlite_replica() entry.
+    """
+    name = str(database['NAME'])
+    return name[len('file:'):].split('?', 1)[0] if name.startswith('file:') else name
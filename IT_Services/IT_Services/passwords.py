@@ -0,0 +1,31 @@
+"""
+Password hasher configuration for IT_Services.
+
+password_hashers() builds PASSWORD_HASHERS with the chosen algorithm
+first, so it hashes new passwords, followed by every other supported
+hasher, so existing hashes still verify and are upgraded to the chosen
+algorithm and cost (PASSWORD_HASHER_PARAMS) on the user's next login.
+"""
+from importlib.util import find_spec
+
+from django.core.exceptions import ImproperlyConfigured
+
+# The tuned hashers in IT_App/hashers.py, by algorithm name
+HASHERS = {
+    'pbkdf2_sha256': 'IT_App.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'IT_App.hashers.ScryptPasswordHasher',
+    'argon2': 'IT_App.hashers.Argon2PasswordHasher',
+}
+# Other hashers in Django's default list, kept for verifying older hashes
+LEGACY_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
+def password_hashers(preferred):
+    if preferred not in HASHERS:
+        raise ImproperlyConfigured(f'PASSWORD_HASHER must be one of {", ".join(HASHERS)}, not {preferred!r}.')
+    if preferred == 'argon2' and find_spec('argon2') is None:
+        raise ImproperlyConfigured("PASSWORD_HASHER = 'argon2' needs the argon2-cffi package.")
+    return [HASHERS[preferred]] + [path for name, path in HASHERS.items() if name != preferred] + LEGACY_HASHERS
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+from IT_Services.database import sqlite_database, sqlite_replica  # noqa: F401
+from IT_Services.passwords import password_hashers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -36,6 +39,12 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = '<your email>'  # Your Gmail address
 EMAIL_HOST_PASSWORD = '<your token>' # Your Gmail app password
+EMAIL_TIMEOUT = 30  # seconds, so a stuck SMTP server can't hang the outbox worker
+
+# Email outbox (see IT_App/outbox.py and the process_outbox command)
+OUTBOX_MAX_ATTEMPTS = 5  # after this many failures the email is marked dead
+OUTBOX_RETRY_BACKOFF = 30  # seconds before the first retry, doubled each attempt
+OUTBOX_RETRY_MAX_DELAY = 60 * 60
 
 
 # Application definition
@@ -48,10 +57,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'IT_App',
-    'razorpay',
 ]
 
 MIDDLEWARE = [
+    'IT_App.instrumentation.MetricsMiddleware',  # first, so it measures the whole request
+    'IT_App.routers.ReplicaPinningMiddleware',  # before sessions, so session writes pin to the primary
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,10 +75,17 @@ ROOT_URLCONF = 'IT_Services.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'IT_App.instrumentation.InstrumentedDjangoTemplates',  # DjangoTemplates plus render timing
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process; in development the
+            # autoreloader clears this cache when a template file changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -79,22 +96,136 @@ TEMPLATES = [
     },
 ]
 
+# Request metrics (see IT_App/instrumentation.py)
+METRICS_BUFFER_SIZE = 5000  # most recent requests kept for percentiles
+METRICS_N_PLUS_ONE_THRESHOLD = 5  # identical SELECTs in one request that get it flagged
+METRICS_SCRAPE_IPS = ['127.0.0.1']  # may read /metrics/prometheus/ without logging in
+
 WSGI_APPLICATION = 'IT_Services.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite with WAL, persistent connections and serialized writes (see IT_Services/database.py)
 DATABASES = {
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+}
+
+# Read replicas for catalog reads (see IT_App/routers.py), kept in sync with
+# `manage.py sync_replicas --loop`. For example:
+#     DATABASES['replica1'] = sqlite_replica(BASE_DIR / 'db_replica1.sqlite3')
+#     DATABASE_REPLICAS = ['replica1']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_SELECTION = 'round_robin'  # or 'least_connections'
+DATABASE_REPLICA_RETRY = 30  # seconds before an unreachable replica is tried again
+DATABASE_PIN_SECONDS = 15  # read from the primary this long after a write; keep above the sync interval
+DATABASE_PIN_COOKIE = 'pin_primary'
+DATABASE_ROUTERS = ['IT_App.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The local-memory cache is per process; with several worker processes use
+# the file-based (or a shared) backend so catalog invalidation is seen by all.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'it-services',
+        # Room for a rendered fragment per service besides pages, OTPs and rate limits
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # 'default': {
+    #     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    #     'LOCATION': BASE_DIR / 'cache',
+    # },
 }
 
+# Service catalog cache (see IT_App/catalog.py)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60  # seconds; stale versions simply age out
+CATALOG_PAGE_SIZE = 20
+CATALOG_MAX_PAGE_SIZE = 100
+
+# Service change feed (see IT_App/changefeed.py)
+CHANGE_FEED_PAGE_SIZE = 500  # changes per JSON page or per query of the stream
+CHANGE_FEED_POLL_INTERVAL = 5  # seconds; the stream also queries as soon as this process changes the catalog
+CHANGE_FEED_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+CHANGE_FEED_STREAM_TIMEOUT = 5 * 60  # seconds; clients reconnect with Last-Event-ID
+CHANGE_FEED_COMPACT_AFTER = 7 * 24 * 60 * 60  # seconds before superseded changes may be deleted
+
+# Full-text search backend: 'auto' (FTS5 on SQLite, otherwise 'python'), 'fts5' or 'python'
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_CANDIDATES = 2000  # best matches the admin search filters on
+SEARCH_RANK_CANDIDATES = 2000  # matches bm25 scores per query; broader queries rank the newest
+
+# One-time passwords (see IT_App/otp.py)
+# 'IT_App.otp.CacheOTPBackend' keeps codes in OTP_CACHE_ALIAS instead; only use it
+# with a cache shared by all processes. The rate limits below live in that cache too,
+# so with the local-memory cache each process enforces its own.
+OTP_BACKEND = 'IT_App.otp.DatabaseOTPBackend'
+OTP_CACHE_ALIAS = 'default'
+OTP_TTL = 10 * 60  # seconds
+# action: (attempts, per seconds), enforced per user and per client IP
+OTP_RATE_LIMITS = {
+    'verify': (5, 5 * 60),
+    'resend': (3, 15 * 60),
+}
+
+# Maintenance (see IT_App/maintenance.py and the run_maintenance command)
+MAINTENANCE_INTERVALS = {  # seconds between runs of each task
+    'otps': 15 * 60,
+    'sessions': 60 * 60,
+    'users': 24 * 60 * 60,
+    'outbox': 60 * 60,
+    'changes': 24 * 60 * 60,
+}
+MAINTENANCE_BATCH_SIZE = 500  # rows deleted per transaction
+MAINTENANCE_INACTIVE_USER_AGE = 30 * 24 * 60 * 60  # seconds before an unverified account is deleted
+MAINTENANCE_SENT_EMAIL_AGE = 7 * 24 * 60 * 60  # seconds a sent email stays in the outbox
+
 # Razorpay API Keys
 RAZORPAY_KEY_ID = 'rzp_test_e664V0FP0zQy7N'
 RAZORPAY_KEY_SECRET = 'QdnuRxUHrPGeiJc9lDTXYPO7'
+RAZORPAY_WEBHOOK_SECRET = ''  # Set when adding the webhook in the Razorpay dashboard
+
+# Razorpay gateway adapter (see IT_App/payments.py)
+RAZORPAY_BASE_URL = None  # None for the real API; e.g. 'http://127.0.0.1:8765' for run_fake_gateway
+RAZORPAY_TIMEOUT = (3.05, 10)  # (connect, read) seconds per call
+RAZORPAY_MAX_RETRIES = 2
+RAZORPAY_POOL_SIZE = 10  # keep-alive connections shared by all threads
+RAZORPAY_ASYNC_WORKERS = 10  # threads serving acreate_order() for async views
+
+# Serve home, service detail, checkout and the payment callback from
+# IT_App.async_views; turn on when running under asgi.py (e.g. uvicorn)
+ASYNC_VIEWS = False
+
+# Sessions and authentication
+# Sessions are read from the cache and only fall back to the database on a
+# miss; 'django.contrib.sessions.backends.signed_cookies' keeps no server
+# side state at all (but can't be revoked before SESSION_COOKIE_AGE)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
+# CachedModelBackend caches request.user (see IT_App/backends.py)
+AUTHENTICATION_BACKENDS = ['IT_App.backends.CachedModelBackend']
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 5 * 60  # seconds
+
+# Password hashing (see IT_Services/passwords.py and IT_App/hashers.py)
+# New passwords use PASSWORD_HASHER; hashes made with another algorithm or
+# cost are upgraded when their user next logs in. Compare the options on
+# the production hardware with the bench_hashers command.
+PASSWORD_HASHER = 'pbkdf2_sha256'  # or 'scrypt', or 'argon2' (needs argon2-cffi)
+PASSWORD_HASHER_PARAMS = {
+    'pbkdf2_sha256': {'iterations': 870000},
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8},  # memory_cost in KiB
+}
+PASSWORD_HASHERS = password_hashers(PASSWORD_HASHER)
+# Hash logins on a bounded pool of this many workers (0: in the request's own thread)
+PASSWORD_HASHING_WORKERS = 0
+PASSWORD_HASHING_EXECUTOR = 'thread'  # or 'process'
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -132,6 +263,14 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Service image pipeline (see IT_App/images.py)
+SERVICE_IMAGE_UPLOAD_TO = 'services/'
+SERVICE_IMAGE_WIDTHS = (160, 320, 640, 1280)
+SERVICE_IMAGE_FORMATS = ('webp', 'jpeg')  # add 'avif' first if Pillow supports it (much slower to encode)
+SERVICE_IMAGE_QUALITY = 80
+SERVICE_IMAGE_ASYNC = True  # generate variants on a background thread after commit
+SERVICE_IMAGE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
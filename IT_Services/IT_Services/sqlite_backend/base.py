@@ -0,0 +1,145 @@
+"""
+SQLite backend with a per-process write gate.
+
+SQLite allows one writer at a time. Rather than letting every thread race
+for the file lock (and fail with "database is locked" once the busy
+timeout runs out), writers in this process queue on a lock first: a
+transaction holds the gate from BEGIN until it commits or rolls back, and
+a write outside a transaction holds it for the one statement. Reads never
+take the gate, and with WAL they run alongside the writer.
+
+A connection with the `reopen_replaced` option (replicas, which the
+`sync_replicas` command refreshes by renaming a new copy over the file)
+stops being usable once its file has been replaced, so the next request's
+health check reconnects to the new copy instead of reading the old one.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_write_gate(name):
+    with _gates_lock:
+        return _gates.setdefault(str(name), threading.Lock())
+
+
+class GatedCursorWrapper(base.SQLiteCursorWrapper):
+    database = None  # set by DatabaseWrapper.create_cursor()
+
+    def _gated(self, query):
+        database = self.database
+        return (
+            database is not None
+            and database.write_gate is not None
+            and not database.holds_write_gate
+            and query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        )
+
+    def execute(self, query, params=None):
+        if not self._gated(query):
+            return super().execute(query, params)
+        with self.database.write_gate_held():
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if not self._gated(query):
+            return super().executemany(query, param_list)
+        with self.database.write_gate_held():
+            return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_gate = None
+        self.write_gate_timeout = 5
+        self.holds_write_gate = False
+        self.reopen_replaced = False
+        self.file_id = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        if kwargs.pop('write_gate', True) and not self.is_in_memory_db():
+            self.write_gate = get_write_gate(kwargs['database'])
+        self.write_gate_timeout = kwargs.get('timeout', 5)
+        self.reopen_replaced = kwargs.pop('reopen_replaced', False)
+        return kwargs
+
+    def database_file_id(self):
+        name = str(self.settings_dict['NAME'])
+        if name.startswith('file:'):
+            name = name[len('file:'):].split('?', 1)[0]
+        try:
+            stat = os.stat(name)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def get_new_connection(self, conn_params):
+        # Before connecting: a replacement in between only costs a reconnect
+        file_id = self.database_file_id() if self.reopen_replaced else None
+        connection = super().get_new_connection(conn_params)
+        self.file_id = file_id
+        return connection
+
+    def is_usable(self):
+        if self.reopen_replaced and self.database_file_id() != self.file_id:
+            return False
+        return super().is_usable()
+
+    def acquire_write_gate(self):
+        if self.write_gate is None or self.holds_write_gate:
+            return
+        if not self.write_gate.acquire(timeout=self.write_gate_timeout):
+            raise OperationalError('database is locked (timed out waiting for the write gate)')
+        self.holds_write_gate = True
+
+    def release_write_gate(self):
+        if self.holds_write_gate:
+            self.holds_write_gate = False
+            self.write_gate.release()
+
+    @contextmanager
+    def write_gate_held(self):
+        self.acquire_write_gate()
+        try:
+            yield
+        finally:
+            self.release_write_gate()
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=GatedCursorWrapper)
+        cursor.database = self
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        # Held until the transaction ends, see _set_autocommit() and _close()
+        self.acquire_write_gate()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self.release_write_gate()
+            raise
+
+    def _set_autocommit(self, autocommit):
+        try:
+            super()._set_autocommit(autocommit)
+        finally:
+            if autocommit:
+                self.release_write_gate()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_write_gate()
+